@@ -0,0 +1,71 @@
+"""
+Time how long it takes to construct model instances (no database writes).
+
+Model constructors used to inspect the database catalog on every call; now tables are
+created once per engine by models.create_tables.  This times both: the old constructor
+is reproduced here as a catalog check before each construction.  Run from the
+repository root:
+
+    PYTHONPATH=. python benchmarks/bench_model_construct.py [count]
+"""
+import sys
+import tempfile
+import time
+
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect
+
+from calvincTools.models import init_cDatabase
+
+
+def _construct_old(db, menuItems, **kw):
+    """What menuItems(**kw) did before: check the catalog for the table first."""
+    if not inspect(db.engine).has_table(menuItems.__tablename__):
+        db.create_all()
+    return menuItems(**kw)
+# _construct_old
+
+def _construct_new(db, menuItems, **kw):
+    return menuItems(**kw)
+# _construct_new
+
+def _time_construct(construct, db, menuItems, count: int) -> float:
+    start = time.perf_counter()
+    for n in range(count):
+        construct(
+            db, menuItems,
+            MenuGroup_id=1, MenuID=n // 20, OptionNumber=n % 20 + 1,
+            OptionText=f'Option {n}', Command=0, Argument='',
+            )
+    return time.perf_counter() - start
+# _time_construct
+
+
+def main(count: int = 10_000) -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{tmpdir}/app.db'
+        app.config['SQLALCHEMY_BINDS'] = {'cToolsdb': f'sqlite:///{tmpdir}/ctools.db'}
+        db = SQLAlchemy()
+        db.init_app(app)
+        menuGroups, menuItems, cParameters, cGreetings, User = init_cDatabase(app, db)  # pylint: disable=unused-variable
+
+        with app.app_context():
+            timings = {
+                'before': _time_construct(_construct_old, db, menuItems, count),
+                'after': _time_construct(_construct_new, db, menuItems, count),
+            }
+            for engine in db.engines.values():
+                engine.dispose()
+        # endwith app context
+    # endwith tmpdir
+
+    print(f'constructed {count} menuItems:')
+    for label, elapsed in timings.items():
+        print(f'  {label:6}: {elapsed:.3f}s ({elapsed / count * 1e6:.1f} us each)')
+# main
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
@@ -30,3 +30,4 @@ MENUCOMMANDDICTIONARY = {
 # Convert dictionary to object
 MENUCOMMAND =  types.SimpleNamespace(**{CText:CNum for CNum,CText in MENUCOMMANDDICTIONARY.items()})
 
+from .menutree import (MenuTree, MenuSlot, )     # pylint: disable=wrong-import-position
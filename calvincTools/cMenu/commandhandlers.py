@@ -1,84 +1,311 @@
 
+import csv
+import datetime
+import io
+import os
+import tempfile
+from dataclasses import dataclass
+
 from flask import (
-    current_app, flash, redirect, request, url_for
+    current_app, flash, redirect, request, url_for,
+    Response, stream_template, stream_with_context,
     )
 from flask.typing import ResponseReturnValue
 from flask_login import current_user, login_required
 from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
 
 from calvincTools.decorators import superuser_required, permission_required
 from calvincTools.forms import RawSQLForm
-from calvincTools.utils import checkTemplate_and_render
+from calvincTools.utils import checkTemplate_and_render, Excelfile_stream
+from calvincTools.versionstamps import (
+    bump_version_stamp, STAMP_PARAMETERS, STAMP_GREETINGS,
+    )
+from .sqlguard import ( SQLGuard, SQLBudgetExceeded, explain_sql, DEFAULT_SQL_BUDGET_ROWS, )
 
 # db and models imported in each method so that the initalized versions are used
 
+DEFAULT_SQL_PAGE_SIZE = 500         # run_sql rows per page (CTOOLS_SQL_PAGE_SIZE)
+DEFAULT_SQL_MAX_ROWS = 5000         # largest page run_sql will send (CTOOLS_SQL_MAX_ROWS)
+SQL_FETCH_BATCH = 500               # rows fetched from the cursor at a time
+DOWNLOAD_CHUNK_SIZE = 64 * 1024     # bytes per chunk when sending a finished download file
+
+
+def _prepare_raw_sql(sql_query) -> tuple[str, tuple[str, str] | None]:
+    """
+    Check SQL entered on the run_sql page and terminate it with a semicolon.
+    Returns (sql, None), or (sql, (flash message, category)) if it can't be run.
+    """
+    try:
+        # is there actually any SQL entered?
+        if not sql_query.strip(): # type: ignore
+            return sql_query, ('Please enter a SQL query.', 'warning')
+        # Basic safety check to prevent dangerous operations
+        forbidden_statements = ['DROP', 'ALTER', 'TRUNCATE', 'CREATE']
+        if any(stmt in sql_query.upper() for stmt in forbidden_statements): # type: ignore
+            return sql_query, ('Forbidden SQL operation detected.', 'danger')
+        if not sql_query.strip().endswith(';'): # type: ignore
+            sql_query += ';' # type: ignore
+    except Exception as e:
+        return sql_query, (f'Error processing SQL: {str(e)}', 'danger')
+    # end try
+    return sql_query, None
+# _prepare_raw_sql
+
+@dataclass
+class SQLPageInfo:
+    """One page of run_sql results; rows_sent and has_more are filled in as the rows stream out."""
+    page: int = 1
+    page_size: int = DEFAULT_SQL_PAGE_SIZE
+    rows_sent: int = 0
+    has_more: bool = False
+    error: str = ''
+
+    @property
+    def first_row(self) -> int:
+        return (self.page - 1) * self.page_size + 1
+
+    @property
+    def last_row(self) -> int:
+        return self.first_row + self.rows_sent - 1
+# SQLPageInfo
+
+def _stream_sql_page(result, page_info: SQLPageInfo, guard: SQLGuard):
+    """
+    Yield the rows of page_info's page from result, fetching SQL_FETCH_BATCH rows at a time.
+    Earlier pages are read and dropped (arbitrary SQL can't be given a portable OFFSET),
+    so memory stays at one batch however large the result is.
+    Every row read, earlier pages' included, is charged to guard's row budget; guard is stopped
+    when the page is done.
+    """
+    from ..models import ( db, )
+
+    skip = (page_info.page - 1) * page_info.page_size
+    try:
+        for batch in guard.partitions(result, SQL_FETCH_BATCH, skip=skip):
+            for row in batch:
+                if page_info.rows_sent >= page_info.page_size:
+                    page_info.has_more = True
+                    return
+                page_info.rows_sent += 1
+                yield tuple(row)
+            # endfor row in batch
+        # endfor batch
+    except (SQLAlchemyError, SQLBudgetExceeded) as e:
+        page_info.error = guard.error_message(e)
+        guard.stop()
+        db.session.rollback()
+    finally:
+        result.close()
+        guard.stop()
+    # end try
+# _stream_sql_page
+
 
 @superuser_required
 def run_sql():
     """
     Django equivalent: fn_cRawSQL
+    Results are streamed a page at a time (CTOOLS_SQL_PAGE_SIZE rows, at most
+    CTOOLS_SQL_MAX_ROWS) from a server-side cursor, and rendered as they are fetched.
+    Queries run under a statement timeout and a row/byte budget (see sqlguard); with
+    "Show the query plan first" the plan and estimated rows are shown before running.
     """
     from ..models import ( db, )
 
     form = RawSQLForm()
     tmplt_getSQL = 'utils/enter_SQL.html'
     tmplt_showSQL = 'utils/show_SQL_results.html'
+    tmplt_explainSQL = 'utils/explain_SQL.html'
     context = {}
 
+    if request.method == 'GET':
+        if form.page_size.data is None:
+            form.page_size.data = current_app.config.get('CTOOLS_SQL_PAGE_SIZE', DEFAULT_SQL_PAGE_SIZE)
+        form.explain_first.data = current_app.config.get('CTOOLS_SQL_EXPLAIN_FIRST', False)
+    # endif GET
+
     if form.validate_on_submit():
-        sql_query = form.input_sql.data
-        try:
-            # is there actually any SQL entered?
-            if not sql_query.strip(): # type: ignore
-                flash('Please enter a SQL query.', 'warning')
-                return checkTemplate_and_render(tmplt_getSQL, form=form)
-            # Basic safety check to prevent dangerous operations
-            forbidden_statements = ['DROP', 'ALTER', 'TRUNCATE', 'CREATE']
-            if any(stmt in sql_query.upper() for stmt in forbidden_statements): # type: ignore
-                flash('Forbidden SQL operation detected.', 'danger')
-                return checkTemplate_and_render(tmplt_getSQL, form=form)
-            if not sql_query.strip().endswith(';'): # type: ignore
-                sql_query += ';' # type: ignore
-        except Exception as e:
-            flash(f'Error processing SQL: {str(e)}', 'danger')
+        sql_query, errmsg = _prepare_raw_sql(form.input_sql.data)
+        if errmsg:
+            flash(*errmsg)
             return checkTemplate_and_render(tmplt_getSQL, form=form)
-        # end try
 
+        max_rows = current_app.config.get('CTOOLS_SQL_MAX_ROWS', DEFAULT_SQL_MAX_ROWS)
+        page_size = form.page_size.data or current_app.config.get('CTOOLS_SQL_PAGE_SIZE', DEFAULT_SQL_PAGE_SIZE)
+        if page_size > max_rows:
+            flash(f'Showing at most {max_rows} rows per page.', 'info')
+            page_size = max_rows
+        page_info = SQLPageInfo(page=form.page.data or 1, page_size=page_size)
 
+        if form.explain_first.data:
+            try:
+                plan = explain_sql(db.session, sql_query)
+            except Exception as e:
+                db.session.rollback()
+                flash(f'Could not get the query plan: {str(e)}', 'danger')
+                return checkTemplate_and_render(tmplt_getSQL, form=form)
+            db.session.rollback()       # EXPLAIN doesn't change anything; don't hold the transaction open
+            budget_rows = current_app.config.get('CTOOLS_SQL_BUDGET_ROWS', DEFAULT_SQL_BUDGET_ROWS)
+            context['plan'] = plan
+            context['budget_rows'] = budget_rows
+            context['over_budget'] = bool(budget_rows and (plan.estimated_rows or 0) > budget_rows)
+            context['OrigSQL'] = sql_query
+            context['page_size'] = page_size
+            context['form'] = form
+            return checkTemplate_and_render(tmplt_explainSQL, **context)
+        # endif explain_first
+
+        guard = SQLGuard.for_session(db.session)
         try:
-            result = db.session.execute(text(sql_query)) # type: ignore
+            guard.start()
+            result = db.session.execute(
+                text(sql_query),                                                    # type: ignore
+                execution_options={'stream_results': True, 'max_row_buffer': SQL_FETCH_BATCH},
+                )
 
             if result.returns_rows: # type: ignore
-                # SELECT query
-                columns = result.keys()
-                rows = [dict(row._mapping) for row in result]
-
-                context['colNames'] = list(columns)
-                context['nRecs'] = len(rows)
-                context['SQLresults'] = rows
+                # SELECT query - rows are fetched while the page is sent
+                context['colNames'] = list(result.keys())
+                context['SQLresults'] = _stream_sql_page(result, page_info, guard)
+                context['pageInfo'] = page_info
                 context['OrigSQL'] = sql_query
+                context['form'] = form
 
-                # Optionally save to Excel - WRITEMEWRITEMEWRITEME!!!!
-                # excel_file = save_to_excel(rows, columns)
-                # context['excel_file'] = excel_file
-
-                return checkTemplate_and_render(tmplt_showSQL, **context)
+                return Response(stream_template(tmplt_showSQL, **context))
             else:
                 # INSERT/UPDATE/DELETE query
+                guard.stop()
                 db.session.commit()
                 flash(f'Query executed successfully.  {result.rowcount} rows affected. ', 'success') # type: ignore
                 context['col_names'] = f'NO RECORDS RETURNED; {result.rowcount} records affected' # type: ignore
                 context['num_records'] = result.rowcount # type: ignore
+                context['OrigSQL'] = sql_query
                 return checkTemplate_and_render(tmplt_showSQL, **context)
 
         except Exception as e:
-            db.session. rollback()
-            flash(f'SQL Error: {str(e)}', 'danger')
+            guard.stop()
+            db.session.rollback()
+            flash(guard.error_message(e), 'danger')
             return checkTemplate_and_render(tmplt_getSQL, form=form)
 
     return checkTemplate_and_render(tmplt_getSQL, form=form)
 # run_sql
 
+def _iter_csv(result, guard: SQLGuard):
+    """
+    Yield result as CSV text, a fetch batch at a time, starting with the header row.
+    If the query times out or exceeds guard's budget, the last line says so.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    try:
+        writer.writerow(result.keys())
+        try:
+            for batch in guard.partitions(result, SQL_FETCH_BATCH):
+                writer.writerows(batch)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+            # endfor batch
+        except (SQLAlchemyError, SQLBudgetExceeded) as e:
+            writer.writerow([f'*** {guard.error_message(e)} ***'])
+        yield buffer.getvalue()
+    finally:
+        result.close()
+        guard.stop()
+    # end try
+# _iter_csv
+
+def _guarded_rows(result, guard: SQLGuard):
+    """Yield result's rows through guard's budget; if the query is stopped, a last row says why."""
+    try:
+        for batch in guard.partitions(result, SQL_FETCH_BATCH):
+            yield from batch
+        # endfor batch
+    except (SQLAlchemyError, SQLBudgetExceeded) as e:
+        yield (f'*** {guard.error_message(e)} ***',)
+    finally:
+        result.close()
+        guard.stop()
+    # end try
+# _guarded_rows
+
+def _iter_xlsx(result, guard: SQLGuard):
+    """
+    Yield result as an XLSX file.  The workbook is written by Excelfile_stream (openpyxl's
+    write-only mode) to a temporary file (an XLSX is a zip, so it can't be sent before
+    it's complete), then the file is sent in chunks and removed.
+    If the query times out or exceeds guard's budget, the last row says so.
+    """
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        Excelfile_stream(_guarded_rows(result, guard), path, fieldnames=list(result.keys()))
+
+        with open(path, 'rb') as xlsx_file:
+            while chunk := xlsx_file.read(DOWNLOAD_CHUNK_SIZE):
+                yield chunk
+    finally:
+        os.remove(path)
+    # end try
+# _iter_xlsx
+
+@superuser_required
+def download_sql(fmt):
+    """
+    Download the results of the SQL posted from the run_sql page, as CSV or XLSX.
+    The query is run again on a server-side cursor and written out as it is fetched,
+    under the same timeout and budget as run_sql.
+    """
+    from ..models import ( db, )
+
+    download_formats = {
+        'csv': (_iter_csv, 'text/csv'),
+        'xlsx': (_iter_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    }
+    if fmt not in download_formats:
+        flash(f'Cannot download results as {fmt}.', 'warning')
+        return redirect(url_for('utils.run_sql'))
+
+    form = RawSQLForm()
+    if not form.validate_on_submit():
+        flash('Please enter a SQL query.', 'warning')
+        return redirect(url_for('utils.run_sql'))
+    sql_query, errmsg = _prepare_raw_sql(form.input_sql.data)
+    if errmsg:
+        flash(*errmsg)
+        return redirect(url_for('utils.run_sql'))
+
+    guard = SQLGuard.for_session(db.session)
+    try:
+        guard.start()
+        result = db.session.execute(
+            text(sql_query),                                                    # type: ignore
+            execution_options={'stream_results': True, 'max_row_buffer': SQL_FETCH_BATCH},
+            )
+    except SQLAlchemyError as e:
+        guard.stop()
+        db.session.rollback()
+        flash(guard.error_message(e), 'danger')
+        return redirect(url_for('utils.run_sql'))
+    # end try
+    if not result.returns_rows:
+        # a download never changes anything
+        guard.stop()
+        db.session.rollback()
+        flash('Only queries that return rows can be downloaded.', 'warning')
+        return redirect(url_for('utils.run_sql'))
+
+    iter_output, mimetype = download_formats[fmt]
+    filename = f"SQLresults_{datetime.datetime.now():%Y%m%d_%H%M%S}.{fmt}"
+    return Response(
+        stream_with_context(iter_output(result, guard)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+        )
+# download_sql
+
 # @superuser_required
 @permission_required('EditParm')
 def edit_parameters():
@@ -203,6 +430,7 @@ def edit_parameters():
                         db.session.add(parm)
                 
                 db.session.commit()
+                bump_version_stamp(STAMP_PARAMETERS)
                 # flash('All parms saved successfully!', 'success')
                 return redirect(url_for('utils.edit_parameters'))
             # endfor each user in form
@@ -348,6 +576,7 @@ def edit_greetings() -> ResponseReturnValue:
                         db.session.add(greeting)
                 
                 db.session.commit()
+                bump_version_stamp(STAMP_GREETINGS)
                 # flash('All parms saved successfully!', 'success')
                 return redirect(url_for('utils.edit_greetings'))
             # endfor each user in form
@@ -0,0 +1,210 @@
+"""
+Registry of menu commands.
+
+Each command number maps to a MenuCommandHandler: the endpoint it redirects to and how
+the menu item's Argument is passed to that endpoint.  handle_command looks the handler
+up in one dictionary lookup, and the redirect URL of each handler is built once per
+script root and reused as a template.
+
+The calvincTools commands are registered by register_menu_blueprint.  Host apps can
+register their own (or replace the built-in ones), before or after calvincTools is set up:
+
+    from calvincTools.cMenu import MENUCOMMAND
+    from calvincTools.cMenu.commands import register_menu_command
+
+    register_menu_command(MENUCOMMAND.LoadExtWebPage, 'main.ext_page', arg_name='pagename')
+    register_menu_command(300, 'main.run_report', arg_name='report_id', command_name='RunReport')
+
+arg_name passes the Argument as a single URL variable.  For anything else, pass
+arg_builder, a function taking the Argument and returning the url_for keyword arguments
+(those URLs are built on each use).
+
+Menus link straight to each command's final URL (resolve_command_url), so a click is a
+single request.  Commands registered with dynamic=True, and commands without a working
+handler, are linked through the menu.handle_command route instead.
+"""
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Callable
+from urllib.parse import quote
+
+from flask import current_app, request, url_for
+from werkzeug.routing import BuildError
+
+from . import ( MENUCOMMAND, MENUCOMMANDDICTIONARY, )
+
+# stands in for the Argument while a URL template is built; survives URL quoting as-is
+_ARG_PLACEHOLDER = 'CTOOLSMENUARG0'
+# the characters werkzeug's default converter leaves unquoted in a path segment
+_URL_SAFE_CHARS = "!$&'()*+,/:;=@"
+
+
+@dataclass(frozen=True)
+class MenuCommandHandler:
+    """
+    What a menu command does when chosen.
+
+    endpoint: the view the command redirects to
+    arg_name: the endpoint's URL variable that receives the menu item's Argument, if any
+    arg_builder: Argument -> url_for keyword arguments, for endpoints that need more than arg_name
+    new_window: whether the menu opens the command in a new browser tab
+    dynamic: the URL must be decided when the item is clicked, not when the menu is rendered
+    """
+    command_num: int
+    endpoint: str
+    arg_name: str | None = None
+    arg_builder: Callable[[str], dict[str, Any]] | None = None
+    new_window: bool = True
+    dynamic: bool = False
+
+    @property
+    def command_name(self) -> str:
+        return MENUCOMMANDDICTIONARY.get(self.command_num, 'UnknownCommand')
+
+    def build_url(self, command_arg: str = '') -> str:
+        """The URL this command redirects to for command_arg.  Needs a request context."""
+        if self.arg_builder is not None:
+            return url_for(self.endpoint, **self.arg_builder(command_arg))
+
+        key = (self.command_num, request.script_root)
+        template = _url_templates.get(key)
+        if template is None:
+            try:
+                template = url_for(self.endpoint, **({self.arg_name: _ARG_PLACEHOLDER} if self.arg_name else {}))
+            except (BuildError, ValueError):
+                # the endpoint's converter rejects the placeholder (e.g. <int:...>); build per use
+                template = ''
+            with _registry_lock:
+                _url_templates[key] = template
+        # endif template not yet built
+
+        if not template:
+            return url_for(self.endpoint, **({self.arg_name: command_arg} if self.arg_name else {}))
+        if self.arg_name:
+            return template.replace(_ARG_PLACEHOLDER, quote(str(command_arg), safe=_URL_SAFE_CHARS))
+        return template
+    # build_url
+
+# MenuCommandHandler
+    def end_of_class(self):
+        pass
+
+
+# command_num -> MenuCommandHandler
+_command_registry: dict[int, MenuCommandHandler] = {}
+# (command_num, script_root) -> URL with _ARG_PLACEHOLDER for the Argument ('' if it can't be templated)
+_url_templates: dict[tuple[int, str], str] = {}
+_registry_lock = Lock()
+
+
+def register_menu_command(
+        command_num: int,
+        endpoint: str,
+        arg_name: str | None = None,
+        arg_builder: Callable[[str], dict[str, Any]] | None = None,
+        new_window: bool = True,
+        dynamic: bool = False,
+        command_name: str | None = None,
+        replace: bool = True,
+    ) -> MenuCommandHandler:
+    """
+    Register (or replace) the handler for command_num.
+    command_name names a new command number, so that it shows up in the menu editor.
+    With replace=False an existing handler is kept; that is how the built-in commands
+    are registered, so a host app's own handler wins whichever is registered first.
+    """
+    from .menucache import invalidate_menu_cache
+
+    command_num = int(command_num)
+    with _registry_lock:
+        existing = _command_registry.get(command_num)
+        if existing is not None and not replace:
+            return existing
+
+        if command_name and command_num not in MENUCOMMANDDICTIONARY:
+            MENUCOMMANDDICTIONARY[command_num] = command_name
+            setattr(MENUCOMMAND, command_name, command_num)
+        # endif new command
+
+        handler = MenuCommandHandler(
+            command_num=command_num,
+            endpoint=endpoint,
+            arg_name=arg_name,
+            arg_builder=arg_builder,
+            new_window=new_window,
+            dynamic=dynamic,
+        )
+        _command_registry[command_num] = handler
+        for key in [k for k in _url_templates if k[0] == command_num]:
+            del _url_templates[key]
+    # endwith _registry_lock
+    # rendered menus link straight to the old handler's URL
+    invalidate_menu_cache()
+    return handler
+# register_menu_command
+
+def unregister_menu_command(command_num: int) -> None:
+    """Remove the handler for command_num; choosing it will show the Under Construction page."""
+    from .menucache import invalidate_menu_cache
+
+    with _registry_lock:
+        _command_registry.pop(int(command_num), None)
+        for key in [k for k in _url_templates if k[0] == int(command_num)]:
+            del _url_templates[key]
+    invalidate_menu_cache()
+# unregister_menu_command
+
+def get_menu_command(command_num: int) -> MenuCommandHandler | None:
+    """The handler for command_num, or None if no handler is registered."""
+    return _command_registry.get(int(command_num))
+# get_menu_command
+
+def resolve_command_url(command_num: int, command_arg: str) -> str | None:
+    """
+    The final URL of a menu command, resolved when the menu is rendered.
+    FormBrowse goes straight to the form's endpoint when FORMNAME_TO_URL_MAP names one.
+    Returns None if the command has to go through menu.handle_command: dynamic commands,
+    and commands with no handler or whose endpoint doesn't exist (handle_command reports those).
+    """
+    handler = get_menu_command(command_num)
+    if handler is None or handler.dynamic or handler.endpoint not in current_app.view_functions:
+        return None
+
+    if command_num == MENUCOMMAND.FormBrowse and handler.endpoint == 'menu.form_browse':
+        # form_browse only redirects to the mapped endpoint; link to that endpoint directly
+        urlIndex = 0
+        form_entry = current_app.config.get('FORMNAME_TO_URL_MAP', {}).get(command_arg.lower())
+        if form_entry and form_entry[urlIndex] in current_app.view_functions:
+            return url_for(form_entry[urlIndex])
+    # endif FormBrowse
+
+    # OpenTable keeps its own endpoint, since menu.show_table checks for a superuser
+    return handler.build_url(command_arg)
+# resolve_command_url
+
+
+def register_default_commands() -> None:
+    """Register the calvincTools commands, without replacing any the host app already registered."""
+    defaults = [
+        (MENUCOMMAND.FormBrowse, 'menu.form_browse', 'formname', True),
+        (MENUCOMMAND.OpenTable, 'menu.show_table', 'tablename', True),
+        (MENUCOMMAND.RunSQLStatement, 'utils.run_sql', None, True),
+        (MENUCOMMAND.ChangePW, 'auth.change_password', None, True),
+        (MENUCOMMAND.EditMenu, 'menu.edit_menu_init', None, True),
+        (MENUCOMMAND.EditParameters, 'utils.edit_parameters', None, True),
+        (MENUCOMMAND.EditGreetings, 'utils.edit_greetings', None, True),
+        (MENUCOMMAND.EditUsers, 'auth.user_list', None, True),
+        (MENUCOMMAND.ShowRoutes_URLs, 'utils.show_routes', None, True),
+        (MENUCOMMAND.ShowForms, 'utils.show_forms', None, True),
+        (MENUCOMMAND.ExitApplication, 'auth.logout', None, False),
+    ]
+    # need to implement:
+    # 21: 'RunCode',
+    # 32: 'ConstructSQLStatement',
+    # 36: 'LoadExtWebPage',
+    # 62: 'ChangeUser',
+    # 63: 'ChangeMenuGroup',
+    # 110: 'Show Help',
+    for command_num, endpoint, arg_name, new_window in defaults:
+        register_menu_command(command_num, endpoint, arg_name=arg_name, new_window=new_window, replace=False)
+# register_default_commands
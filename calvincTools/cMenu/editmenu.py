@@ -1,14 +1,33 @@
 from calvincTools.cMenu.forms import MenuEditForm
-from sqlalchemy.orm import aliased
 from calvincTools.cMenu.initial_menus import initial_menus
+from calvincTools.cMenu.menucache import ( get_menu_tree, get_menu_group_list, )
+from calvincTools.cMenu.menucopy import ( MenuCopyOp, apply_menu_ops, copy_menu, )
+from calvincTools.cMenu.menutree import MENU_SLOT_COUNT
+from calvincTools.versionstamps import bump_version_stamp, STAMP_MENUS
 from calvincTools.decorators import superuser_required
 
 
 from flask import flash, redirect, request, url_for
-from sqlalchemy import case, func, literal, select
+from sqlalchemy import func, select
+from sqlalchemy.orm import lazyload
 
 from ..utils import checkTemplate_and_render
 
+# the form data of an empty option; edit_menu fills in MenuGroup_id and MenuID, and any db row over it
+EDIT_SLOT_TEMPLATE = tuple(
+    {
+        'OptionNumber': n,
+        'id': None,
+        'OptionText': '',
+        'Command': None,
+        'Argument': '',
+        'pword': '',
+        'top_line': False,
+        'bottom_line': False,
+    }
+    for n in range(1, MENU_SLOT_COUNT + 1)
+)
+
 @superuser_required
 def edit_menu_init():
     """
@@ -44,56 +63,43 @@ def edit_menu(group_id, menu_num):
 
     from ..models import ( db, menuItems, menuGroups, )
 
-    thisMenu = menuItems.query.filter_by(
-        MenuGroup_id=group_id,
-        MenuID=menu_num,
-        OptionNumber=0
-        ).first()
+    # the group and every row of this menu, in one query
+    stmt = (
+        select(menuGroups, menuItems)
+        .outerjoin(
+            menuItems,
+            (menuItems.MenuGroup_id == menuGroups.id) &                 # type: ignore
+            (menuItems.MenuID == menu_num)
+        )
+        .where(menuGroups.id == group_id)                               # type: ignore
+        .order_by(menuItems.OptionNumber)
+        # the join already loads both sides; skip the relationships' eager loads
+        .options(lazyload(menuGroups.menu_items), lazyload(menuItems.menu_group))   # type: ignore
+    )
+    rows = db.session.execute(stmt).all()
+    if not rows:
+        flash(f"Menu group {group_id} does not exist", "error")
+        return redirect(url_for("menu.edit_menu_init"))
+    group = rows[0][0]
+    db_by_option = {item.OptionNumber: item for _, item in rows if item is not None}
+    thisMenu = db_by_option.pop(0, None)
     if not thisMenu:
         flash(f"Menu {group_id},{menu_num} does not exist", "error")
         return redirect(url_for("menu.edit_menu_init"))
     menuName = thisMenu.OptionText if thisMenu else ""          # type: ignore
-    group = menuGroups.query.filter_by(id=group_id).first()
-    if not group:
-        flash(f"Menu group {group_id} does not exist", "error")
-        return redirect(url_for("menu.edit_menu_init"))
 
-    # construct the query to get all 20 options with left join to menuItems
-    # 1. Define the Recursive CTE (Numbers)
-    numbers_cte = select(literal(1).label("n")).cte(name="Numbers", recursive=True)
-    numbers_cte = numbers_cte.union_all(
-        select(numbers_cte.c.n + 1).where(numbers_cte.c.n < 20)
-    )
-    # 2. Setup the join and logic
-    # We alias the model to make the join clear
-    mnuItm = aliased(menuItems)
-    stmt = (
-        select(
-            numbers_cte.c.n.label("OptionNumber"),                                                      # type: ignore
-            mnuItm.id,
-            # Use coalesce logic similar to the SQL fix provided earlier
-            # (many errors suppressed here due to the placeholder vs actual runtime models)
-            case((mnuItm.MenuGroup_id != None, mnuItm.MenuGroup_id), else_=group_id).label("MenuGroup_id"),    # type: ignore
-            case((mnuItm.MenuID != None, mnuItm.MenuID), else_=menu_num).label("MenuID"),                      # type: ignore
-            case((mnuItm.OptionText != None, mnuItm.OptionText), else_="").label("OptionText"),         # type: ignore
-            mnuItm.Command,                                                                             # type: ignore
-            case((mnuItm.Argument != None, mnuItm.Argument), else_="").label("Argument"),               # type: ignore
-            case((mnuItm.pword != None, mnuItm.pword), else_="").label("pword"),                        # type: ignore
-            case((mnuItm.top_line != None, mnuItm.top_line), else_=False).label("top_line"),            # type: ignore
-            case((mnuItm.bottom_line != None, mnuItm.bottom_line), else_=False).label("bottom_line"),   # type: ignore
-        )
-        .select_from(numbers_cte)
-        .outerjoin(
-            mnuItm,
-            (numbers_cte.c.n == mnuItm.OptionNumber) &
-            (mnuItm.MenuGroup_id == group_id) &
-            (mnuItm.MenuID == menu_num)
-        )
-        .order_by(numbers_cte.c.n)
-    )
-    menu_items_forform = [
-        dict(row._mapping) for row in db.session.execute(stmt).fetchall()       # type: ignore      # pylint: disable=protected-access
-        ]
+    # all 20 options: the db row where there is one, else a blank slot
+    menu_items_forform = []
+    for blank_slot in EDIT_SLOT_TEMPLATE:
+        db_item = db_by_option.get(blank_slot['OptionNumber'])
+        slot = dict(blank_slot, MenuGroup_id=group_id, MenuID=menu_num)
+        if db_item is not None:
+            slot.update({
+                key: getattr(db_item, key) if getattr(db_item, key) is not None else blank_value
+                for key, blank_value in blank_slot.items() if key != 'OptionNumber'
+            })
+        menu_items_forform.append(slot)
+    # endfor EDIT_SLOT_TEMPLATE
 
     if request.method == "POST":
         form = MenuEditForm()
@@ -129,11 +135,7 @@ def edit_menu(group_id, menu_num):
 
         # has menu name changed? (OptionNumber=0)
         if form.menu_name.data != menuName:
-            title_item = menuItems.query.filter_by(
-                MenuGroup_id=group_id,
-                MenuID=menu_num,
-                OptionNumber=0
-            ).first()
+            title_item = thisMenu
             if title_item:
                 title_item.OptionText = form.menu_name.data     # type: ignore  
                 db.session.add(title_item)
@@ -151,13 +153,6 @@ def edit_menu(group_id, menu_num):
 
         # endif menu name changed
 
-        db_items = (
-            menuItems.query.filter_by(MenuGroup_id=group_id, MenuID=menu_num)
-            .filter(menuItems.OptionNumber > 0)                #type: ignore
-            .all()
-        )
-        db_by_option = {item.OptionNumber: item for item in db_items}
-
         allowed_fields = {
             "MenuGroup_id",
             "MenuID",
@@ -170,6 +165,9 @@ def edit_menu(group_id, menu_num):
             "bottom_line",
         }
 
+        # (option number, op, target as entered) for every copy/move requested
+        copy_ops = []
+
         for index, entry_form in enumerate(form.menu_items.entries, start=1):
             entry = entry_form.data
             opt_num = entry.get("OptionNumber") or index
@@ -230,7 +228,7 @@ def edit_menu(group_id, menu_num):
                 CopyTarget = entry.get('CopyTarget', '').split(',')
                 targetGroup = None
                 if len(CopyTarget)==2:
-                    targetGroup = menu_num  # default to same menu if only menu and option number provided
+                    targetGroup = group_id  # default to same group if only menu and option number provided
                     try:
                         targetMenu = int(CopyTarget[0])
                     except ValueError:
@@ -261,24 +259,12 @@ def edit_menu(group_id, menu_num):
                 if targetGroup is None or targetMenu is None or targetOption is None:
                     changes_made += (", " if changes_made else "") + f"Could not interpret {MoveORCopy} target {entry.get('CopyTarget')}"
                 else:
-                    if menuItems.query.filter_by(MenuGroup=targetGroup, MenuID=targetMenu, OptionNumber=targetOption).exists():     # type: ignore
-                        changes_made += (", " if changes_made else "") + f"Could not {MoveORCopy} to {entry.get('CopyTarget')} - target already exists."
-                    else:
-                        new_item = menuItems(
-                                MenuGroup_id = targetGroup,
-                                MenuID = targetMenu,
-                                OptionNumber = targetOption,
-                                OptionText = entry["OptionText"] or "",
-                                Command = entry["Command"],
-                                Argument = entry["Argument"]
-                            )
-                        db.session.add(new_item)
-                        if MoveORCopy == 'move' and db_item is not None:   # if move, delete original (but if copy, keep original)
-                            db.session.delete(db_item)
-                        # endif move (not just copy)
-
-                        changes_made += (", " if changes_made else "") + f"Option {opt_num} {MoveORCopy}d to {entry.get('CopyTarget')}."
-                    # endif target exists
+                    # applied with the rest of the batch once every option is processed
+                    copy_ops.append((opt_num, MenuCopyOp(
+                        group_id, menu_num, opt_num,
+                        targetGroup, targetMenu, targetOption,
+                        move=(MoveORCopy == 'move'),
+                        ), entry.get('CopyTarget')))
                 # endif valid target for copy/move
             # endif copy/move requested
 
@@ -287,17 +273,31 @@ def edit_menu(group_id, menu_num):
 
         # endfor menu_items.entries
 
+        # all copies and moves, checked against each other and the db in one batch
+        copy_result = apply_menu_ops([op for _, op, _ in copy_ops], commit=False)
+        for opt_num, op, copy_target in copy_ops:
+            if op in copy_result.errors:
+                copy_msg = copy_result.errors[op]
+            else:
+                copy_msg = f"Option {opt_num} {'moved' if op.move else 'copied'} to {copy_target}."
+            changes_made = changed_data.get(f'Option{opt_num}', '')
+            changed_data[f'Option{opt_num}'] = changes_made + (", " if changes_made else "") + copy_msg
+        # endfor copy_ops
+
         db.session.commit()
+        bump_version_stamp(STAMP_MENUS)
 
         flash(f"changed data: {changed_data}", "info")
         return redirect(url_for("menu.edit_menu", group_id=group_id, menu_num=menu_num))
     # endif form.validate_on_submit()
 
+    # the choice lists come from the menu cache
+    menu_tree = get_menu_tree(group_id)
     mnuGoto = {
         'menuGroup':group.GroupName,        # type: ignore
-        'menuGroup_choices': menuGroups.query.all(),
+        'menuGroup_choices': get_menu_group_list(),
         'menuID':menu_num,
-        'menuID_choices':menuItems.query.filter_by(MenuGroup_id=group_id, OptionNumber=0).all(),
+        'menuID_choices': menu_tree.menu_choices() if menu_tree else [],
         }
 
     cntext = {
@@ -316,6 +316,7 @@ def edit_menu(group_id, menu_num):
 def create_group(group_id, group_name, group_info):
     from ..models import ( menuGroups, )
     menugroup = menuGroups.create_newgroup(group_name=group_name, group_info=group_info, isSuperUser=False, group_id=group_id)
+    bump_version_stamp(STAMP_MENUS)
     flash(f"Group {group_id} with name {group_name} and info {group_info} would be created here", "info")
     flash("successful" if menugroup else "failed", "info")
     return redirect(request.referrer or url_for('menu.edit_menu', group_id=group_id, menu_num=0))
@@ -352,21 +353,16 @@ def create_menu(menu_group, menu_num, from_group=None, from_menu=None):
         if from_group is None:
             from_group = menu_group
 
-        source_items = menuItems.query.filter_by(
-            MenuGroup_id=from_group,
-            MenuID=from_menu
-        ).all()
-
-        for item in source_items:
-            new_item = menuItems(
-                MenuGroup_id=menu_group,
-                MenuID=menu_num,
-                OptionNumber=item.OptionNumber,
-                OptionText=item.OptionText,
-                Command=item.Command,
-                Argument=item.Argument
-            )
-            db.session.add(new_item)
+        # one INSERT ... SELECT for the whole menu
+        copy_result = copy_menu(int(from_group), int(from_menu), int(menu_group), int(menu_num), commit=False)
+        if copy_result.errors:
+            db.session.rollback()
+            for copy_msg in copy_result.errors.values():
+                flash(copy_msg, 'error')
+            # endfor copy_result.errors
+            return redirect(request.referrer or url_for('menu.edit_menu', group_id=menu_group, menu_num=menu_num))
+        # endif copy refused
+        created_msg = f'Menu created successfully - {copy_result.copied} options copied from {from_group},{from_menu}'
     else:
         new_items = initial_menus['existing.group.newmenu']
         # Create new menu from scratch
@@ -384,9 +380,11 @@ def create_menu(menu_group, menu_num, from_group=None, from_menu=None):
             ) for item in new_items
         ]
         db.session.add_all(menuitems)
+        created_msg = 'Menu created successfully'
 
     db.session.commit()
-    flash('Menu created successfully', 'success')
+    bump_version_stamp(STAMP_MENUS)
+    flash(created_msg, 'success')
     return redirect(url_for('menu.edit_menu', group_id=menu_group, menu_num=menu_num))
 
 
@@ -403,6 +401,7 @@ def remove_menu(menu_group, menu_num):
     ).delete()
 
     db.session.commit()
+    bump_version_stamp(STAMP_MENUS)
     flash('Menu removed successfully', 'success')
     return redirect(url_for('menu.edit_menu_init'))
 # edit_menu
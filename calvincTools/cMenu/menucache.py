@@ -0,0 +1,108 @@
+"""
+Process-local cache of menus.
+
+load_menu is by far the most-hit page, and a menu only changes when it is edited
+through the menu editor.  Three things are kept here, and all are dropped by the
+editor's write paths (edit_menu, create_menu, remove_menu, create_group) through the
+menus version stamp, so every worker drops them:
+  - a MenuTree per MenuGroup, so menu lookups are dictionary lookups
+  - the rendered 20-slot HTML list and menu name, keyed by (MenuGroup_id, MenuID,
+    script_root)
+  - the list of menu groups, for the menu editor
+"""
+from threading import Lock
+
+from flask import request
+
+from ..versionstamps import ( register_stamp_listener, STAMP_MENUS, )
+from .menutree import ( MenuTree, MenuGroupChoice, )
+
+# MenuGroup_id -> MenuTree
+_menu_trees: dict[int, MenuTree] = {}
+# (MenuGroup_id, MenuID, script_root) -> (menu_name, menu_html)
+_rendered_menus: dict[tuple[int, int, str], tuple[str, list[str]]] = {}
+_rendered_menus_lock = Lock()
+# bumped by invalidate_menu_cache, so nothing loaded or built before an invalidate is stored after it
+_cache_generation = {'n': 0}
+# every MenuGroup, in id order (None until loaded)
+_menu_group_list: dict[str, list[MenuGroupChoice] | None] = {'groups': None}
+
+
+def menu_cache_generation() -> int:
+    """
+    The cache's current generation.  Take it before building something to store, and
+    pass it to the store call: if the cache was invalidated meanwhile, nothing is stored.
+    """
+    return _cache_generation['n']
+# menu_cache_generation
+
+def get_menu_tree(menu_group: int) -> MenuTree | None:
+    """
+    Return the MenuTree for menu_group, loading it on first use.
+    Returns None if there is no such MenuGroup (that is not cached).
+    """
+    menu_group = int(menu_group)
+    tree = _menu_trees.get(menu_group)
+    if tree is None:
+        generation = menu_cache_generation()
+        tree = MenuTree.load(menu_group)
+        if tree is not None:
+            with _rendered_menus_lock:
+                # not if an invalidate ran while it loaded; it is used this once
+                if _cache_generation['n'] == generation:
+                    _menu_trees[menu_group] = tree
+    return tree
+# get_menu_tree
+
+def get_menu_group_list() -> list[MenuGroupChoice]:
+    """Return every menu group, loading the list on first use."""
+    groups = _menu_group_list['groups']
+    if groups is None:
+        generation = menu_cache_generation()
+        groups = MenuGroupChoice.load_all()
+        with _rendered_menus_lock:
+            if _cache_generation['n'] == generation:
+                _menu_group_list['groups'] = groups
+    return groups
+# get_menu_group_list
+
+
+def get_rendered_menu(menu_group: int, menu_num: int) -> tuple[str, list[str]] | None:
+    """
+    Return the cached (menu_name, menu_html) for a menu, or None if it isn't cached.
+    The HTML holds URLs, so it is kept per request.script_root (the app's mount point).
+    """
+    return _rendered_menus.get((int(menu_group), int(menu_num), request.script_root))
+# get_rendered_menu
+
+def store_rendered_menu(menu_group: int, menu_num: int, menu_name: str, menu_html: list[str], generation: int) -> None:
+    """Cache the rendered menu for (menu_group, menu_num), unless the cache has moved past generation."""
+    with _rendered_menus_lock:
+        if _cache_generation['n'] == generation:
+            _rendered_menus[(int(menu_group), int(menu_num), request.script_root)] = (menu_name, menu_html)
+# store_rendered_menu
+
+def invalidate_menu_cache(menu_group: int | None = None, menu_num: int | None = None) -> None:
+    """
+    Drop cached menus.
+    With no arguments, everything is dropped; with menu_group only, every menu in that
+    group is dropped; with both, only that one menu.
+    The group's MenuTree and the list of groups are dropped in either of the latter cases.
+    """
+    with _rendered_menus_lock:
+        _cache_generation['n'] += 1
+        _menu_group_list['groups'] = None
+        if menu_group is None:
+            _menu_trees.clear()
+            _rendered_menus.clear()
+        elif menu_num is None:
+            _menu_trees.pop(int(menu_group), None)
+            for key in [k for k in _rendered_menus if k[0] == int(menu_group)]:
+                del _rendered_menus[key]
+        else:
+            _menu_trees.pop(int(menu_group), None)
+            _rendered_menus.pop((int(menu_group), int(menu_num)), None)
+        # endif scope of invalidation
+# invalidate_menu_cache
+
+register_stamp_listener(STAMP_MENUS, invalidate_menu_cache)
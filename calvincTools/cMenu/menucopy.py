@@ -0,0 +1,210 @@
+"""
+Set-based copy and move of menu items.
+
+Restructuring a menu group used to cost an existence check, an insert and a delete per
+option.  Here a whole batch of operations is checked against the menu items' unique
+(MenuGroup_id, MenuID, OptionNumber) constraint in one query, then applied as
+INSERT ... SELECT statements (copies) and a single UPDATE (moves), in one transaction.
+
+    ops = [
+        MenuCopyOp(1, 0, 5, 2, 0, 5),               # copy group 1 menu 0 option 5 to group 2
+        MenuCopyOp(1, 0, 6, 1, 3, 1, move=True),    # move option 6 to menu 3, option 1
+    ]
+    result = apply_menu_ops(ops)
+    if result.errors: ...
+
+copy_menu() copies or moves a whole menu the same way.
+Callers bump the menus version stamp after the commit.
+"""
+from dataclasses import dataclass, field
+from typing import Iterable
+
+from sqlalchemy import and_, case, insert, literal_column, or_, select, union_all, update
+
+# how many copies go into one INSERT ... SELECT (SQLite allows 500 terms in a compound SELECT)
+COPY_BATCH_SIZE = 200
+
+
+@dataclass(frozen=True)
+class MenuCopyOp:
+    """Copy (or, with move=True, move) one menu option to another slot."""
+    from_group: int
+    from_menu: int
+    from_option: int
+    to_group: int
+    to_menu: int
+    to_option: int
+    move: bool = False
+
+    @property
+    def source(self) -> tuple[int, int, int]:
+        return (self.from_group, self.from_menu, self.from_option)
+
+    @property
+    def target(self) -> tuple[int, int, int]:
+        return (self.to_group, self.to_menu, self.to_option)
+
+    def __str__(self):
+        verb = 'move' if self.move else 'copy'
+        return f'{verb} {self.from_group},{self.from_menu}/{self.from_option} to {self.to_group},{self.to_menu}/{self.to_option}'
+
+
+@dataclass
+class MenuCopyResult:
+    """What apply_menu_ops did: how many options were copied and moved, and why any ops were refused."""
+    copied: int = 0
+    moved: int = 0
+    errors: dict[MenuCopyOp, str] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+def _slot_filter(menuItems, slots: Iterable[tuple[int, int, int]]):
+    """A WHERE clause matching any of slots, grouped per menu so it stays short."""
+    options_by_menu: dict[tuple[int, int], set[int]] = {}
+    for group, menu, option in slots:
+        options_by_menu.setdefault((group, menu), set()).add(option)
+    return or_(*[
+        and_(
+            menuItems.MenuGroup_id == group,
+            menuItems.MenuID == menu,
+            menuItems.OptionNumber.in_(sorted(options)),
+        )
+        for (group, menu), options in options_by_menu.items()
+    ])
+# _slot_filter
+
+def _copied_columns(menuItems) -> list:
+    """The menuItems columns a copy takes from its source (all but the key and the slot)."""
+    slot_columns = {'id', 'MenuGroup_id', 'MenuID', 'OptionNumber'}
+    return [col for col in menuItems.__table__.columns if col.key not in slot_columns]
+# _copied_columns
+
+
+def apply_menu_ops(ops: Iterable[MenuCopyOp], skip_conflicts: bool = True, commit: bool = True) -> MenuCopyResult:
+    """
+    Check and apply a batch of copy/move operations.
+
+    An op is refused if its source doesn't exist, its target slot is already taken, or
+    another op in the batch targets the same slot.  With skip_conflicts (the default) the
+    other ops are still applied; otherwise nothing is applied if any op is refused.
+    Pending changes in db.session are flushed first, so they are seen as they will be saved.
+    With commit=False the caller commits (or rolls back) along with its own changes.
+    """
+    from ..models import ( db, menuItems, )
+
+    ops = list(dict.fromkeys(ops))
+    result = MenuCopyResult()
+    if not ops:
+        return result
+
+    db.session.flush()
+
+    # the one conflict query: every source and target slot that is in the table
+    stmt = (
+        select(menuItems.id, menuItems.MenuGroup_id, menuItems.MenuID, menuItems.OptionNumber)   # type: ignore
+        .where(_slot_filter(menuItems, [op.source for op in ops] + [op.target for op in ops]))
+    )
+    existing = {
+        (row.MenuGroup_id, row.MenuID, row.OptionNumber): row.id
+        for row in db.session.execute(stmt)
+    }
+
+    targets_taken: set[tuple[int, int, int]] = set()
+    sources_moved: set[int] = set()
+    copies: list[tuple[MenuCopyOp, int]] = []
+    moves: list[tuple[MenuCopyOp, int]] = []
+    for op in ops:
+        source_id = existing.get(op.source)
+        if source_id is None:
+            result.errors[op] = f'Could not {op} - source does not exist.'
+        elif op.target in existing:
+            result.errors[op] = f'Could not {op} - target already exists.'
+        elif op.target in targets_taken:
+            result.errors[op] = f'Could not {op} - another option goes to that target.'
+        elif op.move and source_id in sources_moved:
+            result.errors[op] = f'Could not {op} - that option is already being moved.'
+        else:
+            targets_taken.add(op.target)
+            if op.move:
+                sources_moved.add(source_id)
+                moves.append((op, source_id))
+            else:
+                copies.append((op, source_id))
+        # endif op valid
+    # endfor ops
+
+    if result.errors and not skip_conflicts:
+        return result
+
+    try:
+        # copies: INSERT ... SELECT, with the target slot as literals, one SELECT per copy
+        menuItems_table = menuItems.__table__
+        copied_columns = _copied_columns(menuItems)
+        insert_columns = ['MenuGroup_id', 'MenuID', 'OptionNumber'] + [col.key for col in copied_columns]
+        for start in range(0, len(copies), COPY_BATCH_SIZE):
+            selects = [
+                select(
+                    # the (int) slot numbers are inlined, so every dialect can type the UNION's columns
+                    literal_column(str(int(op.to_group))).label('MenuGroup_id'),
+                    literal_column(str(int(op.to_menu))).label('MenuID'),
+                    literal_column(str(int(op.to_option))).label('OptionNumber'),
+                    *copied_columns,
+                ).where(menuItems_table.c.id == source_id)
+                for op, source_id in copies[start:start + COPY_BATCH_SIZE]
+            ]
+            source_select = selects[0] if len(selects) == 1 else union_all(*selects)
+            db.session.execute(insert(menuItems_table).from_select(insert_columns, source_select))
+        # endfor copy batches
+        result.copied = len(copies)
+
+        # moves: one UPDATE, each row's new slot picked by its id
+        if moves:
+            new_slots = {source_id: op for op, source_id in moves}
+            id_col = menuItems_table.c.id
+            db.session.execute(
+                update(menuItems_table)
+                .where(id_col.in_(list(new_slots)))
+                .values(
+                    MenuGroup_id=case({sid: op.to_group for sid, op in new_slots.items()}, value=id_col),
+                    MenuID=case({sid: op.to_menu for sid, op in new_slots.items()}, value=id_col),
+                    OptionNumber=case({sid: op.to_option for sid, op in new_slots.items()}, value=id_col),
+                )
+            )
+            # the moved rows may be in the session under their old slots
+            db.session.expire_all()
+        # endif moves
+        result.moved = len(moves)
+
+        if commit:
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    # end try
+
+    return result
+# apply_menu_ops
+
+
+def copy_menu(from_group: int, from_menu: int, to_group: int, to_menu: int, move: bool = False, commit: bool = True) -> MenuCopyResult:
+    """
+    Copy (or move) every option of a menu, title included, to another menu.
+    Refused, with nothing applied, if any of the target slots is already taken.
+    """
+    from ..models import ( db, menuItems, )
+
+    stmt = (
+        select(menuItems.OptionNumber)                                              # type: ignore
+        .where(menuItems.MenuGroup_id == from_group, menuItems.MenuID == from_menu)    # type: ignore
+        .order_by(menuItems.OptionNumber)
+    )
+    options = db.session.execute(stmt).scalars().all()
+    ops = [
+        MenuCopyOp(from_group, from_menu, option, to_group, to_menu, option, move=move)
+        for option in options
+    ]
+    return apply_menu_ops(ops, skip_conflicts=False, commit=commit)
+# copy_menu
@@ -0,0 +1,204 @@
+"""
+Bulk export and import of menu groups.
+
+The file is JSON lines, one menu group per line, with the group's items stored as
+columns plus rows so the column names aren't repeated for every item:
+
+    {"id": 1, "GroupName": "Main", "GroupInfo": "", "columns": ["MenuID", "OptionNumber", ...], "items": [[0, 0, "Main Menu", ...], ...]}
+
+import_menu_groups loads a whole file with one executemany per table, in a single
+transaction, so provisioning a site with dozens of groups is a few statements.
+
+    flask ctools export-menus menus.jsonl [--group 1 --group 2]
+    flask ctools import-menus menus.jsonl [--keep-ids] [--replace] [--suffix " (site 2)"]
+"""
+import json
+from contextlib import nullcontext
+from itertools import groupby
+from typing import IO, Any, Iterable, Iterator
+
+from sqlalchemy import bindparam, delete, func, insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from ..versionstamps import ( bump_version_stamp, STAMP_MENUS, )
+
+# the menuItems columns written for each item (MenuGroup_id is implied by the line)
+ITEM_COLUMNS = (
+    'MenuID', 'OptionNumber', 'OptionText', 'Command', 'Argument',
+    'pword', 'top_line', 'bottom_line',
+)
+EXPORT_BATCH_SIZE = 1000
+
+
+def _open_for(file_or_path: str | IO[str], mode: str):
+    """Open file_or_path if it is a path; otherwise use it as is (and leave it open)."""
+    if isinstance(file_or_path, str):
+        return open(file_or_path, mode, encoding='utf-8')
+    return nullcontext(file_or_path)
+# _open_for
+
+
+def iter_menu_groups(group_ids: Iterable[int] | None = None) -> Iterator[dict[str, Any]]:
+    """
+    Yield each menu group (all of them, or those in group_ids) in the export format.
+    Items are read in one streamed query, ordered by group.
+    """
+    from ..models import ( db, menuGroups, menuItems, )
+
+    group_stmt = select(menuGroups.id, menuGroups.GroupName, menuGroups.GroupInfo).order_by(menuGroups.id)    # type: ignore
+    item_stmt = (
+        select(menuItems.MenuGroup_id, *[getattr(menuItems, col) for col in ITEM_COLUMNS])
+        .where(menuItems.MenuGroup_id.is_not(None))                                            # type: ignore
+        .order_by(menuItems.MenuGroup_id, menuItems.MenuID, menuItems.OptionNumber)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    if group_ids is not None:
+        group_ids = [int(group_id) for group_id in group_ids]
+        group_stmt = group_stmt.where(menuGroups.id.in_(group_ids))                        # type: ignore
+        item_stmt = item_stmt.where(menuItems.MenuGroup_id.in_(group_ids))                 # type: ignore
+
+    groups = db.session.execute(group_stmt).all()
+    items_by_group = groupby(db.session.execute(item_stmt), key=lambda row: row[0])
+    next_items = next(items_by_group, None)
+    for group in groups:
+        items = []
+        # both queries are in group id order; skip items whose group wasn't selected
+        while next_items is not None and next_items[0] <= group.id:
+            if next_items[0] == group.id:
+                items = [list(row[1:]) for row in next_items[1]]
+            next_items = next(items_by_group, None)
+        yield {
+            'id': group.id,
+            'GroupName': group.GroupName,
+            'GroupInfo': group.GroupInfo or '',
+            'columns': list(ITEM_COLUMNS),
+            'items': items,
+        }
+    # endfor groups
+# iter_menu_groups
+
+def export_menu_groups(file_or_path: str | IO[str], group_ids: Iterable[int] | None = None) -> tuple[int, int]:
+    """Write menu groups (all of them, or those in group_ids) as JSON lines.  Returns (groups, items) written."""
+    n_groups = n_items = 0
+    with _open_for(file_or_path, 'w') as fp:
+        for group in iter_menu_groups(group_ids):
+            fp.write(json.dumps(group, separators=(',', ':')))
+            fp.write('\n')
+            n_groups += 1
+            n_items += len(group['items'])
+        # endfor groups
+    return n_groups, n_items
+# export_menu_groups
+
+
+def _reset_id_sequence(session, model) -> None:
+    """
+    After rows were inserted with explicit ids, move model's id sequence past them, so
+    later inserts don't collide.  Only PostgreSQL needs this; the other databases
+    supported here take the next id from the table.
+    """
+    dialect = session.get_bind(mapper=model).dialect
+    if dialect.name != 'postgresql':
+        return
+    table = model.__table__
+    # pg_get_serial_sequence parses its argument as SQL, so mixed-case names need quoting
+    table_name = dialect.identifier_preparer.format_table(table)
+    session.execute(
+        select(func.setval(
+            func.pg_get_serial_sequence(table_name, 'id'),
+            select(func.max(table.c.id)).scalar_subquery(),
+        )),
+        bind_arguments={'mapper': model},
+    )
+# _reset_id_sequence
+
+def import_menu_groups(
+        file_or_path: str | IO[str],
+        keep_ids: bool = False,
+        replace: bool = False,
+        name_suffix: str = '',
+    ) -> tuple[int, int]:
+    """
+    Load menu groups written by export_menu_groups, in one transaction.
+
+    keep_ids: insert the groups under their exported ids instead of new ones
+    replace: a group whose GroupName already exists is updated in place and its items
+        replaced; otherwise an existing GroupName is an error and nothing is loaded
+    name_suffix: appended to every GroupName, to clone groups into the same database
+
+    Returns (groups, items) loaded.  Raises ValueError if the file can't be loaded.
+    """
+    from ..models import ( db, menuGroups, menuItems, )
+
+    with _open_for(file_or_path, 'r') as fp:
+        groups = [json.loads(line) for line in fp if line.strip()]
+    if not groups:
+        return 0, 0
+    for group in groups:
+        group['GroupName'] = f"{group['GroupName']}{name_suffix}"
+    names = [group['GroupName'] for group in groups]
+    if len(set(names)) != len(names):
+        raise ValueError('The file has more than one group with the same GroupName.')
+
+    # Core statements on the tables themselves, so each list of rows is one executemany
+    groups_table = menuGroups.__table__
+    items_table = menuItems.__table__
+    try:
+        existing = dict(db.session.execute(
+            select(menuGroups.GroupName, menuGroups.id).where(menuGroups.GroupName.in_(names))        # type: ignore
+        ).tuples().all())
+        if existing and not replace:
+            raise ValueError(f"Menu groups already exist: {', '.join(sorted(existing))}")
+
+        # groups: update the ones being replaced, insert the rest
+        if existing:
+            db.session.execute(delete(items_table).where(items_table.c.MenuGroup_id.in_(list(existing.values()))))
+            db.session.execute(
+                update(groups_table).where(groups_table.c.id == bindparam('old_id')).values(GroupInfo=bindparam('new_info')),
+                [{'old_id': existing[group['GroupName']], 'new_info': group.get('GroupInfo', '')}
+                    for group in groups if group['GroupName'] in existing],
+            )
+        # endif replacing groups
+        new_groups = [
+            {
+                **({'id': group['id']} if keep_ids else {}),
+                'GroupName': group['GroupName'],
+                'GroupInfo': group.get('GroupInfo', ''),
+            }
+            for group in groups if group['GroupName'] not in existing
+        ]
+        if new_groups:
+            db.session.execute(insert(groups_table), new_groups)
+            # GroupName is unique, so read the new ids back by name (works without RETURNING)
+            new_names = [group['GroupName'] for group in new_groups]
+            existing.update(db.session.execute(
+                select(menuGroups.GroupName, menuGroups.id).where(menuGroups.GroupName.in_(new_names))    # type: ignore
+            ).tuples().all())
+            if keep_ids:
+                _reset_id_sequence(db.session, menuGroups)
+        # endif new groups
+
+        item_rows = []
+        for group in groups:
+            group_id = existing[group['GroupName']]
+            columns = group.get('columns', ITEM_COLUMNS)
+            item_rows.extend(
+                {'MenuGroup_id': group_id, **dict(zip(columns, item))}
+                for item in group.get('items', [])
+            )
+        # endfor groups
+        if item_rows:
+            db.session.execute(insert(items_table), item_rows)
+
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        raise ValueError(f'Could not import menu groups: {e}') from e
+    except ValueError:
+        db.session.rollback()
+        raise
+    # end try
+
+    bump_version_stamp(STAMP_MENUS)
+    return len(groups), len(item_rows)
+# import_menu_groups
@@ -0,0 +1,154 @@
+"""
+In-memory index of a whole menu group.
+
+A MenuTree is loaded with a single query and indexes every menu in a MenuGroup as
+{MenuID: [20 slots]}, with each menu's title row (OptionNumber 0) kept separately
+and the group's default menu precomputed.  Moving between menus is then a
+dictionary lookup instead of a round-trip to the database.
+"""
+from dataclasses import dataclass, field
+
+from sqlalchemy import select
+
+MENU_SLOT_COUNT = 20
+
+
+@dataclass(frozen=True)
+class MenuSlot:
+    """A read-only copy of one menuItems row."""
+    id: int
+    MenuGroup_id: int
+    MenuID: int
+    OptionNumber: int
+    OptionText: str
+    Command: int | None = None
+    Argument: str = ''
+    pword: str = ''
+    top_line: bool | None = None
+    bottom_line: bool | None = None
+    GroupName: str = ''
+
+    def __str__(self):
+        return f'menuGroup {self.GroupName}, {self.MenuID}/{self.OptionNumber}, {self.OptionText}'
+
+
+@dataclass(frozen=True)
+class MenuGroupChoice:
+    """A read-only copy of one menuGroups row, as listed in the menu editor."""
+    id: int
+    GroupName: str
+    GroupInfo: str = ''
+
+    def __str__(self):
+        return f'menuGroup {self.GroupName}'
+
+    @classmethod
+    def load_all(cls) -> 'list[MenuGroupChoice]':
+        """Every menu group, in id order."""
+        from ..models import ( db, menuGroups, )
+
+        stmt = select(menuGroups.id, menuGroups.GroupName, menuGroups.GroupInfo).order_by(menuGroups.id)   # type: ignore
+        return [cls(id=row.id, GroupName=row.GroupName, GroupInfo=row.GroupInfo or '') for row in db.session.execute(stmt)]
+
+
+@dataclass
+class MenuTree:
+    """
+    Every menu of one MenuGroup.
+
+    menus: MenuID -> list of MENU_SLOT_COUNT slots; slot i holds OptionNumber i+1, or None
+    titles: MenuID -> the OptionNumber 0 row of that menu
+    default_menu: the lowest MenuID that has a title row, or None if the group has no menu
+    """
+    MenuGroup_id: int
+    GroupName: str = ''
+    GroupInfo: str = ''
+    menus: dict[int, list[MenuSlot | None]] = field(default_factory=dict)
+    titles: dict[int, MenuSlot] = field(default_factory=dict)
+    default_menu: int | None = None
+
+    @classmethod
+    def load(cls, menu_group: int) -> 'MenuTree | None':
+        """
+        Load every menuItems row of menu_group in one query.
+        Returns None if there is no such MenuGroup.
+        """
+        from ..models import ( db, menuGroups, menuItems, )
+
+        stmt = (
+            select(
+                menuGroups.id.label('grp_id'),                              # type: ignore
+                menuGroups.GroupName,                                       # type: ignore
+                menuGroups.GroupInfo,                                       # type: ignore
+                menuItems.id.label('item_id'),                              # type: ignore
+                menuItems.MenuID,
+                menuItems.OptionNumber,
+                menuItems.OptionText,
+                menuItems.Command,                                          # type: ignore
+                menuItems.Argument,                                         # type: ignore
+                menuItems.pword,                                            # type: ignore
+                menuItems.top_line,                                         # type: ignore
+                menuItems.bottom_line,                                      # type: ignore
+            )
+            .select_from(menuGroups)
+            .outerjoin(menuItems, menuItems.MenuGroup_id == menuGroups.id)  # type: ignore
+            .where(menuGroups.id == menu_group)                             # type: ignore
+            .order_by(menuItems.MenuID, menuItems.OptionNumber)
+        )
+        rows = db.session.execute(stmt).all()
+        if not rows:
+            return None
+
+        tree = cls(
+            MenuGroup_id=rows[0].grp_id,
+            GroupName=rows[0].GroupName,
+            GroupInfo=rows[0].GroupInfo or '',
+        )
+        for row in rows:
+            if row.item_id is None:
+                # the group exists but has no menu items at all
+                continue
+            slot = MenuSlot(
+                id=row.item_id,
+                MenuGroup_id=tree.MenuGroup_id,
+                MenuID=row.MenuID,
+                OptionNumber=row.OptionNumber,
+                OptionText=row.OptionText,
+                Command=row.Command,
+                Argument=row.Argument or '',
+                pword=row.pword or '',
+                top_line=row.top_line,
+                bottom_line=row.bottom_line,
+                GroupName=tree.GroupName,
+            )
+            slots = tree.menus.setdefault(slot.MenuID, [None] * MENU_SLOT_COUNT)
+            if slot.OptionNumber == 0:
+                tree.titles[slot.MenuID] = slot
+            elif 1 <= slot.OptionNumber <= MENU_SLOT_COUNT:
+                slots[slot.OptionNumber - 1] = slot
+            # endif title vs option
+        # endfor rows
+
+        tree.default_menu = min(tree.titles) if tree.titles else None
+        return tree
+    # load
+
+    def has_menu(self, menu_num: int) -> bool:
+        """A menu exists if it has a title row (OptionNumber 0)."""
+        return menu_num in self.titles
+
+    def menu_name(self, menu_num: int, default: str = 'Menu') -> str:
+        title = self.titles.get(menu_num)
+        return title.OptionText if title else default
+
+    def menu_choices(self) -> list[MenuSlot]:
+        """The title row of every menu in the group, in MenuID order."""
+        return [self.titles[menu_num] for menu_num in sorted(self.titles)]
+
+    def menu_items(self, menu_num: int) -> list[MenuSlot]:
+        """The rows of a menu in OptionNumber order, title row first, empty slots omitted."""
+        items = [self.titles[menu_num]] if menu_num in self.titles else []
+        items.extend(slot for slot in self.menus.get(menu_num, []) if slot is not None)
+        return items
+
+# MenuTree
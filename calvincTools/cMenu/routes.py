@@ -10,6 +10,7 @@ from calvincTools.cMenu.editmenu import (
 from calvincTools.cMenu.commandhandlers import (
     form_browse, show_table,
     )
+from calvincTools.cMenu.commands import register_default_commands
 
 
 def register_menu_blueprint(app):
@@ -35,5 +36,7 @@ def register_menu_blueprint(app):
     menu_bp.add_url_rule('/showtable/<tablename>', 'show_table', show_table, methods=['GET'])
 
     app.register_blueprint(menu_bp)
+
+    register_default_commands()
     
     
\ No newline at end of file
@@ -0,0 +1,327 @@
+"""
+Guardrails for SQL run from the RunSQLStatement page (run_sql and download_sql).
+
+    - a statement timeout, enforced by the database where the dialect allows it
+      (CTOOLS_SQL_TIMEOUT, seconds; a number, or {dialect name: seconds})
+    - a budget on the rows and bytes fetched from one query
+      (CTOOLS_SQL_BUDGET_ROWS, CTOOLS_SQL_BUDGET_BYTES)
+    - explain_sql, for showing a query's plan and estimated row count before it is run
+
+A guard wraps everything done on its connection, fetching included:
+
+    guard = SQLGuard.for_session(db.session)
+    guard.start()
+    try:
+        result = db.session.execute(text(sql))
+        for batch in guard.partitions(result, 500):
+            ...
+    finally:
+        guard.stop()
+
+Timeouts per dialect:
+    postgresql  SET LOCAL statement_timeout (ends with the transaction)
+    mysql       SET SESSION MAX_EXECUTION_TIME (SELECTs only); MariaDB max_statement_time
+    mssql       the pyodbc connection's query timeout
+    oracle      the driver connection's call_timeout
+    sqlite      a progress handler that interrupts the statement once it runs too long
+"""
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Iterator
+
+from flask import current_app
+from sqlalchemy import text
+
+DEFAULT_SQL_TIMEOUT = 30                        # seconds
+DEFAULT_SQL_BUDGET_ROWS = 1_000_000
+DEFAULT_SQL_BUDGET_BYTES = 256 * 1024 * 1024
+SQLITE_PROGRESS_STEPS = 10_000                  # sqlite VM steps between deadline checks
+_NONSTRING_VALUE_BYTES = 8                      # what a number or date counts against the byte budget
+
+
+class SQLBudgetExceeded(Exception):
+    """Raised while fetching when a query returns more rows or bytes than its budget."""
+    pass
+
+
+def _dialect_key(connection) -> str:
+    dialect = connection.dialect
+    if dialect.name == 'mysql' and getattr(dialect, 'is_mariadb', False):
+        return 'mariadb'
+    return dialect.name
+# _dialect_key
+
+
+# dialect -> (set timeout, clear timeout); each takes (SQLGuard, seconds)
+def _pg_set(guard, seconds):
+    guard.connection.execute(text(f'SET LOCAL statement_timeout = {int(seconds * 1000)}'))
+def _pg_clear(guard, seconds):
+    pass    # SET LOCAL ends with the transaction
+
+def _mysql_set(guard, seconds):
+    guard.connection.execute(text(f'SET SESSION MAX_EXECUTION_TIME = {int(seconds * 1000)}'))
+def _mysql_clear(guard, seconds):
+    guard.connection.execute(text('SET SESSION MAX_EXECUTION_TIME = 0'))
+
+def _mariadb_set(guard, seconds):
+    guard.connection.execute(text(f'SET SESSION max_statement_time = {float(seconds)}'))
+def _mariadb_clear(guard, seconds):
+    guard.connection.execute(text('SET SESSION max_statement_time = 0'))
+
+def _mssql_set(guard, seconds):
+    guard.dbapi_connection.timeout = int(seconds)
+def _mssql_clear(guard, seconds):
+    guard.dbapi_connection.timeout = 0
+
+def _oracle_set(guard, seconds):
+    guard.dbapi_connection.call_timeout = int(seconds * 1000)
+def _oracle_clear(guard, seconds):
+    guard.dbapi_connection.call_timeout = 0
+
+def _sqlite_set(guard, seconds):
+    deadline = time.monotonic() + seconds
+    # a non-zero return interrupts the running statement
+    guard.dbapi_connection.set_progress_handler(
+        lambda: int(time.monotonic() > deadline), SQLITE_PROGRESS_STEPS)
+def _sqlite_clear(guard, seconds):
+    guard.dbapi_connection.set_progress_handler(None, SQLITE_PROGRESS_STEPS)
+
+_TIMEOUT_HANDLERS: dict[str, tuple[Callable, Callable]] = {
+    'postgresql': (_pg_set, _pg_clear),
+    'mysql': (_mysql_set, _mysql_clear),
+    'mariadb': (_mariadb_set, _mariadb_clear),
+    'mssql': (_mssql_set, _mssql_clear),
+    'oracle': (_oracle_set, _oracle_clear),
+    'sqlite': (_sqlite_set, _sqlite_clear),
+}
+
+
+# dialect -> whether a driver error is that dialect's statement timeout / cancel
+def _sqlite_timed_out(err):
+    return 'interrupted' in str(err)                # set_progress_handler's interrupt
+def _pg_timed_out(err):
+    # SQLSTATE 57014, query_canceled: psycopg2 has pgcode, psycopg 3 sqlstate
+    return '57014' in (getattr(err, 'pgcode', None), getattr(err, 'sqlstate', None))
+def _mysql_timed_out(err):
+    # ER_QUERY_TIMEOUT (MAX_EXECUTION_TIME); ER_STATEMENT_TIMEOUT (MariaDB max_statement_time)
+    return bool(err.args) and err.args[0] in (3024, 1969)
+def _mssql_timed_out(err):
+    return bool(err.args) and err.args[0] == 'HYT00'     # ODBC: timeout expired
+def _oracle_timed_out(err):
+    # call_timeout exceeded, and the cancel it causes
+    return any(code in str(err) for code in ('DPI-1067', 'ORA-03156', 'ORA-01013'))
+
+_TIMEOUT_ERRORS: dict[str, Callable[[Exception], bool]] = {
+    'postgresql': _pg_timed_out,
+    'mysql': _mysql_timed_out,
+    'mariadb': _mysql_timed_out,
+    'mssql': _mssql_timed_out,
+    'oracle': _oracle_timed_out,
+    'sqlite': _sqlite_timed_out,
+}
+
+
+def _row_bytes(row) -> int:
+    """Roughly what a row costs to hold and send: the length of its text, 8 for anything else."""
+    return sum(
+        len(val) if isinstance(val, (str, bytes)) else _NONSTRING_VALUE_BYTES
+        for val in row if val is not None
+    )
+# _row_bytes
+
+
+class SQLGuard:
+    """A statement timeout and a fetch budget for the queries run on one connection."""
+
+    def __init__(self, connection, timeout: float | None = None,
+                 max_rows: int | None = None, max_bytes: int | None = None):
+        self.connection = connection
+        # held so a driver-level timeout can be cleared even after the connection is released
+        self.dbapi_connection = connection.connection.dbapi_connection
+        self.dialect = _dialect_key(connection)
+        self.timeout = timeout
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.rows_fetched = 0
+        self.bytes_fetched = 0
+        self._timeout_set = False
+    # __init__
+
+    @classmethod
+    def for_session(cls, session) -> 'SQLGuard':
+        """A guard for the session's connection, configured from the app config."""
+        config = current_app.config
+        connection = session.connection()
+        timeout = config.get('CTOOLS_SQL_TIMEOUT', DEFAULT_SQL_TIMEOUT)
+        if isinstance(timeout, dict):
+            timeout = timeout.get(_dialect_key(connection), timeout.get('default', DEFAULT_SQL_TIMEOUT))
+        return cls(
+            connection,
+            timeout=timeout or None,
+            max_rows=config.get('CTOOLS_SQL_BUDGET_ROWS', DEFAULT_SQL_BUDGET_ROWS) or None,
+            max_bytes=config.get('CTOOLS_SQL_BUDGET_BYTES', DEFAULT_SQL_BUDGET_BYTES) or None,
+        )
+    # for_session
+
+    def start(self) -> None:
+        """Set the statement timeout on the connection (if the dialect has one)."""
+        handlers = _TIMEOUT_HANDLERS.get(self.dialect)
+        if self.timeout and handlers and not self._timeout_set:
+            handlers[0](self, self.timeout)
+            self._timeout_set = True
+    # start
+
+    def stop(self) -> None:
+        """
+        Take the statement timeout off the connection.  Safe to call more than once.
+        Call it before the session's rollback or commit, which release the connection.
+        """
+        if self._timeout_set:
+            self._timeout_set = False
+            try:
+                _TIMEOUT_HANDLERS[self.dialect][1](self, self.timeout)
+            except Exception as e:      # the connection may already be gone
+                current_app.logger.warning(f'Could not clear the SQL statement timeout: {e}')
+            # end try
+    # stop
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def _over_budget(self, row) -> str | None:
+        """Charge row to the budget; if it doesn't fit, leave the budget as is and say why."""
+        if self.max_rows and self.rows_fetched + 1 > self.max_rows:
+            return f'Query stopped: it returned more than {self.max_rows} rows.'
+        row_bytes = _row_bytes(row) if self.max_bytes else 0
+        if self.max_bytes and self.bytes_fetched + row_bytes > self.max_bytes:
+            return f'Query stopped: it returned more than {self.max_bytes // 1024 // 1024} MB.'
+        self.rows_fetched += 1
+        self.bytes_fetched += row_bytes
+        return None
+    # _over_budget
+
+    def partitions(self, result, size: int, skip: int = 0) -> Iterator[list]:
+        """
+        result.partitions(size), charged to the budget row by row.  Once a row doesn't fit,
+        the rows before it are yielded and then SQLBudgetExceeded is raised.
+        The first skip rows are read and dropped (for paging); they count against the row
+        budget but not the byte budget, so a far-off page can't read an unbounded result.
+        """
+        for batch in result.partitions(size):
+            if skip:
+                dropped = min(skip, len(batch))
+                if self.max_rows and self.rows_fetched + dropped > self.max_rows:
+                    raise SQLBudgetExceeded(f'Query stopped: reaching this page reads more than {self.max_rows} rows.')
+                self.rows_fetched += dropped
+                skip -= dropped
+                batch = batch[dropped:]
+            # endif skipping
+            exceeded = None
+            for n, row in enumerate(batch):
+                exceeded = self._over_budget(row)
+                if exceeded:
+                    batch = batch[:n]
+                    break
+            # endfor row
+            if batch:
+                yield batch
+            if exceeded:
+                raise SQLBudgetExceeded(exceeded)
+        # endfor batch
+    # partitions
+
+    def is_timeout(self, e: Exception) -> bool:
+        """Whether e is the driver's error for a statement stopped by this guard's timeout."""
+        err = getattr(e, 'orig', None) or e       # the DBAPI error under SQLAlchemy's wrapper
+        detect = _TIMEOUT_ERRORS.get(self.dialect)
+        return bool(self.timeout and detect and detect(err))
+    # is_timeout
+
+    def error_message(self, e: Exception) -> str:
+        """A message for an error raised while running or fetching a guarded query."""
+        if isinstance(e, SQLBudgetExceeded):
+            return str(e)
+        if self.is_timeout(e):
+            return f'Query cancelled: it ran longer than {self.timeout} seconds.'
+        return f'SQL Error: {str(e)}'
+    # error_message
+
+# SQLGuard
+    def end_of_class(self):
+        pass
+
+
+@dataclass
+class QueryPlan:
+    """A query's plan as the database reports it, and its estimated row count if it gives one."""
+    columns: list[str] = field(default_factory=list)
+    rows: list[tuple] = field(default_factory=list)
+    estimated_rows: int | None = None
+    supported: bool = True
+
+
+def _estimate_pg(columns, rows) -> int | None:
+    # the top node's line holds the estimate for the whole query: "... (cost=... rows=N width=...)"
+    match = re.search(r'rows=(\d+)', str(rows[0][0])) if rows else None
+    return int(match.group(1)) if match else None
+
+def _estimate_mysql(columns, rows) -> int | None:
+    # rows examined per table; a join's estimate is their product
+    if 'rows' not in columns:
+        return None
+    idx = columns.index('rows')
+    estimate = 1
+    for row in rows:
+        estimate *= int(row[idx] or 1)
+    return estimate
+
+def _estimate_mssql(columns, rows) -> int | None:
+    if 'EstimateRows' not in columns or not rows:
+        return None
+    return int(float(rows[0][columns.index('EstimateRows')] or 0))
+
+def explain_sql(session, sql: str) -> QueryPlan:
+    """
+    Ask the database for sql's plan without running it.
+    Returns a QueryPlan with supported=False for dialects without a plan statement here.
+    """
+    connection = session.connection()
+    dialect = _dialect_key(connection)
+    sql = sql.strip().rstrip(';')
+
+    if dialect == 'sqlite':
+        stmts, estimate = [f'EXPLAIN QUERY PLAN {sql}'], None   # sqlite gives no row estimate
+    elif dialect == 'postgresql':
+        stmts, estimate = [f'EXPLAIN {sql}'], _estimate_pg
+    elif dialect in ('mysql', 'mariadb'):
+        stmts, estimate = [f'EXPLAIN {sql}'], _estimate_mysql
+    elif dialect == 'mssql':
+        stmts, estimate = ['SET SHOWPLAN_ALL ON', sql], _estimate_mssql
+    else:
+        return QueryPlan(supported=False)
+    # endif dialect
+
+    plan = QueryPlan()
+    try:
+        for stmt in stmts:
+            result = connection.exec_driver_sql(stmt)
+            if result.returns_rows:
+                plan.columns = list(result.keys())
+                plan.rows = [tuple(row) for row in result]
+            # endif plan rows
+        # endfor stmts
+    finally:
+        if dialect == 'mssql':
+            # otherwise every later statement on this pooled connection only returns its plan
+            connection.exec_driver_sql('SET SHOWPLAN_ALL OFF')
+    # end try
+    if estimate is not None:
+        plan.estimated_rows = estimate(plan.columns, plan.rows)
+    return plan
+# explain_sql
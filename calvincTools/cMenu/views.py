@@ -7,10 +7,6 @@ from flask import (
     )
 from flask_login import login_required
 
-from sqlalchemy import (
-    func,
-)
-
 from calvincTools.utils import checkTemplate_and_render
 
 # db and models imported in each method so that the initalized versions are used
@@ -18,31 +14,24 @@ from calvincTools.utils import checkTemplate_and_render
 from . import (
     MENUCOMMAND, MENUCOMMANDDICTIONARY,
     )
+from .commands import ( get_menu_command, resolve_command_url, )
+from .menucache import (
+    get_menu_tree, get_rendered_menu, store_rendered_menu, menu_cache_generation,
+    )
 
 def get_default_menu(MenuGroup_id):
     """
     Django equivalent: DefaultMenu
+    The default menu is precomputed in the group's MenuTree.
     """
-    from ..models import ( db, menuItems, menuGroups, )
-    menu_group = menuGroups.query.get(MenuGroup_id)
-    if not menu_group: 
+    menu_tree = get_menu_tree(MenuGroup_id)
+    if not menu_tree: 
         return None, f'No such MenuGroup as {MenuGroup_id}'
     
-    menu_item = menuItems.query.filter_by(
-        MenuGroup_id=MenuGroup_id,
-        OptionNumber=0
-    ).first()
-    
-    if not menu_item: 
+    if menu_tree.default_menu is None: 
         return None, f'MenuGroup {MenuGroup_id} has no menu'
     
-    # Get minimum MenuID for this group with OptionNumber=0
-    result = db.session.query(func.min(menuItems.MenuID)).filter_by(
-        MenuGroup_id=MenuGroup_id,
-        OptionNumber=0
-    ).scalar()
-    
-    return result, ''
+    return menu_tree.default_menu, ''
 # get_default_menu
 
 
@@ -51,34 +40,33 @@ def load_menu(menu_group, menu_num):
     """
     Django equivalent:  LoadMenu
     Displays a menu to the user. 
+    Menus come from the group's cached MenuTree, and rendered menus are cached as well
+    (see menucache), so a cached menu costs no SQL at all.
     """
-    from ..models import ( menuItems, )
+    generation = menu_cache_generation()
+    cached_menu = get_rendered_menu(menu_group, menu_num)
+    if cached_menu is None:
+        menu_tree = get_menu_tree(menu_group)
+        if menu_tree is None or not menu_tree.has_menu(menu_num):
+            # Menu doesn't exist, try default
+            default_menu_num, error_msg = get_default_menu(menu_group)
+            if default_menu_num is not None:
+                flash(f'Menu {menu_num} does not exist', 'warning')
+                menu_num = default_menu_num
+                cached_menu = get_rendered_menu(menu_group, menu_num)
+            else:
+                flash(error_msg, 'warning')
+                return redirect(url_for('auth.logout'))
+        # endif menu exists
+    # endif menu cached
 
-    # Check if menu exists
-    menu_items_query = menuItems.query.filter_by(
-        MenuGroup_id=menu_group,
-        MenuID=menu_num,
-        OptionNumber=0
-    )
-    
-    if not menu_items_query.first():
-        # Menu doesn't exist, try default
-        default_menu_num, error_msg = get_default_menu(menu_group)
-        if default_menu_num is not None:
-            flash(f'Menu {menu_num} does not exist', 'warning')
-            menu_num = default_menu_num
-        else:
-            flash(error_msg, 'warning')
-            return redirect(url_for('auth.logout'))
-    
-    # Get all menu items for this menu
-    menu_items = menuItems.query.filter_by(
-        MenuGroup_id=menu_group,
-        MenuID=menu_num
-    ).order_by(menuItems.OptionNumber).all()
-    
-    menu_name = next((item.OptionText for item in menu_items if item.OptionNumber == 0), 'Menu')
-    menu_html = build_menu_html(menu_items, menu_group, menu_num)
+    if cached_menu is None:
+        menu_name = menu_tree.menu_name(menu_num)                                              # type: ignore
+        menu_html = build_menu_html(menu_tree.menu_items(menu_num), menu_group, menu_num)     # type: ignore
+        store_rendered_menu(menu_group, menu_num, menu_name, menu_html, generation)
+    else:
+        menu_name, menu_html = cached_menu
+    # endif menu cached
     sysver = current_app.config.get('APP_VERSION', 'unknown version')
 
     templt = 'menu/cMenu.html'
@@ -113,17 +101,14 @@ def build_menu_html(menu_items, menu_group, menu_num):  # pylint: disable=unused
             href = url_for('menu.load_menu', menu_group=menu_group, menu_num=item.Argument)
             target = ''
             onclick = ''
-        elif item.Command == MENUCOMMAND.ExitApplication:
-            # href = '#'
-            # onclick = ' onclick="event.preventDefault(); document.getElementById(\'lgoutfm\').submit();"'
-            arg = 'no-arg-no'
-            href = url_for('menu.handle_command', command_num=item.Command, command_arg=arg)
-            target = ''
-            onclick = ''
         else:
+            # link straight to the command's endpoint; go through handle_command only when it can't be resolved now
             arg = item.Argument if item.Argument else 'no-arg-no'
-            href = url_for('menu.handle_command', command_num=item.Command, command_arg=arg)
-            target = ' target="_blank"' if item.Command != MENUCOMMAND.ExitApplication else ''
+            href = resolve_command_url(item.Command, arg)
+            if href is None:
+                href = url_for('menu.handle_command', command_num=item.Command, command_arg=arg)
+            handler = get_menu_command(item.Command)
+            target = ' target="_blank"' if handler is None or handler.new_window else ''
             onclick = ''
         # endif command type
         
@@ -139,54 +124,20 @@ def build_menu_html(menu_items, menu_group, menu_num):  # pylint: disable=unused
 def handle_command(command_num, command_arg):
     """
     Django equivalent: HandleMenuCommand
+    Commands are dispatched through the command registry (see commands.py).
     """
     from flask import render_template
     
     command_name = MENUCOMMANDDICTIONARY.get(command_num, 'UnknownCommand')
-    endpt = None
-    extra_args = {}
+    handler = get_menu_command(command_num)
 
-    if command_num == MENUCOMMAND.FormBrowse:
-        endpt = 'menu.form_browse'
-        extra_args['formname'] = command_arg
-    elif command_num == MENUCOMMAND.OpenTable:
-        endpt = 'menu.show_table'
-        extra_args['tablename'] = command_arg
-    elif command_num == MENUCOMMAND.RunSQLStatement:
-        endpt = 'utils.run_sql'
-    elif command_num == MENUCOMMAND.ChangePW:
-        endpt = 'auth.change_password'
-    elif command_num == MENUCOMMAND.EditMenu:
-        endpt = 'menu.edit_menu_init'
-    elif command_num == MENUCOMMAND.EditParameters:
-        endpt = 'utils.edit_parameters'
-    elif command_num == MENUCOMMAND.EditGreetings:
-        endpt = 'utils.edit_greetings'
-    elif command_num == MENUCOMMAND.ExitApplication:
-        endpt = 'auth.logout'
-    elif command_num == MENUCOMMAND.EditUsers:
-        endpt = 'auth.user_list'
-    elif command_num == MENUCOMMAND.ShowRoutes_URLs:
-        endpt = 'utils.show_routes'
-    elif command_num == MENUCOMMAND.ShowForms:
-        endpt = 'utils.show_forms'
-    # need to implement:
-    # 21: 'RunCode',
-    # 32: 'ConstructSQLStatement',
-    # 36: 'LoadExtWebPage',
-    # 62: 'ChangeUser',
-    # 63: 'ChangeMenuGroup',
-    # 110: 'Show Help',
-    else:
+    if handler is None:
         flash(f"Invalid request for {command_name} ({command_num}) to be performed with argument {command_arg}")
-    # endif command_num
+    elif handler.endpoint in current_app.view_functions:
+        return redirect(handler.build_url(command_arg))
+    # endif handler
 
-    if endpt in current_app.view_functions:
-        return redirect(url_for(endpt, **extra_args))
-    else:
-        flash(f"{command_name} command not implemented yet", "error")
-        notreadyyet_msg = f"{command_name} command not implemented yet. Calvin needs more coffee."
-        return render_template("UnderConstruction.html", notreadyyet_msg=notreadyyet_msg)
-    # endif endpoint exists
+    flash(f"{command_name} command not implemented yet", "error")
+    notreadyyet_msg = f"{command_name} command not implemented yet. Calvin needs more coffee."
+    return render_template("UnderConstruction.html", notreadyyet_msg=notreadyyet_msg)
 # handle_command
-
@@ -13,8 +13,10 @@ from .blueprints import ctools_bp
 from .usr_auth.routes import register_auth_blueprint
 from .cMenu.routes import register_menu_blueprint
 from .utils.routes import register_util_blueprint
+from .cli import register_cli
 
 from .utils.Jinja2Tools import checkTemplate_and_render
+from .versionstamps import check_version_stamps
 
 from .CallerContext import CallerContext
 
@@ -126,6 +128,8 @@ class calvincTools(object):
         # Initialize extensions
         from .models import init_cDatabase      # can I move this back to main imports?
         self.cTools_tables = init_cDatabase(app, app_db, cTools_bind_key, cTools_tablenames, cTools_models)
+        # drop local caches that another worker has invalidated (see versionstamps.py)
+        app.before_request(check_version_stamps)
         # migrate = Migrate(app, cMenu_db)
         init_login_manager(app)
         
@@ -139,6 +143,7 @@ class calvincTools(object):
         register_auth_blueprint(app)
         register_menu_blueprint(app)
         register_util_blueprint(app)
+        register_cli(app)
         
         # /index is just a null page
         @app.route('/index')
@@ -0,0 +1,54 @@
+"""
+calvincTools commands for the flask CLI.
+
+    flask ctools ensure-schema [--force]
+    flask ctools export-menus FILE [--group ID ...]
+    flask ctools import-menus FILE [--keep-ids] [--replace] [--suffix TEXT]
+"""
+import click
+from flask.cli import AppGroup
+
+ctools_cli = AppGroup('ctools', help='calvincTools maintenance commands.')
+
+
+@ctools_cli.command('ensure-schema')
+@click.option('--force', is_flag=True, help='Run create_all even for engines already handled in this process.')
+def ensure_schema_command(force):
+    """Create missing tables, seed initial data and record the schema version."""
+    from .models import ( ensure_schema, CTOOLS_SCHEMA_VERSION, )
+
+    ensure_schema(force=force)
+    click.echo(f'calvincTools schema is at version {CTOOLS_SCHEMA_VERSION}.')
+# ensure_schema_command
+
+@ctools_cli.command('export-menus')
+@click.argument('filename', type=click.Path(dir_okay=False, writable=True))
+@click.option('--group', 'group_ids', type=int, multiple=True, help='Menu group id to export (repeatable; default all).')
+def export_menus_command(filename, group_ids):
+    """Write menu groups and their items to FILENAME as JSON lines."""
+    from .cMenu.menuio import export_menu_groups
+
+    n_groups, n_items = export_menu_groups(filename, group_ids or None)
+    click.echo(f'Exported {n_groups} menu groups ({n_items} items) to {filename}.')
+# export_menus_command
+
+@ctools_cli.command('import-menus')
+@click.argument('filename', type=click.Path(exists=True, dir_okay=False))
+@click.option('--keep-ids', is_flag=True, help='Insert groups under their exported ids.')
+@click.option('--replace', is_flag=True, help='Replace the items of groups whose GroupName already exists.')
+@click.option('--suffix', 'name_suffix', default='', help='Text appended to every GroupName.')
+def import_menus_command(filename, keep_ids, replace, name_suffix):
+    """Load menu groups written by export-menus, in one transaction."""
+    from .cMenu.menuio import import_menu_groups
+
+    try:
+        n_groups, n_items = import_menu_groups(filename, keep_ids=keep_ids, replace=replace, name_suffix=name_suffix)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Imported {n_groups} menu groups ({n_items} items) from {filename}.')
+# import_menus_command
+
+
+def register_cli(app):
+    """Add the "ctools" command group to the app's flask CLI."""
+    app.cli.add_command(ctools_cli)
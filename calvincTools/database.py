@@ -1,3 +1,8 @@
+import keyword
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import make_dataclass
+from functools import lru_cache
 from typing import List, Dict, Any
 
 ##########################################################
@@ -6,18 +11,221 @@ from typing import List, Dict, Any
 
 from sqlalchemy import (
     select, insert, update, delete, 
+    and_, or_, func, inspect, tuple_,
     )   # pylint: disable=unused-import
 from sqlalchemy.exc import SQLAlchemyError
-from typing import Generic, Sequence, TypeVar, Type     # pylint: disable=unused-import
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import UnaryExpression
+from typing import AsyncIterator, Generic, Iterator, Sequence, TypeVar, Type     # pylint: disable=unused-import
 
 T = TypeVar("T")  # entity type
 
+BULK_BATCH_SIZE = 1000      # rows per executemany in the bulk_ methods
+DELETE_CHUNK_SIZE = 500     # ids per DELETE ... IN (...) in remove_by_ids (under every dialect's parameter limit)
+LOOKUP_PARAM_LIMIT = 2000   # bind parameters per existing-key SELECT in the upsert fallback (SQL Server allows 2100)
+
+@lru_cache(maxsize=256)
+def projection_dto(model, field_names: tuple[str, ...]) -> type:
+    """
+    The frozen __slots__ dataclass for one projection of model (one class per model and
+    field_names, built on first use).  Positional construction matches the projection's columns.
+    """
+    return make_dataclass(
+        f'{model.__name__}Projection',
+        field_names,
+        frozen=True,
+        slots=True,
+    )
+# projection_dto
+
+
+def _keyset_columns(order_by) -> list[tuple[Any, bool]]:
+    """(column, descending) for each term of an order_by, for keyset comparisons."""
+    terms = order_by if isinstance(order_by, (list, tuple)) else [order_by]
+    keycols = []
+    for term in terms:
+        if isinstance(term, UnaryExpression) and term.modifier in (operators.desc_op, operators.asc_op):
+            keycols.append((term.element, term.modifier is operators.desc_op))
+        else:
+            keycols.append((term, False))
+    # endfor term
+    return keycols
+# _keyset_columns
+
+def _keyset_after(keycols: list[tuple[Any, bool]], after_key: Sequence) -> Any:
+    """
+    The WHERE clause for rows after after_key in keycols order:
+    (a > :a) OR (a = :a AND b > :b) OR ... -- spelled out, since not every dialect compares row values.
+    """
+    terms = []
+    for n, (col, descending) in enumerate(keycols):
+        equal_before = [keycols[i][0] == after_key[i] for i in range(n)]
+        beyond = col < after_key[n] if descending else col > after_key[n]
+        terms.append(and_(*equal_before, beyond))
+    # endfor col
+    return or_(*terms)
+# _keyset_after
+
+_UOW_SESSION_KEY = 'calvincTools_unit_of_work'    # marks, in session.info, a session shared by a unit of work
+
+class UnitOfWork:
+    """
+    The sessions shared by Repository calls inside one unit_of_work() block: one per
+    session factory, opened on first use, committed (or rolled back) and closed together.
+    """
+    def __init__(self):
+        self.sessions: dict[Any, Any] = {}
+    # __init__
+
+    def session_for(self, session_factory):
+        """The unit's session for session_factory, opened on first use."""
+        session = self.sessions.get(session_factory)
+        if session is None:
+            session = self.sessions[session_factory] = session_factory()
+            session.info[_UOW_SESSION_KEY] = True
+        return session
+    # session_for
+
+    def commit(self) -> None:
+        # one commit per database; these are separate transactions, committed in the order first used
+        for session in self.sessions.values():
+            session.commit()
+    # commit
+
+    def rollback(self) -> None:
+        for session in self.sessions.values():
+            session.rollback()
+    # rollback
+
+    def close(self) -> None:
+        for session in self.sessions.values():
+            session.info.pop(_UOW_SESSION_KEY, None)
+            session.close()
+        self.sessions.clear()
+    # close
+
+# UnitOfWork
+    def end_of_class(self):
+        pass
+
+_current_unit_of_work: ContextVar[UnitOfWork | None] = ContextVar('calvincTools_unit_of_work', default=None)
+
+@contextmanager
+def unit_of_work():
+    """
+    Share one session and transaction among the Repository calls in a block (any number of
+    Repositories, for any models), with one commit at the end - or a rollback of everything
+    if the block raises.
+
+        with unit_of_work():
+            order = orders.add(Order(...))
+            lines.bulk_add_from_listofdict([...])
+            stock.updatewhere(Stock.sku == sku, {'qty': Stock.qty - 1})
+
+    Inside the block, Repository methods flush instead of committing, and objects they return
+    stay attached to the shared session (so lazy loads and the identity map work).
+    A nested unit_of_work() joins the outer one.  The unit follows the current thread or
+    asyncio task (it is kept in a ContextVar).
+    """
+    outer = _current_unit_of_work.get()
+    if outer is not None:
+        yield outer
+        return
+
+    uow = UnitOfWork()
+    token = _current_unit_of_work.set(uow)
+    try:
+        yield uow
+        uow.commit()
+    except BaseException:
+        uow.rollback()
+        raise
+    finally:
+        _current_unit_of_work.reset(token)
+        uow.close()
+    # end try
+# unit_of_work
+
 class Repository(Generic[T]):
     def __init__(self, session_factory, model: Type[T]):
         self._session_factory = session_factory
         self._model = model
     # __init__
 
+    unit_of_work = staticmethod(unit_of_work)
+
+    @contextmanager
+    def _session_scope(self):
+        """
+        The session for one Repository call: the unit of work's shared session if one is open,
+        otherwise a new session, closed (rolling back anything uncommitted) at the end.
+        """
+        uow = _current_unit_of_work.get()
+        if uow is not None:
+            yield uow.session_for(self._session_factory)
+        else:
+            with self._session_factory() as session:
+                yield session
+    # _session_scope
+
+    @staticmethod
+    def _in_unit_of_work(session) -> bool:
+        return bool(session.info.get(_UOW_SESSION_KEY))
+
+    def _commit(self, session) -> None:
+        """Commit, or inside a unit of work just flush (the unit commits at its end)."""
+        if self._in_unit_of_work(session):
+            session.flush()
+        else:
+            session.commit()
+    # _commit
+
+    def _detach(self, session, *objs) -> None:
+        """Expunge objs from session so they can be used after it closes (left attached inside a unit of work)."""
+        if not self._in_unit_of_work(session):
+            for obj in objs:
+                session.expunge(obj)
+    # _detach
+
+    @contextmanager
+    def _all_or_nothing(self, session):
+        """
+        Make the statements run in the block one change: committed at the end, or rolled back
+        and the error raised.  Inside a unit of work the block runs in a savepoint, so a failure
+        undoes only this call and leaves the unit's earlier work in place.
+        """
+        if self._in_unit_of_work(session):
+            with session.begin_nested():
+                yield
+        else:
+            try:
+                yield
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+        # endif unit of work
+    # _all_or_nothing
+
+    def _select(self, whereclause=None, order_by=None, columns=None):
+        """
+        select(model) - or select(*columns) if columns are given - filtered by whereclause
+        and ordered by order_by (a column or a list/tuple of them).
+        """
+        stmt = select(*columns) if columns else select(self._model)
+
+        if whereclause is not None:
+            stmt = stmt.where(whereclause)
+
+        if order_by is not None:
+            if isinstance(order_by, (list, tuple)):
+                stmt = stmt.order_by(*order_by)
+            else:
+                stmt = stmt.order_by(order_by)
+
+        return stmt
+    # _select
+
     def get_all(
         self,
         whereclause=None,
@@ -28,49 +236,168 @@ class Repository(Generic[T]):
 
         :param fields: list/tuple of columns or ORM attributes (default: whole model)
             # fields is deprecated - get_all needs to always return an ORM instance - have the caller build a dict instead
+            # for a few columns without ORM instances, use get_projection
         :param whereclause: SQLAlchemy expression for filtering
         :param order_by: column(s) or ORM attributes for ordering
         """
 
         # Build select
-        stmt = select(self._model)
-
-        if whereclause is not None:
-            stmt = stmt.where(whereclause)
-
-        if order_by is not None:
-            if isinstance(order_by, (list, tuple)):
-                stmt = stmt.order_by(*order_by)
-            else:
-                stmt = stmt.order_by(order_by)
+        stmt = self._select(whereclause, order_by)
 
-        with self._session_factory() as session:
+        with self._session_scope() as session:
             rs = session.execute(stmt)
 
             # Full model objects
             results = rs.scalars().all()
-            for row in results:
-                session.expunge(row)
+            self._detach(session, *results)
 
         return results
     # get_all
+
+    def get_projection(
+        self,
+        fields,
+        whereclause=None,
+        order_by=None,
+        dto: bool = False,
+    ) -> list:
+        """
+        Retrieve only the given columns: no ORM instances are built, and nothing enters the
+        session's identity map, so a list page showing 4 of 30 columns pays for 4.
+
+        :param fields: list/tuple of ORM attributes (or their names) or labeled column expressions
+        :param whereclause: SQLAlchemy expression for filtering
+        :param order_by: column(s) or ORM attributes for ordering
+        :param dto: return frozen __slots__ dataclass instances (see projection_dto) instead of Rows;
+            raises ValueError if a column's name can't be a field name (a duplicate, or not an identifier)
+
+        :return: a list of Rows (immutable named tuples: row.name, row[0]), or of dataclass instances
+        """
+        columns = [getattr(self._model, fld) if isinstance(fld, str) else fld for fld in fields]
+        stmt = self._select(whereclause, order_by, columns=columns)
+
+        if dto:
+            # dataclass fields must be distinct identifiers; such columns need a .label()
+            keys = tuple(stmt.selected_columns.keys())
+            bad_keys = sorted({
+                key for key in keys
+                if keys.count(key) > 1 or not key.isidentifier() or keyword.iskeyword(key)
+            })
+            if bad_keys:
+                raise ValueError(f"get_projection(dto=True) can't name fields {', '.join(map(repr, bad_keys))}; label those columns")
+            dto_class = projection_dto(self._model, keys)
+        # endif dto
+
+        with self._session_scope() as session:
+            rs = session.execute(stmt)
+            if dto:
+                results = [dto_class(*row) for row in rs]
+            else:
+                results = rs.all()
+        # endwith
+
+        return results
+    # get_projection
+
+    def iter_all(
+        self,
+        whereclause=None,
+        order_by=None,
+        batch_size: int = 1000,
+    ) -> Iterator[T]:
+        """
+        Yield records like get_all, fetching batch_size at a time from a streamed result,
+        so memory holds one batch however many rows match.
+        Each batch is detached from the session before it is yielded (inside a unit of work
+        it stays in the shared session, which then grows with the result).
+        The session stays open until the iterator is exhausted or closed.
+
+        :param whereclause: SQLAlchemy expression for filtering
+        :param order_by: column(s) or ORM attributes for ordering
+        :param batch_size: rows fetched (and held) at a time
+        """
+        stmt = self._select(whereclause, order_by).execution_options(yield_per=batch_size)
+
+        with self._session_scope() as session:
+            for batch in session.scalars(stmt).partitions():
+                # drop the batch from the identity map, so the session doesn't grow with the result
+                self._detach(session, *batch)
+                yield from batch
+            # endfor batch
+    # iter_all
+
+    def page(
+        self,
+        after_key=None,
+        limit: int = 100,
+        order_by=None,
+        whereclause=None,
+    ) -> tuple[list[T], tuple | None]:
+        """
+        One page of records by keyset pagination: the limit records after after_key,
+        in order_by order (default: the primary key).  Unlike OFFSET, every page costs
+        the same, however deep into the table it is.
+
+        :param after_key: the next_key returned for the previous page (None for the first page);
+            a tuple of order_by values, or a single value when ordering by one column
+        :param limit: records per page
+        :param order_by: column(s) or ORM attributes, ending in something unique
+            (e.g. (Model.name, Model.id)); .desc() terms page downward
+        :param whereclause: SQLAlchemy expression for filtering
+
+        :return: (records, next_key); next_key is None on the last page
+        """
+        if order_by is None:
+            order_by = list(inspect(self._model).primary_key)       # type: ignore
+        keycols = _keyset_columns(order_by)
+        key_exprs = [col for col, _ in keycols]
+
+        stmt = select(self._model, *key_exprs)
+        if whereclause is not None:
+            stmt = stmt.where(whereclause)
+        if after_key is not None:
+            if not isinstance(after_key, (list, tuple)):
+                after_key = (after_key,)
+            stmt = stmt.where(_keyset_after(keycols, after_key))
+        stmt = stmt.order_by(*(order_by if isinstance(order_by, (list, tuple)) else [order_by])).limit(limit + 1)
+
+        with self._session_scope() as session:
+            rows = session.execute(stmt).all()
+            self._detach(session, *{row[0] for row in rows})
+        # endwith
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_key = tuple(rows[-1][1:]) if has_more else None
+        return [row[0] for row in rows], next_key
+    # page
+
+    def count(self, whereclause=None) -> int:
+        """The number of records matching whereclause (all of them if None), counted by the database."""
+        stmt = select(func.count()).select_from(self._model)     # type: ignore
+        if whereclause is not None:
+            stmt = stmt.where(whereclause)
+        with self._session_scope() as session:
+            return session.scalar(stmt) or 0
+    # count
     
     def get_by_id(self, id_: int, newifnotfound: bool = False) -> T | None:
-        with self._session_factory() as session:
+        with self._session_scope() as session:
             obj = session.get(self._model, id_)
             if obj:
-                session.expunge(obj)
+                self._detach(session, obj)
             elif newifnotfound:
                 obj = self._model(id=id_) # type: ignore
             return obj
     # get_by_id
 
     def add(self, entity: T) -> T:
-        with self._session_factory() as session:
+        with self._session_scope() as session:
             session.add(entity)
-            session.commit()
-            session.refresh(entity)
-            session.expunge(entity)
+            self._commit(session)
+            if not self._in_unit_of_work(session):
+                session.refresh(entity)
+            self._detach(session, entity)
         return entity
     # add
     def bulk_add_from_listofdict(self, entities: List[Dict]) -> Any:
@@ -78,54 +405,219 @@ class Repository(Generic[T]):
         Bulk insert from a list of dictionaries.
         """
         retval = None
-        with self._session_factory() as session:
+        with self._session_scope() as session:
+            # in a unit of work, a failure rolls back only this insert
+            savepoint = session.begin_nested() if self._in_unit_of_work(session) else None
             # Execute the bulk insert
             try:
                 session.execute(insert(self._model), entities)
-                session.commit()
+                if savepoint:
+                    savepoint.commit()
+                self._commit(session)
                 retval = True
             except SQLAlchemyError as e:
-                session.rollback()
+                (savepoint or session).rollback()
                 retval = ('database', e)
             except Exception as e:
-                session.rollback()
+                (savepoint or session).rollback()
                 retval = ('other', e)
         return retval
     #addmultiple ??
 
+    def _upsert_statement(self, dialect_name: str, conflict_columns, update_columns):
+        """The dialect's native upsert for self._model, or None if it has none here."""
+        if dialect_name in ('sqlite', 'postgresql'):
+            if dialect_name == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            stmt = dialect_insert(self._model)
+            if not update_columns:
+                return stmt.on_conflict_do_nothing(index_elements=conflict_columns)
+            return stmt.on_conflict_do_update(
+                index_elements=conflict_columns,
+                set_={col: stmt.excluded[col.key] for col in update_columns},
+            )
+        if dialect_name in ('mysql', 'mariadb'):
+            from sqlalchemy.dialects.mysql import insert as dialect_insert
+            stmt = dialect_insert(self._model)
+            # MySQL matches on any unique key, not just conflict_columns
+            return stmt.on_duplicate_key_update(
+                {col.key: stmt.inserted[col.key] for col in (update_columns or conflict_columns[:1])}
+            )
+        return None
+    # _upsert_statement
+
+    def _upsert_fallback(self, session, dialect_name: str, rows: list[dict], conflict_columns, update_columns) -> None:
+        """Upsert without native support: find which rows exist, then executemany UPDATE and INSERT."""
+        from sqlalchemy import bindparam      # pylint: disable=import-outside-toplevel
+        mapper = inspect(self._model)
+        table = mapper.local_table
+        conflict_attrs = [mapper.get_property_by_column(col).key for col in conflict_columns]   # type: ignore
+        # ORM attributes in the SELECT, so the session picks the model's bind
+        key_attrs = [getattr(self._model, attr) for attr in conflict_attrs]
+
+        def rowkey(row):
+            return tuple(row[attr] for attr in conflict_attrs)
+        # one SELECT per chunk of keys, each under the parameter limit
+        chunk_size = max(1, LOOKUP_PARAM_LIMIT // len(key_attrs))
+        existing = set()
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            if len(key_attrs) == 1:
+                match = key_attrs[0].in_([row[conflict_attrs[0]] for row in chunk])
+            elif dialect_name != 'mssql':
+                match = tuple_(*key_attrs).in_([rowkey(row) for row in chunk])
+            else:
+                # SQL Server can't compare row values
+                match = or_(*[and_(*[attr == val for attr, val in zip(key_attrs, rowkey(row))]) for row in chunk])
+            existing.update(tuple(found) for found in session.execute(select(*key_attrs).where(match)))
+        # endfor chunk
+
+        to_update = [row for row in rows if rowkey(row) in existing]
+        to_insert = [row for row in rows if rowkey(row) not in existing]
+        if to_update and update_columns:
+            # Core UPDATE by the conflict columns; the WHERE binds are prefixed so they don't clash with the SET binds
+            stmt = (
+                update(table)
+                .where(and_(*[col == bindparam(f'key_{col.key}') for col in conflict_columns]))
+                .values({col.key: bindparam(col.key) for col in update_columns})
+            )
+            params = [
+                {
+                    **{f'key_{col.key}': row[attr] for col, attr in zip(conflict_columns, conflict_attrs)},
+                    **{col.key: row[mapper.get_property_by_column(col).key] for col in update_columns},   # type: ignore
+                }
+                for row in to_update
+            ]
+            session.execute(stmt, params)
+        if to_insert:
+            session.execute(insert(self._model), to_insert)
+    # _upsert_fallback
+
+    def bulk_upsert(self, rows: List[Dict], conflict_cols=None, update_cols=None, batch_size: int = BULK_BATCH_SIZE) -> int:
+        """
+        Insert rows, updating the ones that already exist, in one transaction.
+
+        :param rows: list of dictionaries keyed by model attribute names
+        :param conflict_cols: the ORM attributes (or their names) identifying an existing row -
+            the primary key by default; they need a unique index
+        :param update_cols: the attributes updated on an existing row; by default every key of
+            the rows except conflict_cols.  An empty list leaves existing rows alone.
+        :param batch_size: rows per executemany
+
+        Uses INSERT ... ON CONFLICT on SQLite and PostgreSQL, and INSERT ... ON DUPLICATE KEY
+        UPDATE on MySQL/MariaDB (which matches on any unique key); elsewhere the existing rows
+        are found with a SELECT per batch (split to stay under the parameter limit), then updated
+        and inserted with executemany.
+
+        :return: the number of rows upserted.  If any batch fails, every batch is rolled back
+            (only this call's savepoint inside a unit of work) and the error raised.
+        """
+        if not rows:
+            return 0
+        mapper = inspect(self._model)
+
+        def column_of(fld):
+            return mapper.attrs[fld if isinstance(fld, str) else fld.key].columns[0]     # type: ignore
+        conflict_columns = [column_of(fld) for fld in conflict_cols] if conflict_cols else list(mapper.primary_key)  # type: ignore
+        if update_cols is None:
+            conflict_keys = {col.key for col in conflict_columns}
+            update_columns = [column_of(fld) for fld in rows[0] if column_of(fld).key not in conflict_keys]
+        else:
+            update_columns = [column_of(fld) for fld in update_cols]
+
+        with self._session_scope() as session, self._all_or_nothing(session):
+            dialect = session.get_bind(mapper=mapper).dialect
+            dialect_name = 'mariadb' if getattr(dialect, 'is_mariadb', False) else dialect.name
+            stmt = self._upsert_statement(dialect_name, conflict_columns, update_columns)
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                if stmt is not None:
+                    session.execute(stmt, batch)
+                else:
+                    self._upsert_fallback(session, dialect_name, batch, conflict_columns, update_columns)
+            # endfor batch
+        # endwith
+        return len(rows)
+    # bulk_upsert
+
+    def bulk_update_by_pk(self, rows: List[Dict], batch_size: int = BULK_BATCH_SIZE) -> int:
+        """
+        Update many records in one transaction, each row by its primary key
+        (an executemany UPDATE ... WHERE pk = ?; rows with the same keys are sent together).
+
+        :param rows: list of dictionaries keyed by model attribute names, each including the primary key
+        :return: the number of rows sent.  The transaction is rolled back and the error raised if any batch fails.
+        """
+        if not rows:
+            return 0
+        with self._session_scope() as session, self._all_or_nothing(session):
+            stmt = update(self._model)
+            for start in range(0, len(rows), batch_size):
+                session.execute(stmt, rows[start:start + batch_size])
+        # endwith
+        return len(rows)
+    # bulk_update_by_pk
+
     def remove(self, entity: T) -> None:
-        with self._session_factory() as session:
+        with self._session_scope() as session:
             obj = session.merge(entity)  # reattach if detached
             session.delete(obj)
-            session.commit()
+            self._commit(session)
         # endwith
     # remove
     def removewhere(self, whereclause) -> int:
-        with self._session_factory() as session:
+        with self._session_scope() as session:
             stmt = delete(self._model).where(whereclause)
             rs = session.execute(stmt)
             deleted_count = rs.rowcount    # Get the count of affected rows
-            session.commit()
+            self._commit(session)
         # endwith
         return deleted_count
         # endwith
     # removewhere
 
+    def remove_by_ids(self, ids, chunk_size: int = DELETE_CHUNK_SIZE) -> int:
+        """
+        Delete the records with the given primary keys, chunk_size ids per DELETE so each
+        statement stays under the database's parameter limit, all in one transaction.
+
+        :return: the number of rows deleted.  The transaction is rolled back and the error raised if a DELETE fails.
+        """
+        pk_columns = inspect(self._model).primary_key     # type: ignore
+        if len(pk_columns) != 1:
+            raise ValueError(f'remove_by_ids needs a single-column primary key; {self._model.__name__} has {len(pk_columns)}')    # type: ignore
+        pk_attr = getattr(self._model, inspect(self._model).get_property_by_column(pk_columns[0]).key)   # type: ignore
+        ids = list(ids)
+
+        deleted_count = 0
+        with self._session_scope() as session, self._all_or_nothing(session):
+            for start in range(0, len(ids), chunk_size):
+                stmt = delete(self._model).where(pk_attr.in_(ids[start:start + chunk_size]))
+                deleted_count += session.execute(stmt).rowcount      # type: ignore
+            # endfor chunk
+        # endwith
+        return deleted_count
+    # remove_by_ids
+
     def update(self, entity: T) -> T:
-        with self._session_factory() as session:
+        with self._session_scope() as session:
             obj = session.merge(entity)  # reattach if detached
-            session.commit()
-            session.expunge(obj)
+            self._commit(session)
+            if not self._in_unit_of_work(session):
+                session.refresh(obj)    # the commit expired it; reload before detaching, as add does
+            self._detach(session, obj)
         return obj
     # update
     def updatewhere(self, whereclause, values: dict) -> int:
-        with self._session_factory() as session:
+        with self._session_scope() as session:
             stmt = update(self._model) \
                 .where(whereclause) \
                 .values(**values)
             rs = session.execute(stmt)
             updated_count = rs.rowcount    # Get the count of affected rows
-            session.commit()
+            self._commit(session)
         # endwith
         return updated_count
     #updatewhere
@@ -133,3 +625,155 @@ class Repository(Generic[T]):
 # Repository
     def end_of_class(self):
         pass
+
+
+class AsyncRepository(Generic[T]):
+    """
+    Repository for asyncio code (Quart, async Flask views, ...), over an AsyncSession:
+
+        engine = create_async_engine('sqlite+aiosqlite:///app.sqlite')
+        repo = AsyncRepository(async_sessionmaker(engine), MenuItem)
+        items = await repo.get_all(MenuItem.is_active == True)
+        async for item in repo.stream_all(order_by=MenuItem.id):
+            ...
+
+    Same methods and results as Repository, awaited; returned objects are detached.
+    """
+    def __init__(self, session_factory, model: Type[T]):
+        self._session_factory = session_factory     # an async_sessionmaker
+        self._model = model
+    # __init__
+
+    _select = Repository._select
+
+    async def get_all(
+        self,
+        whereclause=None,
+        order_by=None
+    ) -> list[T]:
+        """
+        Retrieve records with optional filter and ordering.
+
+        :param whereclause: SQLAlchemy expression for filtering
+        :param order_by: column(s) or ORM attributes for ordering
+        """
+        stmt = self._select(whereclause, order_by)
+
+        async with self._session_factory() as session:
+            results = (await session.scalars(stmt)).all()
+            for row in results:
+                session.expunge(row)
+
+        return list(results)
+    # get_all
+
+    async def stream_all(
+        self,
+        whereclause=None,
+        order_by=None,
+        batch_size: int = 1000,
+    ) -> AsyncIterator[T]:
+        """
+        Yield records like get_all from a streamed result (stream_scalars), batch_size at a
+        time, without blocking the event loop or holding more than one batch.
+        The session stays open until the iterator is exhausted or closed.
+        """
+        stmt = self._select(whereclause, order_by).execution_options(yield_per=batch_size)
+
+        async with self._session_factory() as session:
+            result = await session.stream_scalars(stmt)
+            async for batch in result.partitions():
+                for obj in batch:
+                    session.expunge(obj)
+                for obj in batch:
+                    yield obj
+            # endfor batch
+    # stream_all
+
+    async def count(self, whereclause=None) -> int:
+        """The number of records matching whereclause (all of them if None), counted by the database."""
+        stmt = select(func.count()).select_from(self._model)     # type: ignore
+        if whereclause is not None:
+            stmt = stmt.where(whereclause)
+        async with self._session_factory() as session:
+            return (await session.scalar(stmt)) or 0
+    # count
+
+    async def get_by_id(self, id_: int, newifnotfound: bool = False) -> T | None:
+        async with self._session_factory() as session:
+            obj = await session.get(self._model, id_)
+            if obj:
+                session.expunge(obj)
+            elif newifnotfound:
+                obj = self._model(id=id_) # type: ignore
+            return obj
+    # get_by_id
+
+    async def add(self, entity: T) -> T:
+        async with self._session_factory() as session:
+            session.add(entity)
+            await session.commit()
+            await session.refresh(entity)
+            session.expunge(entity)
+        return entity
+    # add
+    async def bulk_add_from_listofdict(self, entities: List[Dict]) -> Any:
+        """
+        Bulk insert from a list of dictionaries.
+        Returns True, or (kind, exception) with kind 'database' or 'other' if the insert failed.
+        """
+        retval = None
+        async with self._session_factory() as session:
+            try:
+                await session.execute(insert(self._model), entities)
+                await session.commit()
+                retval = True
+            except SQLAlchemyError as e:
+                await session.rollback()
+                retval = ('database', e)
+            except Exception as e:
+                await session.rollback()
+                retval = ('other', e)
+        return retval
+    # bulk_add_from_listofdict
+
+    async def remove(self, entity: T) -> None:
+        async with self._session_factory() as session:
+            obj = await session.merge(entity)  # reattach if detached
+            await session.delete(obj)
+            await session.commit()
+        # endwith
+    # remove
+    async def removewhere(self, whereclause) -> int:
+        async with self._session_factory() as session:
+            stmt = delete(self._model).where(whereclause)
+            rs = await session.execute(stmt)
+            deleted_count = rs.rowcount    # Get the count of affected rows
+            await session.commit()
+        # endwith
+        return deleted_count
+    # removewhere
+
+    async def update(self, entity: T) -> T:
+        async with self._session_factory() as session:
+            obj = await session.merge(entity)  # reattach if detached
+            await session.commit()
+            await session.refresh(obj)
+            session.expunge(obj)
+        return obj
+    # update
+    async def updatewhere(self, whereclause, values: dict) -> int:
+        async with self._session_factory() as session:
+            stmt = update(self._model) \
+                .where(whereclause) \
+                .values(**values)
+            rs = await session.execute(stmt)
+            updated_count = rs.rowcount    # Get the count of affected rows
+            await session.commit()
+        # endwith
+        return updated_count
+    #updatewhere
+
+# AsyncRepository
+    def end_of_class(self):
+        pass
@@ -20,19 +20,20 @@ def superuser_required(f):
     return decorated_function
 
 
-def permission_required(permission):
+def permission_required(*permissions):
     """
-    Generic permission decorator. 
+    Generic permission decorator. The user must have every permission listed.
     Usage: @permission_required('can_edit_menus')
+           @permission_required('can_edit_menus', 'can_edit_users')
     """
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
             if not current_user. is_authenticated:
                 flash('You must be logged in. ', 'warning')
-                return redirect(url_for('auth. login'))
+                return redirect(url_for('auth.login'))
             
-            if not current_user.has_permission(permission):
+            if not current_user.has_all(*permissions):
                 flash('You do not have the required permission.', 'danger')
                 abort(403)
             
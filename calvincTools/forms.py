@@ -1,6 +1,7 @@
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, BooleanField, TextAreaField, SelectField, IntegerField
-from wtforms.validators import DataRequired, Email, EqualTo, Length, ValidationError
+from wtforms.validators import DataRequired, Email, EqualTo, Length, NumberRange, Optional, ValidationError
+from wtforms.widgets import HiddenInput
 
 from .models import User
 
@@ -49,6 +50,9 @@ class RawSQLForm(FlaskForm):
     """Django equivalent: fm_cRawSQL"""
     input_sql = TextAreaField('SQL Query', validators=[DataRequired()], 
                               render_kw={'cols': 120, 'rows': 4, 'autofocus': True})
+    page_size = IntegerField('Rows per page', validators=[Optional(), NumberRange(min=1)])
+    page = IntegerField(widget=HiddenInput(), default=1, validators=[Optional(), NumberRange(min=1)])
+    explain_first = BooleanField('Show the query plan first')
 
 
 class ParameterForm(FlaskForm):
@@ -1,12 +1,15 @@
 #pylint: disable=missing-module-docstring, missing-class-docstring, missing-function-docstring, unnecessary-pass, unnecessary-ellipsis, unused-argument
+import sys
 from typing import Any
+from contextlib import nullcontext
+from functools import lru_cache
 from datetime import datetime
+from weakref import WeakSet
 
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from sqlalchemy import (
     UniqueConstraint,
-    inspect,
     )
 from sqlalchemy.orm import (
     declarative_base,
@@ -18,13 +21,16 @@ from werkzeug.security import check_password_hash, generate_password_hash
 from werkzeug.local import LocalProxy
 
 from .mixins import _ModelInitMixin
+from .parameters import parameter_store
+from .versionstamps import ( bump_version_stamp, STAMP_PARAMETERS, )
+from .usr_auth.usercache import user_cache
 
 from .cMenu import MENUCOMMAND
 from .cMenu.initial_menus import initial_menus
 
 # Module-level db reference - will be set by init_cDatabase
 # Using a dictionary to hold the actual db so we can update it
-_db_holder = {'db': None}
+_db_holder = {'db': None, 'app': None}
 
 def get_db():
     """Get the current db instance."""
@@ -33,6 +39,98 @@ def get_db():
 # Create a LocalProxy that will always point to the current db
 db = LocalProxy(get_db)
 
+# Bump this whenever the calvincTools tables or their seed data change.
+# ensure_schema records it in cVersionStamps; fast-start mode compares against it.
+CTOOLS_SCHEMA_VERSION = 1
+SCHEMA_VERSION_STAMP = 'schema'
+
+# Engines whose tables have already been created by create_tables.  Keyed by the engine
+# itself: separate engines can share a URL (two sqlite:// in-memory binds, say)
+_schema_ensured_engines: WeakSet = WeakSet()
+
+def create_tables(flskapp=None, force: bool = False) -> None:
+    """
+    Create any missing tables, once per engine.
+
+    Each bind's engine is handled the first time it's seen; later calls are no-ops
+    unless force is True.  Model constructors don't check for their tables, so this
+    is the one place tables get created.
+
+    Args:
+        flskapp: The Flask application; if None, an app context must already be active
+        force: Run create_all again even for engines already handled
+    """
+    db_instance = get_db()
+    if db_instance is None:
+        raise RuntimeError("create_tables called before init_cDatabase")
+    
+    with (flskapp.app_context() if flskapp is not None else nullcontext()):
+        for bind_key, engine in db_instance.engines.items():
+            if force or engine not in _schema_ensured_engines:
+                db_instance.create_all(bind_key=bind_key)
+                _schema_ensured_engines.add(engine)
+        # endfor engines
+    # endwith app context
+# create_tables
+
+def schema_is_current(flskapp=None) -> bool:
+    """
+    True if the database's schema marker matches CTOOLS_SCHEMA_VERSION.
+    One query; a missing table or marker counts as not current.
+    """
+    from sqlalchemy import select
+    from sqlalchemy.exc import SQLAlchemyError
+
+    db_instance = get_db()
+    stamps = getattr(sys.modules[__name__], 'cVersionStamps')
+    with (flskapp.app_context() if flskapp is not None else nullcontext()):
+        try:
+            stmt = select(stamps.stamp_version).where(stamps.stamp_name == SCHEMA_VERSION_STAMP)   # type: ignore
+            marker = db_instance.session.execute(stmt).scalar_one_or_none()
+        except SQLAlchemyError:
+            marker = None
+        finally:
+            # don't leave a connection checked out (workers may fork after this)
+            db_instance.session.remove()
+    # endwith app context
+    return marker == CTOOLS_SCHEMA_VERSION
+# schema_is_current
+
+def ensure_schema(flskapp=None, force: bool = False) -> None:
+    """
+    Bring the database up to date: create missing tables (on ALL binds, even the
+    caller's), seed the initial menu group if there is none, and record
+    CTOOLS_SCHEMA_VERSION as the schema marker.
+
+    init_cDatabase calls this unless CTOOLS_FAST_START is set; in fast-start mode it
+    must be run explicitly, e.g. with the "flask ctools ensure-schema" command.
+
+    Args:
+        flskapp: The Flask application; defaults to the one given to init_cDatabase
+        force: Run create_all again even for engines already handled
+    """
+    if flskapp is None:
+        flskapp = _db_holder['app']
+    db_instance = get_db()
+    current_module = sys.modules[__name__]
+    menuGroups_cls = getattr(current_module, 'menuGroups')
+    stamps = getattr(current_module, 'cVersionStamps')
+
+    with flskapp.app_context():
+        create_tables(force=force)
+        # Initialize tables with default data
+        menuGroups_cls.createtable(flskapp)
+
+        marker = db_instance.session.get(stamps, SCHEMA_VERSION_STAMP)
+        if marker is None:
+            db_instance.session.add(stamps(stamp_name=SCHEMA_VERSION_STAMP, stamp_version=CTOOLS_SCHEMA_VERSION))
+        else:
+            marker.stamp_version = CTOOLS_SCHEMA_VERSION
+        db_instance.session.commit()
+        db_instance.session.remove()
+    # endwith app context
+# ensure_schema
+
 # Vanilla model definitions
 class MockQuery:
     """Mimics the Flask-SQLAlchemy query object interface."""
@@ -176,6 +274,26 @@ class cParameters(_ModelInitMixin, SkeletonModelBase):
         """Django equivalent: setcParm"""
         ...
 
+    @classmethod
+    def get_many(cls, parm_names, default: str = '') -> dict[str, str]:
+        ...
+
+    @classmethod
+    def get_int(cls, parm_name: str, default: int = 0) -> int:
+        ...
+
+    @classmethod
+    def get_float(cls, parm_name: str, default: float = 0.0) -> float:
+        ...
+
+    @classmethod
+    def get_bool(cls, parm_name: str, default: bool = False) -> bool:
+        ...
+
+    @classmethod
+    def get_json(cls, parm_name: str, default: Any = None) -> Any:
+        ...
+
 
 class cGreetings(_ModelInitMixin, SkeletonModelBase):
     """
@@ -194,6 +312,20 @@ class cGreetings(_ModelInitMixin, SkeletonModelBase):
         ...
 
 
+class cVersionStamps(_ModelInitMixin, SkeletonModelBase):
+    """
+    Generation counters for cross-process cache invalidation (see versionstamps.py).
+    
+    Note: This class will be dynamically converted to a proper db.Model
+    by init_cDatabase. Import this class normally in your code.
+    """
+    __bind_key__ = 'cToolsdb'
+    __tablename__ = 'cMenu_cVersionStamps'
+    
+    stamp_name: str
+    stamp_version: int
+
+
 # ============================================================================
 # USER MODEL
 # ============================================================================
@@ -227,14 +359,41 @@ class User(UserMixin, SkeletonModelBase):
         """Update the last login timestamp."""
         ...
 
+    @property
+    def permission_set(self) -> frozenset[str]:
+        """The user's permissions, lowercased."""
+        ...
+
+    def has_permission(self, permission_name: str) -> bool:
+        """Check if the user has a specific permission."""
+        ...
+
+    def has_all(self, *permission_names: str) -> bool:
+        """Check if the user has every one of the given permissions."""
+        ...
+
+    def has_any(self, *permission_names: str) -> bool:
+        """Check if the user has at least one of the given permissions."""
+        ...
+
     def __repr__(self):     # pyright: ignore[reportIncompatibleMethodOverride]
         ...
 
     def __init__(self, **kw: Any):
-        """Initialize a user instance. If the user table doesn't exist, it will be created."""
+        """Initialize a user instance."""
         ...
 
 
+@lru_cache(maxsize=1024)
+def parse_permissions(permissions: str | None) -> frozenset[str]:
+    """
+    Parse a comma-separated permissions string into a lowercased frozenset.
+    Memoized, so each distinct string is only split once per process.
+    """
+    return frozenset(permissions.lower().split(',')) if permissions else frozenset()
+# parse_permissions
+
+
 # ============================================================================
 # INITIALIZATION FUNCTION
 # ============================================================================
@@ -266,7 +425,7 @@ def init_cDatabase(
         db_instance: The SQLAlchemy instance
         cTools_bind_key: Optional bind key used for calvincTools models.
         cTools_tablenames: Optional dict to override table names using calvincTools
-            keys: menuGroups, menuItems, cParameters, cGreetings, User.
+            keys: menuGroups, menuItems, cParameters, cGreetings, User, cVersionStamps.
         cTools_models: Optional dict to override one or more model classes using
             the same keys as cTools_tablenames.
 
@@ -281,6 +440,7 @@ def init_cDatabase(
     """
     # Set the db reference so the LocalProxy works
     _db_holder['db'] = db_instance
+    _db_holder['app'] = flskapp
     
     if cTools_bind_key is None:
         cTools_bind_key='cToolsdb'
@@ -291,6 +451,7 @@ def init_cDatabase(
             'cParameters': 'cMenu_cParameters',
             'cGreetings': 'cMenu_cGreetings',
             'User': 'users',
+            'cVersionStamps': 'cMenu_cVersionStamps',
             }
     if cTools_models is None:
         cTools_models = {}
@@ -300,7 +461,6 @@ def init_cDatabase(
     menuGroups_relationship_target = cTools_models.get('menuGroups') if cTools_models.get('menuGroups') is not None else 'menuGroups'
     
     # Get reference to current module to update the classes
-    import sys
     current_module = sys.modules[__name__]
     
     # Create enhanced model classes that inherit from db.Model
@@ -327,7 +487,7 @@ def init_cDatabase(
                 """Create the table and populate with initial data if empty."""
                 with flskapp.app_context():
                     # Create tables if they don't exist
-                    db_instance.create_all()
+                    create_tables()
 
                     if not db_instance.session.query(cls).first():
                         cls.create_newgroup(
@@ -398,7 +558,7 @@ def init_cDatabase(
                 """Create the table and populate with initial data if empty."""
                 with flskapp.app_context():
                     # Create tables if they don't exist
-                    db_instance.create_all()
+                    create_tables()
 
                     if not db_instance.session.query(cls).first():
                         cls.create_newgroup(
@@ -444,14 +604,6 @@ def init_cDatabase(
             
             def __str__(self):
                 return f'{self.menu_group}, {self.MenuID}/{self.OptionNumber}, {self.OptionText}'
-
-            def __init__(self, **kw: Any):
-                """Initialize a new menuItems instance."""
-                inspector = inspect(db_instance.engine)
-                if not inspector.has_table(self.__tablename__):
-                    # If the table does not exist, create it
-                    db_instance.create_all()
-                super().__init__(**kw)
         # menuItems
         cTools_models['menuItems'] = menuItems
     else:
@@ -489,11 +641,31 @@ def init_cDatabase(
             def __str__(self):
                 return f'{self.parm_name} ({self.parm_value})'
             
+            # reads are served from the process-local parameter_store (see parameters.py)
             @classmethod
             def get_parameter(cls, parm_name: str, default: str = '') -> str:
                 """Django equivalent: getcParm"""
-                param = cls.query.filter_by(parm_name=parm_name).first()
-                return param.parm_value if param else default
+                return parameter_store.get(parm_name, default)
+            
+            @classmethod
+            def get_many(cls, parm_names, default: str = '') -> dict[str, str]:
+                return parameter_store.get_many(parm_names, default)
+            
+            @classmethod
+            def get_int(cls, parm_name: str, default: int = 0) -> int:
+                return parameter_store.get_int(parm_name, default)
+            
+            @classmethod
+            def get_float(cls, parm_name: str, default: float = 0.0) -> float:
+                return parameter_store.get_float(parm_name, default)
+            
+            @classmethod
+            def get_bool(cls, parm_name: str, default: bool = False) -> bool:
+                return parameter_store.get_bool(parm_name, default)
+            
+            @classmethod
+            def get_json(cls, parm_name: str, default: Any = None) -> Any:
+                return parameter_store.get_json(parm_name, default)
             
             @classmethod
             def set_parameter(cls, parm_name: str, parm_value: str, user_modifiable: bool = True, comments: str = ''):
@@ -511,6 +683,7 @@ def init_cDatabase(
                     db_instance.session.add(param)
                 
                 db_instance.session.commit()
+                bump_version_stamp(STAMP_PARAMETERS)
                 return param
             # set_parameter
         # cParameters
@@ -539,6 +712,26 @@ def init_cDatabase(
         cGreetings = cTools_models['cGreetings']
     # end if cGreetings not defined by caller
 
+    if cTools_models.get('cVersionStamps') is None:
+        class cVersionStamps(_ModelInitMixin, db_instance.Model):   #pylint: disable=redefined-outer-name
+            """Cache version stamps model with database columns."""
+            __bind_key__ = cTools_bind_key
+            __tablename__ = cTools_tablenames.get('cVersionStamps', 'cMenu_cVersionStamps')
+            
+            stamp_name: str = db_instance.Column(db_instance.String(100), primary_key=True)
+            stamp_version: int = db_instance.Column(db_instance.Integer, default=0, nullable=False)
+            
+            def __repr__(self):
+                return f'<VersionStamp {self.stamp_name}>'
+            
+            def __str__(self):
+                return f'{self.stamp_name} (version {self.stamp_version})'
+        # cVersionStamps
+        cTools_models['cVersionStamps'] = cVersionStamps
+    else:
+        cVersionStamps = cTools_models['cVersionStamps']
+    # end if cVersionStamps not defined by caller
+
     if cTools_models.get('User') is None:
         class User(UserMixin, db_instance.Model):   #pylint: disable=redefined-outer-name
             """
@@ -576,31 +769,59 @@ def init_cDatabase(
                 verdict = check_password_hash(self.password_hash, password)
                 return verdict
 
+            @property
+            def permission_set(self) -> frozenset[str]:
+                """The user's permissions, lowercased (parsed once per distinct permissions string)."""
+                return parse_permissions(self.permissions)
+
             def has_permission(self, permission_name: str) -> bool:
                 """Check if the user has a specific permission."""
                 if self.is_superuser:
                     return True  # Superusers have all permissions
-                permissions_list = self.permissions.lower().split(',') if self.permissions else []
-                return permission_name.lower() in permissions_list
+                return permission_name.lower() in self.permission_set
+
+            def has_all(self, *permission_names: str) -> bool:
+                """Check if the user has every one of the given permissions."""
+                if self.is_superuser:
+                    return True
+                permission_set = self.permission_set
+                return all(permission_name.lower() in permission_set for permission_name in permission_names)
+
+            def has_any(self, *permission_names: str) -> bool:
+                """Check if the user has at least one of the given permissions."""
+                if self.is_superuser:
+                    return True
+                permission_set = self.permission_set
+                return any(permission_name.lower() in permission_set for permission_name in permission_names)
 
             def update_last_login(self):
                 """Update the last login timestamp."""
+                user_id = self.id
                 self.last_login = datetime.now()
                 db_instance.session.commit()
+                user_cache.invalidate(user_id)
 
             def __repr__(self):
                 return f'<User {self.username}>'
-
-            def __init__(self, **kw: Any):
-                """Initialize a user instance."""
-                inspector = inspect(db_instance.engine)
-                if not inspector.has_table(self.__tablename__):
-                    # If the table does not exist, create it
-                    db_instance.create_all()
-                super().__init__(**kw)
         # User
         cTools_models['User'] = User
     else:
+        # If the model is already defined by the caller, give it has_all and has_any
+        # (used by permission_required) in terms of its own has_permission
+        if not hasattr(cTools_models['User'], 'has_all'):
+            def has_all(self, *permission_names: str) -> bool:
+                """Check if the user has every one of the given permissions."""
+                return all(self.has_permission(permission_name) for permission_name in permission_names)
+            # has_all
+            setattr(cTools_models['User'], 'has_all', has_all)
+        # endif has_all check
+        if not hasattr(cTools_models['User'], 'has_any'):
+            def has_any(self, *permission_names: str) -> bool:
+                """Check if the user has at least one of the given permissions."""
+                return any(self.has_permission(permission_name) for permission_name in permission_names)
+            # has_any
+            setattr(cTools_models['User'], 'has_any', has_any)
+        # endif has_any check
         User = cTools_models['User']
     # end if User not defined by caller
 
@@ -610,16 +831,18 @@ def init_cDatabase(
     setattr(current_module, 'cParameters', cParameters)
     setattr(current_module, 'cGreetings', cGreetings)
     setattr(current_module, 'User', User)
+    setattr(current_module, 'cVersionStamps', cVersionStamps)
     
-    # Create all tables in the database
-    with flskapp.app_context():
-        # db_instance.create_all(bind_key='cToolsdb')
-        db_instance.create_all()    # create ALL binds, even the caller's
-        # Initialize tables with default data
-        menuGroups.createtable(flskapp)
-        menuItems()
-        cParameters()
-        cGreetings()
-        User()
+    # Create all tables in the database and seed them - unless this is a fast start
+    # (CTOOLS_FAST_START) on a database whose schema marker is already current.
+    # Fast-start workers never run DDL; use ensure_schema() or "flask ctools ensure-schema".
+    if not flskapp.config.get('CTOOLS_FAST_START', False):
+        ensure_schema(flskapp)
+    elif not schema_is_current(flskapp):
+        flskapp.logger.warning(
+            f'calvincTools schema is not at version {CTOOLS_SCHEMA_VERSION}. '
+            'Run "flask ctools ensure-schema" (CTOOLS_FAST_START is set, so no tables were created).'
+            )
+    # endif fast start
     
     return (menuGroups, menuItems, cParameters, cGreetings, User)
@@ -0,0 +1,129 @@
+"""
+Process-local cache of the cParameters table.
+
+Parameters are read far more often than they are written, so the whole table is loaded
+once and served from memory.  Typed accessors (int, bool, float, json) memoize their
+parse results.  The cache is dropped by the cParameters version stamp, which
+cParameters.set_parameter and edit_parameters bump after they commit.
+
+    from calvincTools.parameters import parameter_store
+    timeout = parameter_store.get_int('SessionTimeout', 30)
+"""
+import json
+from threading import Lock
+from typing import Any, Callable, Iterable
+
+from sqlalchemy import select
+
+from .versionstamps import ( register_stamp_listener, STAMP_PARAMETERS, )
+
+_TRUE_STRINGS = frozenset({'true', 't', 'yes', 'y', 'on', '1'})
+_FALSE_STRINGS = frozenset({'false', 'f', 'no', 'n', 'off', '0', ''})
+
+
+def _parse_bool(val: str) -> bool:
+    lowered = val.strip().lower()
+    if lowered in _TRUE_STRINGS:
+        return True
+    if lowered in _FALSE_STRINGS:
+        return False
+    raise ValueError(f'{val!r} is not a boolean')
+# _parse_bool
+
+
+class cParameterStore:
+    """Read-through cache of parm_name -> parm_value for the whole cParameters table."""
+    _PARSE_FAILED = object()
+
+    def __init__(self):
+        self._values: dict[str, str] | None = None
+        self._parsed: dict[tuple[str, str], Any] = {}
+        # bumped by invalidate, so a load that started before it doesn't store stale rows
+        self._generation = 0
+        self._lock = Lock()
+    # __init__
+
+    def _snapshot(self) -> tuple[dict[str, str], dict[tuple[str, str], Any]]:
+        """The cached table and the parse results that belong to it, loading them if needed."""
+        with self._lock:
+            values, parsed, generation = self._values, self._parsed, self._generation
+        if values is not None:
+            return values, parsed
+
+        from .models import ( db, cParameters, )
+        stmt = select(cParameters.parm_name, cParameters.parm_value)      # type: ignore
+        values = dict(db.session.execute(stmt).tuples().all())
+        parsed = {}
+        with self._lock:
+            if self._generation == generation:
+                self._values, self._parsed = values, parsed
+        # endwith lock
+        # if invalidate ran meanwhile, these rows are served this once but not kept
+        return values, parsed
+    # _snapshot
+
+    def _load(self) -> dict[str, str]:
+        return self._snapshot()[0]
+    # _load
+
+    def invalidate(self) -> None:
+        """Drop the cached table; the next read reloads it."""
+        with self._lock:
+            self._generation += 1
+            self._values = None
+            self._parsed = {}
+    # invalidate
+
+    def get(self, parm_name: str, default: str = '') -> str:
+        """Django equivalent: getcParm"""
+        return self._load().get(parm_name, default)
+    # get
+
+    def get_many(self, parm_names: Iterable[str], default: str = '') -> dict[str, str]:
+        """Return {parm_name: parm_value} for each of parm_names, with default for any missing."""
+        values = self._load()
+        return {parm_name: values.get(parm_name, default) for parm_name in parm_names}
+    # get_many
+
+    def _get_parsed(self, parm_name: str, kind: str, parse: Callable[[str], Any], default: Any) -> Any:
+        # the parse cache comes with its table, so a result never lands in a newer table's cache
+        values, parsed_cache = self._snapshot()
+        if parm_name not in values:
+            return default
+        key = (parm_name, kind)
+        parsed = parsed_cache.get(key, None)
+        if parsed is None and key not in parsed_cache:
+            try:
+                parsed = parse(values[parm_name])
+            except (ValueError, TypeError):
+                parsed = self._PARSE_FAILED
+            parsed_cache[key] = parsed
+        return default if parsed is self._PARSE_FAILED else parsed
+    # _get_parsed
+
+    def get_int(self, parm_name: str, default: int = 0) -> int:
+        """The parameter as an int, or default if it's missing or not an integer."""
+        return self._get_parsed(parm_name, 'int', lambda v: int(v.strip()), default)
+
+    def get_float(self, parm_name: str, default: float = 0.0) -> float:
+        """The parameter as a float, or default if it's missing or not a number."""
+        return self._get_parsed(parm_name, 'float', lambda v: float(v.strip()), default)
+
+    def get_bool(self, parm_name: str, default: bool = False) -> bool:
+        """The parameter as a bool (true/yes/on/1 or false/no/off/0), or default."""
+        return self._get_parsed(parm_name, 'bool', _parse_bool, default)
+
+    def get_json(self, parm_name: str, default: Any = None) -> Any:
+        """
+        The parameter parsed as JSON, or default if it's missing or not valid JSON.
+        The parsed value is shared by every caller - don't modify it.
+        """
+        return self._get_parsed(parm_name, 'json', json.loads, default)
+
+# cParameterStore
+    def end_of_class(self):
+        pass
+
+
+parameter_store = cParameterStore()
+register_stamp_listener(STAMP_PARAMETERS, parameter_store.invalidate)
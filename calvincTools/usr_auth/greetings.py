@@ -0,0 +1,59 @@
+"""
+Cached greetings for the login page.
+
+login_view shows one random greeting per render.  Rather than loading every cGreetings
+row each time, the ids and texts are kept in memory and reloaded only after the
+cGreetings version stamp is bumped (edit_greetings does so when it commits).
+"""
+import random
+from threading import Lock
+
+from sqlalchemy import select
+
+from calvincTools.versionstamps import ( register_stamp_listener, STAMP_GREETINGS, )
+
+
+class GreetingProvider:
+    """Keeps (id, greeting) for every cGreetings row and hands out random ones."""
+
+    def __init__(self):
+        self._greetings: list[tuple[int, str]] | None = None
+        # bumped by invalidate, so a load that started before it doesn't store stale rows
+        self._generation = 0
+        self._lock = Lock()
+    # __init__
+
+    def _load(self) -> list[tuple[int, str]]:
+        with self._lock:
+            greetings, generation = self._greetings, self._generation
+        if greetings is None:
+            from ..models import ( db, cGreetings, )
+            stmt = select(cGreetings.id, cGreetings.greeting)       # type: ignore
+            greetings = list(db.session.execute(stmt).tuples().all())
+            with self._lock:
+                if self._generation == generation:
+                    self._greetings = greetings
+            # endwith lock
+        return greetings
+    # _load
+
+    def invalidate(self) -> None:
+        """Drop the cached greetings; the next request reloads them."""
+        with self._lock:
+            self._generation += 1
+            self._greetings = None
+    # invalidate
+
+    def random_greeting(self) -> str:
+        """A random greeting, or '' if there are none."""
+        greetings = self._load()
+        return random.choice(greetings)[1] if greetings else ''
+    # random_greeting
+
+# GreetingProvider
+    def end_of_class(self):
+        pass
+
+
+greeting_provider = GreetingProvider()
+register_stamp_listener(STAMP_GREETINGS, greeting_provider.invalidate)
@@ -0,0 +1,103 @@
+"""
+Bounded TTL cache of user snapshots for Flask-Login's user_loader.
+
+Every authenticated request used to cost a users-table query in load_user.  The column
+values of each loaded user are kept here as a detached instance, keyed by user id plus
+a fingerprint of password_hash and active_status; load_user merges the snapshot into
+the request's session without emitting SQL.  The fingerprint is also stored in the
+Flask session at login, so a session never gets a snapshot taken under a different
+password or active status than the one it logged in with; load_user logs such a
+session out.
+
+Entries live for CTOOLS_USER_CACHE_TTL seconds (default 60; 0 disables the cache), at
+most CTOOLS_USER_CACHE_SIZE of them (default 1024).  They are dropped by
+user_list_view and change_password_view (through the users version stamp) and by
+User.update_last_login.
+"""
+import hashlib
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from calvincTools.versionstamps import ( register_stamp_listener, STAMP_USERS, )
+
+DEFAULT_TTL = 60            # seconds
+DEFAULT_MAXSIZE = 1024
+FINGERPRINT_SESSION_KEY = '_user_fp'
+
+
+def user_fingerprint(user: Any) -> str:
+    """A short digest of the fields that decide whether a user may stay logged in."""
+    raw = f"{getattr(user, 'password_hash', '')}|{getattr(user, 'active_status', '')}"
+    return hashlib.sha256(raw.encode()).hexdigest()[:16]
+# user_fingerprint
+
+
+class UserSnapshotCache:
+    """user id -> (expires_at, fingerprint, detached snapshot), least recently used first."""
+
+    def __init__(self):
+        self._entries: OrderedDict[int, tuple[float, str, Any]] = OrderedDict()
+        self._lock = Lock()
+    # __init__
+
+    def get(self, user_id: int, fingerprint: str | None) -> Any | None:
+        """The cached snapshot for user_id, if it's fresh and taken under fingerprint."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, entry_fingerprint, snapshot = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            # a session holding another fingerprint misses, but doesn't evict the entry
+            # that sessions with the current one are using
+            if entry_fingerprint != fingerprint:
+                return None
+            self._entries.move_to_end(user_id)
+        return snapshot
+    # get
+
+    def put(self, user: Any, ttl: float, maxsize: int) -> str:
+        """Cache a snapshot of a freshly loaded user; returns its fingerprint."""
+        fingerprint = user_fingerprint(user)
+        if ttl <= 0:
+            return fingerprint
+
+        # copy the loaded column values into a new detached instance, bypassing __init__
+        mapper = inspect(type(user))
+        snapshot = mapper.class_manager.new_instance()
+        for attr in mapper.column_attrs:
+            set_committed_value(snapshot, attr.key, getattr(user, attr.key))
+        make_transient_to_detached(snapshot)
+
+        with self._lock:
+            self._entries[user.id] = (time.monotonic() + ttl, fingerprint, snapshot)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > maxsize:
+                self._entries.popitem(last=False)
+        return fingerprint
+    # put
+
+    def invalidate(self, user_id: int | None = None) -> None:
+        """Drop one user's snapshot, or all of them."""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+    # invalidate
+
+# UserSnapshotCache
+    def end_of_class(self):
+        pass
+
+
+user_cache = UserSnapshotCache()
+register_stamp_listener(STAMP_USERS, user_cache.invalidate)
@@ -1,6 +1,5 @@
 #pylint: disable=no-member
 from functools import wraps
-import random
 
 from flask import (
     redirect, url_for, abort,
@@ -16,6 +15,12 @@ from sqlalchemy import select
 from calvincTools.models import db as app_db
 from calvincTools.sysver import sysver
 from calvincTools.utils import checkTemplate_and_render
+from calvincTools.versionstamps import ( bump_version_stamp, STAMP_USERS, )
+from calvincTools.usr_auth.greetings import greeting_provider
+from calvincTools.usr_auth.usercache import (
+    user_cache, user_fingerprint, FINGERPRINT_SESSION_KEY,
+    DEFAULT_TTL as USER_CACHE_TTL, DEFAULT_MAXSIZE as USER_CACHE_MAXSIZE,
+    )
 
 
 # db and models imported in each method so that the initalized versions are used
@@ -37,10 +42,33 @@ def init_login_manager(app):
     
     @login_manager.user_loader
     def load_user(user_id):
-        """Load user by ID for Flask-Login."""
+        """
+        Load user by ID for Flask-Login.
+        A fresh cached snapshot (see usercache.py) is merged into the session without SQL.
+        A session whose fingerprint no longer matches the user (password or active
+        status changed since it logged in) is logged out.
+        """
         from ..models import User
-        stmt = select(User).where(User.id == int(user_id))
+        user_id = int(user_id)
+        session_fingerprint = session.get(FINGERPRINT_SESSION_KEY)
+        snapshot = user_cache.get(user_id, session_fingerprint)
+        if snapshot is not None:
+            return app_db.session.merge(snapshot, load=False)
+        
+        stmt = select(User).where(User.id == user_id)
         u = app_db.session.execute(stmt).scalar_one_or_none()
+        if u is not None:
+            fingerprint = user_cache.put(
+                u,
+                ttl=current_app.config.get('CTOOLS_USER_CACHE_TTL', USER_CACHE_TTL),
+                maxsize=current_app.config.get('CTOOLS_USER_CACHE_SIZE', USER_CACHE_MAXSIZE),
+                )
+            if session_fingerprint is None:
+                # a session restored from the remember-me cookie
+                session[FINGERPRINT_SESSION_KEY] = fingerprint
+            elif session_fingerprint != fingerprint:
+                return None
+            # endif session fingerprint
         return u
     
     return login_manager
@@ -124,17 +152,14 @@ def login_view():
     """
     Handle user login (GET and POST).
     """
-    from ..models import User, cGreetings
+    from ..models import User
     
     if current_user.is_authenticated:
         flash('You were already logged in. You have been logged out.', 'info')
         # return a blank page here
         return redirect(url_for('auth.logout'))
     
-    # grts = cGreetings.query.all()
-    stmt = select(cGreetings)
-    grts = app_db.session.execute(stmt).scalars().all()
-    Greeting = random.choice(grts).greeting if grts else '' # type: ignore
+    Greeting = greeting_provider.random_greeting()
 
     appname = current_app.config.get('APP_NAME', 'The App')
     app_version = current_app.config.get('APP_VERSION', '0.0.0')
@@ -201,6 +226,7 @@ def login_view():
         
         # set initial menugroup
         session['menu_group'] = user.menuGroup if user.menuGroup else 1
+        session[FINGERPRINT_SESSION_KEY] = user_fingerprint(user)
         session['TIME_ZONE'] = localTZ
 
         # Redirect to next page or home
@@ -222,6 +248,7 @@ def login_view():
         user = User.query.filter_by(is_superuser=True).first()
         if user:
             login_user(user)
+            session[FINGERPRINT_SESSION_KEY] = user_fingerprint(user)
             flash(f'Logged in as {user.username}', 'info')
             mgroup = user.menuGroup if user.menuGroup else 1
             return redirect(url_for('menu.load_menu', menu_group=mgroup, menu_num=0))  # Redirect to the menu page after login
@@ -393,6 +420,8 @@ def change_password_view():
         current_user.set_password(new_password)
         
         db.session.commit()
+        session[FINGERPRINT_SESSION_KEY] = user_fingerprint(current_user)
+        bump_version_stamp(STAMP_USERS)
         
         flash('Your password has been changed successfully.', 'success')
         # return a blank page here
@@ -577,6 +606,7 @@ def user_list_view():
                     db.session.add(user)
                 
                 db.session.commit()
+                bump_version_stamp(STAMP_USERS)
                 flash('All users saved successfully!', 'success')
                 return redirect(url_for('auth.user_list'))
             # endfor each user in form
@@ -634,6 +664,7 @@ class LoginView(MethodView):
         assert isinstance(remember, bool), "Remember must be a boolean value"
         login_user(user, remember=remember)
         user.update_last_login()
+        session[FINGERPRINT_SESSION_KEY] = user_fingerprint(user)
         
         flash(f'Welcome back, {user.username}!', 'success')
         next_page = request.args.get('next')
@@ -1,11 +1,36 @@
-from typing import (Dict, List, Any, )
+import datetime
+import os
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import (Dict, List, Any, IO, Callable, Iterable, Sequence, )
 
-from openpyxl import (Workbook, )
+from openpyxl import (Workbook, load_workbook, )
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import PatternFill, Font, fills, colors
+from openpyxl.utils import get_column_letter
 from openpyxl.utils.datetime import from_excel, WINDOWS_EPOCH
 
 ExcelWorkbook_fileext = ".XLSX"
 
+# the header row: bold, shaded grey
+_HEADER_FONT = Font(bold=True)
+_HEADER_FILL = PatternFill(fill_type=fills.FILL_SOLID,
+                start_color=colors.Color("00808080"),
+                end_color=colors.Color("00808080")
+                )
+
+
+def _freeze_panes_cell(freezecols: int) -> str:
+    """The freeze_panes address that freezes the header row and freezecols columns at the left."""
+    return f'{get_column_letter(max(freezecols, 0) + 1)}2'
+
+def _excel_value(val):
+    """openpyxl takes numbers, strings, bools and dates; anything else is written as text."""
+    if val is None or isinstance(val, (str, int, float, bool, Decimal, datetime.date, datetime.time, datetime.timedelta)):
+        return val
+    return str(val)
+
 
 def Excelfile_fromqs(qset:List[Dict[str, Any]], flName:str|None = None,
                      freezecols:int = 0, returnFileName: bool = False) -> Workbook|str:
@@ -47,17 +72,12 @@ def Excelfile_fromqs(qset:List[Dict[str, Any]], flName:str|None = None,
         for row in qlist:
             ws.append(list(row.values())) # type: ignore
 
-        # make header row bold, shade it grey, freeze it
+        # make header row bold, shade it grey, freeze it (and freezecols columns)
         # ws.show_gridlines = True  #Nope - this is a R/O attribute
         for cell in ws[1]: # type: ignore
-            cell.font = Font(bold=True)
-            cell.fill = PatternFill(fill_type=fills.FILL_SOLID,
-                            start_color=colors.Color("00808080"),
-                            end_color=colors.Color("00808080")
-                            )
-        #TODO: convert row1 and cols:freezecols to an address (A=0, B=1, C=2 etc) for line below
-        ws.freeze_panes ='A2'
-        #TODO: if freezecols passed, freeze them, too
+            cell.font = _HEADER_FONT
+            cell.fill = _HEADER_FILL
+        ws.freeze_panes = _freeze_panes_cell(freezecols)
 
 
     # save the workbook
@@ -75,6 +95,72 @@ def Excelfile_fromqs(qset:List[Dict[str, Any]], flName:str|None = None,
     #endif returnFileName
 
 
+def Excelfile_stream(rows: Iterable[Any], dest: str|IO[bytes],
+                     fieldnames: Sequence[str]|None = None,
+                     freezecols: int = 0, sheet_title: str|None = None) -> int:
+    """
+    Write rows to an Excel file without holding them in memory (openpyxl write-only mode),
+    for exports too big for Excelfile_fromqs.
+
+    rows: any iterable of mappings, of sequences (tuples, SQLAlchemy Rows) or of objects;
+        a SQLAlchemy Result works as is, and supplies the field names
+    dest: a file name (".XLSX" is added if it has no extension) or a binary file-like object
+    fieldnames: the header row, and for mappings and objects the fields written, in order;
+        by default the Result's keys or the first row's keys
+    freezecols = 0: the number of columns to freeze to the left
+    The top row contains the field names, is always frozen, is bold and is shaded grey
+
+    Rows are consumed as they are written; only the workbook's compressed output is held.
+    Returns the number of data rows written
+    """
+    if fieldnames is None and hasattr(rows, 'keys'):
+        fieldnames = list(rows.keys())     # type: ignore    # a SQLAlchemy Result
+    row_iter = iter(rows)
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=sheet_title)
+
+    first = next(row_iter, None)
+    if first is not None and fieldnames is None:
+        if isinstance(first, Mapping):
+            fieldnames = list(first)
+        elif not isinstance(first, Sequence):
+            fieldnames = [key for key in vars(first) if not key.startswith('_')]
+    # endif fieldnames from first row
+
+    if fieldnames:
+        # a write-only sheet writes its view with the first row, so freeze before appending
+        ws.freeze_panes = _freeze_panes_cell(freezecols)
+        header = []
+        for name in fieldnames:
+            cell = WriteOnlyCell(ws, value=name)
+            cell.font = _HEADER_FONT
+            cell.fill = _HEADER_FILL
+            header.append(cell)
+        ws.append(header)
+    # endif fieldnames
+
+    nrows = 0
+    row = first
+    while row is not None:
+        if isinstance(row, Mapping):
+            values = [row.get(name) for name in fieldnames] # type: ignore
+        elif isinstance(row, Sequence) and not isinstance(row, str):
+            values = row
+        else:
+            values = [getattr(row, name, None) for name in fieldnames] # type: ignore
+        ws.append([_excel_value(val) for val in values])
+        nrows += 1
+        row = next(row_iter, None)
+    # endwhile rows
+
+    if isinstance(dest, str) and not os.path.splitext(dest)[1]:
+        dest = dest + ExcelWorkbook_fileext
+    wb.save(dest)
+    return nrows
+# Excelfile_stream
+
+
 class UpldSprdsheet():
     """Base class for handling spreadsheet uploads with field validation.
     
@@ -108,6 +194,42 @@ class UpldSprdsheet():
     
     SprdsheetFlds = {}  # key will be the SprdsheetName, value is a SprdsheetFldDescriptor
 
+    BatchSize = 1000    # rows per executemany INSERT in process_spreadsheet
+    Workers = 0         # processes cleaning rows in process_spreadsheet (0: clean in this process)
+    ChunkSize = 2000    # rows per chunk handed to a worker
+
+    def _compile_cleaner(self, fld) -> Callable[[Any], tuple[bool, Any]]:
+        """Build the cleaner for one field: a function val -> (usefld, cleanval), as cleanupfld describes.
+        
+        The field's descriptor is looked up once here, so cleaning a column is one call per cell.
+        """
+        if fld not in self.SprdsheetFlds:
+            # just feed the value back
+            return lambda val: (True, val)
+        AllowedTypes = tuple(self.SprdsheetFlds[fld]['AllowedTypes'])
+        if not AllowedTypes:
+            return lambda val: (False, None) if val is None else (True, str(val))
+        if len(AllowedTypes) == 1:
+            (onetype, onecleanproc), = AllowedTypes
+            return lambda val: (True, onecleanproc(val)) if isinstance(val, onetype) else (False, None)
+
+        def clean(val):
+            for type, cleanproc in AllowedTypes:
+                if isinstance(val, type):
+                    return True, cleanproc(val)
+            #endfor type, cleanproc
+            return False, None
+        return clean
+    # _compile_cleaner
+
+    def _cleaner(self, fld) -> Callable[[Any], tuple[bool, Any]]:
+        """The compiled cleaner for fld, built on first use."""
+        cleaners = self.__dict__.setdefault('_cleaners', {})
+        if fld not in cleaners:
+            cleaners[fld] = self._compile_cleaner(fld)
+        return cleaners[fld]
+    # _cleaner
+
     def cleanupfld(self, fld, val):
         """Clean and validate a field value according to its allowed types.
         
@@ -119,34 +241,219 @@ class UpldSprdsheet():
             tuple: (usefld, cleanval) where usefld is True if the field should be used,
                 and cleanval is the cleaned value.
         """
-        usefld = False
-        cleanval = None
+        return self._cleaner(fld)(val)
+
+    def _clean_chunk(self, colspecs, chunk) -> list[tuple[int, dict|None, 'SprdsheetRowError|None']]:
+        """Clean a chunk of rows: [(rownum, row values)] -> [(rownum, record, None) or (rownum, None, error)].
         
-        if fld not in self.SprdsheetFlds:
-            # just feed the value back
-            usefld = True
-            cleanval = val
-        elif not self.SprdsheetFlds[fld]['AllowedTypes']:
-            usefld = (val is not None)
-            if usefld: cleanval = str(val)
-        else:
-            for type, cleanproc in self.SprdsheetFlds[fld]['AllowedTypes']:
-                if isinstance(val, type):
-                    usefld = True
-                    cleanval = cleanproc(val)
+        colspecs: [(column index, spreadsheet field, model field)], from the header
+        """
+        colplan = [(idx, sprdsheet_fld, model_fld, self._cleaner(sprdsheet_fld)) for idx, sprdsheet_fld, model_fld in colspecs]
+        cleaned = []
+        for rownum, row in chunk:
+            rec = {}
+            rowerr = None
+            for idx, sprdsheet_fld, model_fld, cleaner in colplan:
+                val = row[idx] if idx < len(row) else None
+                try:
+                    usefld, cleanval = cleaner(val)
+                except Exception as e:
+                    rowerr = SprdsheetRowError(rownum, sprdsheet_fld, val, str(e))
                     break
-                #endif instance(val, type)
-            #endfor type, cleanproc
-        #endif fld not in self.SprdsheetFlds
+                if usefld:
+                    rec[model_fld] = cleanval
+                elif val is not None:
+                    rowerr = SprdsheetRowError(rownum, sprdsheet_fld, val, f'{type(val).__name__} is not an allowed type')
+                    break
+                # endif usefld
+            # endfor colplan
+            cleaned.append((rownum, None, rowerr) if rowerr else (rownum, rec, None))
+        # endfor rownum, row
+        return cleaned
+    # _clean_chunk
 
-    def process_spreadsheet(self, SprsheetName):
-        """Process a spreadsheet file.
+    def process_spreadsheet(self, SprsheetName, SheetName=None, batch_size=None, commit=True, workers=None) -> 'SprdsheetImportResult':
+        """Load a spreadsheet into TargetModel.
+        
+        The workbook is read in openpyxl's read-only mode, a row at a time.  The header row
+        is mapped to TargetModel fields once (through SprdsheetFlds, or by name), each
+        column gets its compiled cleaner, and clean rows are inserted batch_size (BatchSize)
+        at a time with one executemany INSERT.  A batch the database refuses is retried a
+        row at a time, so one bad row doesn't lose the rest.
+        
+        With workers (Workers) > 1, rows are cleaned in ChunkSize chunks by a pool of that many
+        processes, and the results are inserted here, in spreadsheet order.  Each worker
+        cleans with its own instance of this class, so the cleanprocs (coerce_date and the
+        like) may depend only on the class, and the class must be importable by the workers
+        (defined at module level).
         
         Args:
-            SprsheetName: Name or path of the spreadsheet to process.
+            SprsheetName: Name or path of the spreadsheet to process (or a binary file object).
+            SheetName: The worksheet to read; the active sheet if None.
+            batch_size: Rows per INSERT; BatchSize if None.
+            commit: Commit when done; with commit=False the caller commits (or rolls back).
+            workers: Processes cleaning rows; Workers if None.  0 or 1 cleans in this process.
         
-        Note:
-            This method is not yet implemented.
+        Returns:
+            SprdsheetImportResult: rows read and inserted, and an error for each row not inserted.
         """
-        pass
+        from sqlalchemy import insert, inspect
+        from sqlalchemy.exc import SQLAlchemyError
+        from ..models import ( db, )
+
+        result = SprdsheetImportResult()
+        batch_size = batch_size or self.BatchSize
+        workers = self.Workers if workers is None else workers
+        model_flds = set(inspect(self.TargetModel).column_attrs.keys())     # type: ignore
+        stmt = insert(self.TargetModel)     # type: ignore
+
+        def insert_batch(batch: list[tuple[int, dict]]):
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(stmt, [rec for _, rec in batch])
+                result.rows_inserted += len(batch)
+            except SQLAlchemyError:
+                # find the rows the database refuses
+                for rownum, rec in batch:
+                    try:
+                        with db.session.begin_nested():
+                            db.session.execute(stmt, [rec])
+                        result.rows_inserted += 1
+                    except SQLAlchemyError as e:
+                        result.errors.append(SprdsheetRowError(rownum, None, None, str(getattr(e, 'orig', e))))
+                # endfor rownum, rec
+            # end try
+        # insert_batch
+
+        wb = load_workbook(SprsheetName, read_only=True, data_only=True)
+        try:
+            ws = wb[SheetName] if SheetName else wb.active
+            rows = ws.iter_rows(values_only=True)     # type: ignore
+            header = next(rows, ())
+
+            # map the header once: (column index, spreadsheet name, model field)
+            colspecs = []
+            for idx, hdr in enumerate(header):
+                sprdsheet_fld = str(hdr).strip() if hdr is not None else ''
+                if sprdsheet_fld in self.SprdsheetFlds:
+                    model_fld = self.SprdsheetFlds[sprdsheet_fld]['ModelFldName']
+                elif sprdsheet_fld in model_flds:
+                    model_fld = sprdsheet_fld
+                else:
+                    if sprdsheet_fld:
+                        result.ignored_columns.append(sprdsheet_fld)
+                    continue
+                # endif sprdsheet_fld known
+                colspecs.append((idx, sprdsheet_fld, model_fld))
+            # endfor header
+            found = {sprdsheet_fld for _, sprdsheet_fld, _ in colspecs}
+            result.missing_columns = [fld for fld in self.SprdsheetFlds if fld not in found]
+
+            chunks = _sprdsheet_chunks(rows, self.ChunkSize)
+            if workers and workers > 1:
+                cleaned_chunks = _clean_chunks_in_pool(type(self), colspecs, chunks, workers)
+            else:
+                cleaned_chunks = (self._clean_chunk(colspecs, chunk) for chunk in chunks)
+
+            # the one writer: cleaned rows are inserted in spreadsheet order
+            batch = []
+            for cleaned in cleaned_chunks:
+                result.rows_read += len(cleaned)
+                for rownum, rec, rowerr in cleaned:
+                    if rowerr:
+                        result.errors.append(rowerr)
+                        continue
+                    batch.append((rownum, rec))
+                    if len(batch) >= batch_size:
+                        insert_batch(batch)
+                        batch = []
+                # endfor cleaned rows
+            # endfor cleaned_chunks
+            if batch:
+                insert_batch(batch)
+            result.errors.sort(key=lambda err: err.row)
+
+            if commit:
+                db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            wb.close()
+        # end try
+
+        return result
+    # process_spreadsheet
+
+
+def _sprdsheet_chunks(rows, chunk_size) -> Iterable[list[tuple[int, tuple]]]:
+    """Group a worksheet's data rows (after the header) into chunks of (row number, values), leaving out blank rows."""
+    chunk = []
+    for rownum, row in enumerate(rows, start=2):
+        if not any(val is not None for val in row):
+            continue
+        chunk.append((rownum, row))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    # endfor rows
+    if chunk:
+        yield chunk
+# _sprdsheet_chunks
+
+_worker_uploaders: dict[type, 'UpldSprdsheet'] = {}
+
+def _clean_sprdsheet_chunk(uploader_cls, colspecs, chunk):
+    """Clean one chunk in a worker process, with that process's instance of uploader_cls (so its cleaners are compiled once)."""
+    uploader = _worker_uploaders.get(uploader_cls)
+    if uploader is None:
+        uploader = _worker_uploaders[uploader_cls] = uploader_cls()
+    return uploader._clean_chunk(colspecs, chunk)
+# _clean_sprdsheet_chunk
+
+def _clean_chunks_in_pool(uploader_cls, colspecs, chunks, workers):
+    """
+    Clean chunks in a pool of worker processes; yield the results in chunk order.
+    At most two chunks per worker are in flight, so the sheet is never all in memory.
+    """
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_clean_sprdsheet_chunk, uploader_cls, colspecs, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        # endfor chunks
+        while pending:
+            yield pending.popleft().result()
+    # endwith pool
+# _clean_chunks_in_pool
+
+
+@dataclass
+class SprdsheetRowError:
+    """A spreadsheet row that wasn't loaded: its row number, the field and value at fault (if one was), and why."""
+    row: int
+    field: str|None
+    value: Any
+    message: str
+
+    def __str__(self):
+        if self.field is None:
+            return f'row {self.row}: {self.message}'
+        return f'row {self.row}, {self.field} = {self.value!r}: {self.message}'
+
+@dataclass
+class SprdsheetImportResult:
+    """What UpldSprdsheet.process_spreadsheet did."""
+    rows_read: int = 0
+    rows_inserted: int = 0
+    errors: list[SprdsheetRowError] = field(default_factory=list)
+    missing_columns: list[str] = field(default_factory=list)    # SprdsheetFlds not in the header
+    ignored_columns: list[str] = field(default_factory=list)    # header columns matching no field
 
+    @property
+    def ok(self) -> bool:
+        return not self.errors
@@ -2,7 +2,7 @@ from calvincTools.utils.misctools import (
     show_routes, show_forms, pretty_show_fns, show_fns,
     )
 from calvincTools.cMenu.commandhandlers import (
-    run_sql, edit_parameters, edit_greetings,
+    run_sql, download_sql, edit_parameters, edit_greetings,
     )
 
 
@@ -24,6 +24,7 @@ def register_util_blueprint(app):
     # util_bp.add_url_rule('/prettyfns', 'pretty_show_fns', pretty_show_fns, methods=['GET'])
 
     util_bp.add_url_rule('/sql', 'run_sql', run_sql, methods=['GET', 'POST'])
+    util_bp.add_url_rule('/sql/download/<fmt>', 'download_sql', download_sql, methods=['POST'])
     util_bp.add_url_rule('/parameters', 'edit_parameters', edit_parameters, methods=['GET', 'POST'])
     util_bp.add_url_rule('/greetings', 'edit_greetings', edit_greetings, methods=['GET', 'POST'])
     
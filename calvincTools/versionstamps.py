@@ -0,0 +1,120 @@
+"""
+Cross-process cache invalidation through version stamps.
+
+calvincTools keeps process-local caches (menus, cParameters, greetings, users).  Under
+several workers, an edit made in one worker would leave the others serving stale data.
+Each cache is tied to a named generation counter in the cVersionStamps table (in the
+cTools bind):
+  - write paths call bump_version_stamp(name) after they commit; this increments the
+    counter and drops the local cache at once
+  - every process calls check_version_stamps() before each request; at most once every
+    CTOOLS_CACHE_CHECK_INTERVAL seconds (default 5) it reads all counters in one query
+    and drops the local caches whose counter has moved
+
+Caches register what to drop with register_stamp_listener(name, fn).
+"""
+import time
+from threading import Lock
+from typing import Callable
+
+from flask import current_app, has_app_context
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+STAMP_MENUS = 'menus'
+STAMP_PARAMETERS = 'cParameters'
+STAMP_GREETINGS = 'cGreetings'
+STAMP_USERS = 'users'
+
+DEFAULT_CHECK_INTERVAL = 5      # seconds
+
+# stamp_name -> functions that drop the local cache(s) tied to that stamp
+_listeners: dict[str, list[Callable[[], None]]] = {}
+# stamp_name -> last version this process has seen
+_seen_versions: dict[str, int] = {}
+_check_state = {'last_check': 0.0}
+_check_lock = Lock()
+
+
+def register_stamp_listener(stamp_name: str, fn: Callable[[], None]) -> None:
+    """Call fn (with no arguments) whenever stamp_name changes, in this process or another."""
+    _listeners.setdefault(stamp_name, []).append(fn)
+# register_stamp_listener
+
+def drop_local_caches(stamp_name: str) -> None:
+    """Drop this process's caches tied to stamp_name, without touching the database."""
+    for fn in _listeners.get(stamp_name, []):
+        fn()
+# drop_local_caches
+
+def bump_version_stamp(stamp_name: str) -> None:
+    """
+    Increment stamp_name so that every process drops the caches tied to it.
+    Call this after the write it covers has been committed.  The local caches are
+    dropped even if the stamp can't be written.
+    """
+    from .models import ( db, cVersionStamps, )
+
+    stmt = (
+        update(cVersionStamps)
+        .where(cVersionStamps.stamp_name == stamp_name)                             # type: ignore
+        .values(stamp_version=cVersionStamps.stamp_version + 1)                     # type: ignore
+    )
+    try:
+        if not db.session.execute(stmt).rowcount:       # type: ignore
+            db.session.add(cVersionStamps(stamp_name=stamp_name, stamp_version=1))
+            try:
+                db.session.flush()
+            except IntegrityError:
+                # another process inserted the first row in the meantime; bump that one
+                db.session.rollback()
+                db.session.execute(stmt)
+            # end try
+        # endif stamp row missing
+        # note the new version as seen here, so the next check doesn't drop the caches again
+        new_version = db.session.execute(
+            select(cVersionStamps.stamp_version).where(cVersionStamps.stamp_name == stamp_name)   # type: ignore
+        ).scalar()
+        db.session.commit()
+        if new_version is not None:
+            _seen_versions[stamp_name] = new_version
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        if has_app_context():
+            current_app.logger.warning(f'Could not bump version stamp {stamp_name}: {e}')
+    # end try
+
+    drop_local_caches(stamp_name)
+# bump_version_stamp
+
+def check_version_stamps(force: bool = False) -> None:
+    """
+    Drop the local caches whose stamps have changed since this process last looked.
+    Registered as a before_request hook; only reads the table once every
+    CTOOLS_CACHE_CHECK_INTERVAL seconds unless force is True.
+    """
+    from .models import ( db, cVersionStamps, )
+
+    interval = current_app.config.get('CTOOLS_CACHE_CHECK_INTERVAL', DEFAULT_CHECK_INTERVAL)
+    now = time.monotonic()
+    with _check_lock:
+        if not force and now - _check_state['last_check'] < interval:
+            return
+        _check_state['last_check'] = now
+    # endwith
+
+    try:
+        stmt = select(cVersionStamps.stamp_name, cVersionStamps.stamp_version)     # type: ignore
+        current_versions = dict(db.session.execute(stmt).tuples().all())
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.warning(f'Could not read version stamps: {e}')
+        return
+    # end try
+
+    for stamp_name, version in current_versions.items():
+        if _seen_versions.get(stamp_name) != version:
+            _seen_versions[stamp_name] = version
+            drop_local_caches(stamp_name)
+    # endfor current_versions
+# check_version_stamps
@@ -0,0 +1,98 @@
+"""
+Shared fixtures: a small model on an in-memory SQLite database, and a Repository over it;
+and a Flask app with calvincTools set up on SQLite files.
+"""
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import create_engine, String, UniqueConstraint
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, sessionmaker
+
+from calvincTools import calvincTools, CallerContext
+from calvincTools.database import Repository
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Stock(Base):
+    __tablename__ = 'stock'
+    __table_args__ = (UniqueConstraint('sku_code', 'site'),)
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    sku: Mapped[str] = mapped_column('sku_code', String(30))    # attribute and column named differently
+    site: Mapped[int]
+    qty: Mapped[int]
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    yield sessionmaker(engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def repo(session_factory):
+    return Repository(session_factory, Stock)
+
+
+@pytest.fixture
+def stock_rows():
+    """60 rows: sku s00..s19 at sites 0-2, qty 1."""
+    return [
+        {'id': n + 1, 'sku': f's{n % 20:02d}', 'site': n // 20, 'qty': 1}
+        for n in range(60)
+    ]
+
+
+class _AppConfig:
+    FORMNAME_TO_URL_MAP: dict = {}
+    EXTERNAL_WEBPAGE_URL_MAP: dict = {}
+
+
+@pytest.fixture
+def ctools_app(tmp_path, monkeypatch):
+    """
+    A Flask app with calvincTools on two SQLite files (the app's database and the cToolsdb bind).
+    calvincTools is a singleton, so it is set up afresh for each test; use calvincTools.models
+    (models.db, models.menuItems, ...) inside an app context.
+    """
+    app = Flask(__name__)
+    app.config.update(
+        SECRET_KEY='test', WTF_CSRF_ENABLED=False, TESTING=True,
+        SQLALCHEMY_DATABASE_URI=f'sqlite:///{tmp_path}/app.db',
+        SQLALCHEMY_BINDS={'cToolsdb': f'sqlite:///{tmp_path}/ctools.db'},
+    )
+    app_db = SQLAlchemy()
+    app_db.init_app(app)
+    monkeypatch.setattr(calvincTools, '_initialized', False)
+    calvincTools(CallerContext(flaskapp=app, config=_AppConfig, app_db=app_db))
+    yield app
+    with app.app_context():
+        for engine in app_db.engines.values():
+            engine.dispose()
+    # endwith app context
+
+
+@pytest.fixture
+def superuser_client(ctools_app):
+    """A test client logged in as a superuser."""
+    from calvincTools import models
+    with ctools_app.app_context():
+        user = models.User(
+            username='su', email='su@example.com', first_name='Super', last_name='User',
+            is_superuser=True, active_status=True, permissions='',
+            )
+        user.set_password('pw')
+        models.db.session.add(user)
+        models.db.session.commit()
+        user_id = user.id
+    # endwith app context
+    client = ctools_app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+        sess['_fresh'] = True
+    return client
@@ -0,0 +1,85 @@
+"""AsyncRepository on aiosqlite (each test runs its coroutine with asyncio.run)."""
+import asyncio
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+pytest.importorskip('aiosqlite')
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine     # pylint: disable=wrong-import-position
+
+from calvincTools.database import AsyncRepository        # pylint: disable=wrong-import-position
+from conftest import Base, Stock                          # pylint: disable=wrong-import-position
+
+
+def run_with_repo(test):
+    """Run test(repo) against a fresh in-memory database."""
+    async def main():
+        engine = create_async_engine('sqlite+aiosqlite://')
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        try:
+            await test(AsyncRepository(async_sessionmaker(engine), Stock))
+        finally:
+            await engine.dispose()
+    asyncio.run(main())
+
+
+def test_bulk_add_count_and_get_all(stock_rows):
+    async def test(repo):
+        assert await repo.bulk_add_from_listofdict(stock_rows) is True
+        assert await repo.count() == 60
+        assert await repo.count(Stock.site == 2) == 20
+        records = await repo.get_all(Stock.site == 1, Stock.sku.desc())
+        assert [rec.sku for rec in records] == [f's{n:02d}' for n in range(19, -1, -1)]
+    run_with_repo(test)
+
+
+def test_bulk_add_reports_a_database_error(stock_rows):
+    async def test(repo):
+        await repo.bulk_add_from_listofdict(stock_rows)
+        kind, err = await repo.bulk_add_from_listofdict([stock_rows[0]])
+        assert kind == 'database'
+        assert isinstance(err, IntegrityError)
+        assert await repo.count() == 60
+    run_with_repo(test)
+
+
+def test_stream_all_yields_every_row_in_order(stock_rows):
+    async def test(repo):
+        await repo.bulk_add_from_listofdict(stock_rows)
+        ids = [rec.id async for rec in repo.stream_all(Stock.site > 0, Stock.id.desc(), batch_size=7)]
+        assert ids == list(range(60, 20, -1))
+    run_with_repo(test)
+
+
+def test_add_get_update_and_remove():
+    async def test(repo):
+        stock = await repo.add(Stock(sku='a', site=0, qty=1))
+        assert stock.id is not None
+
+        stock.qty = 3
+        updated = await repo.update(stock)
+        assert updated.qty == 3
+        assert (await repo.get_by_id(stock.id)).qty == 3
+
+        await repo.remove(updated)
+        assert await repo.get_by_id(stock.id) is None
+        assert (await repo.get_by_id(stock.id, newifnotfound=True)).id == stock.id
+    run_with_repo(test)
+
+
+def test_updatewhere_and_removewhere(stock_rows):
+    async def test(repo):
+        await repo.bulk_add_from_listofdict(stock_rows)
+        assert await repo.updatewhere(Stock.site == 0, {'qty': Stock.qty + 4}) == 20
+        assert await repo.removewhere(Stock.site == 2) == 20
+        assert sorted({rec.qty for rec in await repo.get_all()}) == [1, 5]
+    run_with_repo(test)
+
+
+def test_concurrent_calls(stock_rows):
+    async def test(repo):
+        await repo.bulk_add_from_listofdict(stock_rows)
+        counts = await asyncio.gather(*(repo.count(Stock.site == site) for site in range(3)))
+        assert counts == [20, 20, 20]
+    run_with_repo(test)
@@ -0,0 +1,230 @@
+"""utils.Excel: streamed workbook export, compiled cleaners and UpldSprdsheet.process_spreadsheet."""
+import datetime
+import io
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from openpyxl import Workbook, load_workbook
+from sqlalchemy import create_engine, event, select, text
+
+from calvincTools import models
+from calvincTools.utils.Excel import (
+    Excelfile_fromqs, Excelfile_stream, UpldSprdsheet,
+    _clean_chunks_in_pool, _sprdsheet_chunks,
+    )
+
+
+def _read(dest):
+    """The worksheet's rows as value tuples, and the worksheet."""
+    ws = load_workbook(dest).active
+    return list(ws.iter_rows(values_only=True)), ws
+
+
+# ---------------------------------------------------------------------------
+# Excelfile_stream / Excelfile_fromqs
+# ---------------------------------------------------------------------------
+
+def test_stream_mappings_with_a_frozen_header():
+    out = io.BytesIO()
+
+    nrows = Excelfile_stream(({'a': n, 'b': f'x{n}'} for n in range(3)), out)
+
+    rows, ws = _read(out)
+    assert nrows == 3
+    assert rows == [('a', 'b'), (0, 'x0'), (1, 'x1'), (2, 'x2')]
+    assert ws.freeze_panes == 'A2'
+    assert ws['A1'].font.bold and ws['A1'].fill.start_color.rgb == '00808080'
+
+
+def test_stream_freezecols():
+    out = io.BytesIO()
+
+    Excelfile_stream([(1, 2, 3)], out, fieldnames=['a', 'b', 'c'], freezecols=2)
+
+    assert _read(out)[1].freeze_panes == 'C2'
+
+
+def test_stream_objects_sequences_and_odd_values():
+    out = io.BytesIO()
+    key = uuid.uuid4()
+    rows = [SimpleNamespace(id=1, key=key, when=datetime.date(2024, 5, 1), _private='no')]
+
+    Excelfile_stream(rows, out)
+
+    rows, _ = _read(out)
+    assert rows == [('id', 'key', 'when'), (1, str(key), datetime.datetime(2024, 5, 1))]
+
+
+def test_stream_a_result_to_a_file_name(tmp_path):
+    engine = create_engine('sqlite://')
+    with engine.connect() as conn:
+        result = conn.execute(text("SELECT 1 AS one, 'two' AS two UNION ALL SELECT 3, 'four'"))
+        assert Excelfile_stream(result, str(tmp_path / 'out'), sheet_title='Results') == 2
+    # endwith connection
+    engine.dispose()
+
+    rows, ws = _read(tmp_path / 'out.XLSX')
+    assert rows == [('one', 'two'), (1, 'two'), (3, 'four')]
+    assert ws.title == 'Results'
+
+
+def test_stream_no_rows_writes_only_the_header():
+    out = io.BytesIO()
+
+    assert Excelfile_stream([], out, fieldnames=['a']) == 0
+
+    assert _read(out)[0] == [('a',)]
+
+
+def test_fromqs_freezecols(tmp_path):
+    flName = str(tmp_path / 'qs')
+
+    assert Excelfile_fromqs([{'a': 1, 'b': 2}], flName, freezecols=1, returnFileName=True) == flName + '.XLSX'
+
+    rows, ws = _read(flName + '.XLSX')
+    assert rows == [('a', 'b'), (1, 2)]
+    assert ws.freeze_panes == 'B2'
+
+
+# ---------------------------------------------------------------------------
+# compiled cleaners
+# ---------------------------------------------------------------------------
+
+class PartUpload(UpldSprdsheet):
+    """Parts: a part number (text, or a number written as text), a quantity and a free-text description."""
+    SprdsheetFlds = {
+        'Part Number': {'ModelFldName': 'part_no', 'AllowedTypes': [(str, str.strip), (int, str)]},
+        'Qty': {'ModelFldName': 'qty', 'AllowedTypes': [(int, int)]},
+        'Description': {'ModelFldName': 'descr', 'AllowedTypes': []},
+    }
+
+
+@pytest.mark.parametrize('fld, val, expected', [
+    ('Part Number', ' P-1 ', (True, 'P-1')),
+    ('Part Number', 17, (True, '17')),
+    ('Part Number', 1.5, (False, None)),
+    ('Qty', 4, (True, 4)),
+    ('Qty', 'four', (False, None)),
+    ('Description', 5, (True, '5')),
+    ('Description', None, (False, None)),
+    ('not a field', [1], (True, [1])),
+])
+def test_cleaners(fld, val, expected):
+    assert PartUpload().cleanupfld(fld, val) == expected
+
+
+def test_cleaners_are_compiled_once_per_instance():
+    uploader = PartUpload()
+
+    assert uploader._cleaner('Qty') is uploader._cleaner('Qty')     # pylint: disable=protected-access
+    assert PartUpload()._cleaner('Qty') is not uploader._cleaner('Qty')     # pylint: disable=protected-access
+
+
+def test_clean_chunk_reports_bad_rows():
+    colspecs = [(0, 'Part Number', 'part_no'), (1, 'Qty', 'qty')]
+
+    cleaned = PartUpload()._clean_chunk(colspecs, [(2, ('A', 1)), (3, ('B', 'x')), (4, ('C',))])   # pylint: disable=protected-access
+
+    assert cleaned[0] == (2, {'part_no': 'A', 'qty': 1}, None)
+    assert cleaned[1][1] is None and str(cleaned[1][2]) == "row 3, Qty = 'x': str is not an allowed type"
+    assert cleaned[2] == (4, {'part_no': 'C'}, None)
+
+
+def test_clean_chunks_in_pool_keeps_chunk_order():
+    colspecs = [(0, 'Part Number', 'part_no'), (1, 'Qty', 'qty')]
+    rows = [(f' P{n} ', n if n % 7 else 'bad') for n in range(1, 51)]
+    chunks = list(_sprdsheet_chunks(iter(rows), 4))
+
+    pooled = list(_clean_chunks_in_pool(PartUpload, colspecs, iter(chunks), workers=2))
+
+    assert pooled == [PartUpload()._clean_chunk(colspecs, chunk) for chunk in chunks]     # pylint: disable=protected-access
+    assert [rownum for chunk in pooled for rownum, _, _ in chunk] == list(range(2, 52))
+
+
+# ---------------------------------------------------------------------------
+# process_spreadsheet
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def part_model(ctools_app, monkeypatch):
+    """A parts table (part_no unique, qty required) on the app's database, as PartUpload's TargetModel."""
+    db = models.db
+    class Part(db.Model):
+        __tablename__ = 'part'
+        id = db.Column(db.Integer, primary_key=True)
+        part_no = db.Column(db.String(20), unique=True, nullable=False)
+        qty = db.Column(db.Integer, nullable=False)
+        descr = db.Column(db.String(50))
+    # Part
+    with ctools_app.app_context():
+        Part.__table__.create(db.engine)
+        _sqlite_savepoints(db.engine)
+        monkeypatch.setattr(PartUpload, 'TargetModel', Part)
+        yield Part
+    # endwith app context
+
+
+def _sqlite_savepoints(engine):
+    """
+    pysqlite opens no transaction before a SAVEPOINT, so releasing the first savepoint
+    commits.  SQLAlchemy's recipe for SQLite: let SQLAlchemy emit BEGIN itself.
+    """
+    @event.listens_for(engine, 'connect')
+    def no_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+    @event.listens_for(engine, 'begin')
+    def begin(conn):
+        conn.exec_driver_sql('BEGIN')
+    engine.dispose()        # the connections already open were made without the listener
+# _sqlite_savepoints
+
+
+def _workbook(tmp_path, rows):
+    """An .xlsx with the header and rows; returns its path."""
+    wb = Workbook()
+    wb.active.append(['Part Number', 'Qty', 'Description', 'Notes'])
+    for row in rows:
+        wb.active.append(row)
+    path = str(tmp_path / 'parts.xlsx')
+    wb.save(path)
+    return path
+
+
+def _parts(Part):
+    return {part_no: qty for part_no, qty in models.db.session.execute(select(Part.part_no, Part.qty))}
+
+
+@pytest.mark.parametrize('workers', [0, 2])
+def test_process_spreadsheet_keeps_the_good_rows_of_a_refused_batch(part_model, tmp_path, workers):
+    path = _workbook(tmp_path, [
+        ['A', 1, 'first'],
+        ['B', 2, None],
+        ['A', 3, 'duplicate part number'],      # refused by the database
+        [None, None, None],                     # blank, skipped
+        ['C', 'lots', None],                    # refused by the cleaner
+        [17, 4, None],
+        ['D', None, None],                      # qty is required
+        ['E', 5, None],
+    ])
+
+    result = PartUpload().process_spreadsheet(path, batch_size=3, workers=workers)
+
+    assert (result.rows_read, result.rows_inserted) == (7, 4)
+    assert [err.row for err in result.errors] == [4, 6, 8]
+    assert 'UNIQUE' in result.errors[0].message
+    assert result.errors[1].field == 'Qty'
+    assert 'NOT NULL' in result.errors[2].message
+    assert result.ignored_columns == ['Notes']
+    assert result.missing_columns == []
+    assert _parts(part_model) == {'A': 1, 'B': 2, '17': 4, 'E': 5}
+
+
+def test_process_spreadsheet_without_commit_is_left_to_the_caller(part_model, tmp_path):
+    path = _workbook(tmp_path, [['A', 1, None], ['B', 2, None]])
+
+    result = PartUpload().process_spreadsheet(path, commit=False)
+    assert result.ok and result.rows_inserted == 2
+    models.db.session.rollback()
+
+    assert _parts(part_model) == {}
@@ -0,0 +1,85 @@
+"""cMenu.menucache: the process-local menu cache."""
+import pytest
+from flask import Flask
+
+from calvincTools.cMenu.menucache import (
+    get_menu_tree, get_menu_group_list,
+    get_rendered_menu, store_rendered_menu, menu_cache_generation, invalidate_menu_cache,
+    )
+from calvincTools.cMenu.menutree import ( MenuTree, MenuGroupChoice, )
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    invalidate_menu_cache()
+    yield
+    invalidate_menu_cache()
+
+
+@pytest.fixture
+def app():
+    return Flask(__name__)
+
+
+def test_rendered_menu_is_stored_and_served(app):
+    with app.test_request_context('/'):
+        store_rendered_menu(1, 0, 'Main', ['<a>'], menu_cache_generation())
+        assert get_rendered_menu(1, 0) == ('Main', ['<a>'])
+        assert get_rendered_menu(1, 1) is None
+
+
+def test_rendered_menu_built_before_an_invalidate_is_not_stored(app):
+    with app.test_request_context('/'):
+        generation = menu_cache_generation()
+        invalidate_menu_cache(1, 0)         # e.g. an edit committed while the menu was being built
+        store_rendered_menu(1, 0, 'Old', ['<old>'], generation)
+        assert get_rendered_menu(1, 0) is None
+
+
+def test_rendered_menus_are_kept_per_script_root(app):
+    with app.test_request_context('/', environ_overrides={'SCRIPT_NAME': '/site1'}):
+        store_rendered_menu(1, 0, 'Main', ['<a href="/site1/x">'], menu_cache_generation())
+    with app.test_request_context('/', environ_overrides={'SCRIPT_NAME': '/site2'}):
+        assert get_rendered_menu(1, 0) is None
+    with app.test_request_context('/', environ_overrides={'SCRIPT_NAME': '/site1'}):
+        assert get_rendered_menu(1, 0) == ('Main', ['<a href="/site1/x">'])
+
+
+def test_invalidate_one_group_keeps_the_others(app):
+    with app.test_request_context('/'):
+        store_rendered_menu(1, 0, 'One', [], menu_cache_generation())
+        store_rendered_menu(2, 0, 'Two', [], menu_cache_generation())
+        invalidate_menu_cache(1)
+        assert get_rendered_menu(1, 0) is None
+        assert get_rendered_menu(2, 0) == ('Two', [])
+
+
+def _loader(results, invalidate_during_load=False):
+    """A stand-in for a load from the database that hands out results in turn."""
+    results = iter(results)
+    def load(*args):
+        if invalidate_during_load:
+            invalidate_menu_cache()         # an edit committed while the load was in flight
+        return next(results)
+    return load
+
+
+def test_menu_tree_is_loaded_once(monkeypatch):
+    monkeypatch.setattr(MenuTree, 'load', _loader(['tree', 'reloaded']))
+    assert get_menu_tree(1) == 'tree'
+    assert get_menu_tree(1) == 'tree'
+
+
+def test_menu_tree_loaded_across_an_invalidate_is_not_kept(monkeypatch):
+    monkeypatch.setattr(MenuTree, 'load', _loader(['stale', 'fresh'], invalidate_during_load=True))
+    assert get_menu_tree(1) == 'stale'          # served to the request that loaded it ...
+    monkeypatch.setattr(MenuTree, 'load', _loader(['fresh']))
+    assert get_menu_tree(1) == 'fresh'          # ... but not kept
+
+
+def test_group_list_loaded_across_an_invalidate_is_not_kept(monkeypatch):
+    monkeypatch.setattr(MenuGroupChoice, 'load_all', _loader([['stale']], invalidate_during_load=True))
+    assert get_menu_group_list() == ['stale']
+    monkeypatch.setattr(MenuGroupChoice, 'load_all', _loader([['fresh'], ['again']]))
+    assert get_menu_group_list() == ['fresh']
+    assert get_menu_group_list() == ['fresh']
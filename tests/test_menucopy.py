@@ -0,0 +1,139 @@
+"""cMenu.menucopy: set-based copy and move of menu items, and create_menu's copy."""
+import pytest
+
+from calvincTools import models
+import calvincTools.cMenu.editmenu
+from calvincTools.cMenu.menucopy import ( COPY_BATCH_SIZE, MenuCopyOp, MenuCopyResult, apply_menu_ops, copy_menu, )
+
+
+@pytest.fixture
+def app(ctools_app):
+    """ctools_app with group 2: menu 0 options 1-5 (group 1 is the initial group)."""
+    with ctools_app.app_context():
+        models.db.session.add(models.menuGroups(id=2, GroupName='Two', GroupInfo=''))
+        _add_options(2, 0, range(1, 6))
+        models.db.session.commit()
+    return ctools_app
+
+
+def _add_options(group, menu, options):
+    models.db.session.add_all([
+        models.menuItems(MenuGroup_id=group, MenuID=menu, OptionNumber=option, OptionText=f'Option {option}', Command=0, Argument=str(option))
+        for option in options
+    ])
+
+
+def _menu(group, menu):
+    """{OptionNumber: Argument} for one menu."""
+    return {
+        item.OptionNumber: item.Argument
+        for item in models.menuItems.query.filter_by(MenuGroup_id=group, MenuID=menu)
+    }
+
+
+def test_copies_and_moves_in_one_batch(app):
+    with app.app_context():
+        result = apply_menu_ops([
+            MenuCopyOp(2, 0, 1, 2, 1, 1),
+            MenuCopyOp(2, 0, 2, 2, 1, 2),
+            MenuCopyOp(2, 0, 3, 2, 1, 3, move=True),
+        ])
+
+        assert (result.copied, result.moved, result.errors) == (2, 1, {})
+        assert _menu(2, 1) == {1: '1', 2: '2', 3: '3'}
+        assert _menu(2, 0) == {1: '1', 2: '2', 4: '4', 5: '5'}
+
+
+def test_conflicting_ops_are_refused_and_the_rest_applied(app):
+    with app.app_context():
+        no_source = MenuCopyOp(2, 0, 9, 2, 1, 9)
+        target_taken = MenuCopyOp(2, 0, 1, 2, 0, 2)
+        first_to_slot = MenuCopyOp(2, 0, 3, 2, 1, 1)
+        second_to_slot = MenuCopyOp(2, 0, 4, 2, 1, 1)
+        first_move = MenuCopyOp(2, 0, 5, 2, 1, 5, move=True)
+        second_move = MenuCopyOp(2, 0, 5, 2, 1, 6, move=True)
+
+        result = apply_menu_ops([no_source, target_taken, first_to_slot, second_to_slot, first_move, second_move])
+
+        assert set(result.errors) == {no_source, target_taken, second_to_slot, second_move}
+        assert 'source does not exist' in result.errors[no_source]
+        assert 'target already exists' in result.errors[target_taken]
+        assert 'another option goes to that target' in result.errors[second_to_slot]
+        assert 'already being moved' in result.errors[second_move]
+        assert (result.copied, result.moved) == (1, 1)
+        assert _menu(2, 1) == {1: '3', 5: '5'}
+
+
+def test_without_skip_conflicts_nothing_is_applied(app):
+    with app.app_context():
+        result = apply_menu_ops(
+            [MenuCopyOp(2, 0, 1, 2, 1, 1), MenuCopyOp(2, 0, 2, 2, 0, 3, move=True)],
+            skip_conflicts=False,
+            )
+
+        assert not result.ok
+        assert (result.copied, result.moved) == (0, 0)
+        assert _menu(2, 1) == {}
+        assert set(_menu(2, 0)) == {1, 2, 3, 4, 5}
+
+
+def test_uncommitted_changes_are_seen_and_left_to_the_caller(app):
+    with app.app_context():
+        _add_options(2, 1, [1])         # pending, not yet flushed
+
+        result = apply_menu_ops([MenuCopyOp(2, 0, 1, 2, 1, 1), MenuCopyOp(2, 0, 2, 2, 1, 2)], commit=False)
+        assert list(result.errors) == [MenuCopyOp(2, 0, 1, 2, 1, 1)]
+        models.db.session.rollback()
+
+        assert _menu(2, 1) == {}
+
+
+def test_copy_menu_crosses_the_insert_batch_size(app):
+    option_count = COPY_BATCH_SIZE + 50
+    with app.app_context():
+        _add_options(2, 2, range(option_count))
+        models.db.session.commit()
+
+        result = copy_menu(2, 2, 1, 7)
+
+        assert (result.copied, result.errors) == (option_count, {})
+        assert _menu(1, 7) == {option: str(option) for option in range(option_count)}
+
+
+def test_copy_menu_is_refused_whole_if_any_target_is_taken(app):
+    with app.app_context():
+        _add_options(2, 1, [4])
+        models.db.session.commit()
+
+        result = copy_menu(2, 0, 2, 1, move=True)
+
+        assert list(result.errors) == [MenuCopyOp(2, 0, 4, 2, 1, 4, move=True)]
+        assert set(_menu(2, 0)) == {1, 2, 3, 4, 5}
+
+
+def test_create_menu_reports_the_options_copied(app, superuser_client):
+    with superuser_client:
+        superuser_client.get('/menu/create/2/3/2/0')
+        with superuser_client.session_transaction() as sess:
+            flashes = sess['_flashes']
+    # endwith client
+
+    assert ('success', 'Menu created successfully - 5 options copied from 2,0') in flashes
+    with app.app_context():
+        assert set(_menu(2, 3)) == {1, 2, 3, 4, 5}
+
+
+def test_create_menu_rolls_back_a_refused_copy(app, superuser_client, monkeypatch):
+    refused = MenuCopyOp(2, 0, 1, 2, 3, 1)
+    def refusing_copy_menu(*args, **kwargs):
+        models.db.session.add(models.menuItems(MenuGroup_id=2, MenuID=3, OptionNumber=9, OptionText='partial', Command=0))
+        return MenuCopyResult(errors={refused: f'Could not {refused} - target already exists.'})
+    monkeypatch.setattr(calvincTools.cMenu.editmenu, 'copy_menu', refusing_copy_menu)
+
+    superuser_client.get('/menu/create/2/3/2/0')
+    with superuser_client.session_transaction() as sess:
+        flashes = sess['_flashes']
+
+    assert flashes == [('error', f'Could not {refused} - target already exists.')]
+    with app.app_context():
+        assert _menu(2, 3) == {}
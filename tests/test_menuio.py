@@ -0,0 +1,143 @@
+"""cMenu.menuio: menu group export and import, and the ctools CLI commands for them."""
+import io
+import json
+
+import pytest
+from sqlalchemy import delete
+from sqlalchemy.dialects import postgresql, sqlite
+
+from calvincTools import models
+from calvincTools.cMenu.menuio import ( _reset_id_sequence, export_menu_groups, import_menu_groups, )
+
+
+@pytest.fixture
+def app(ctools_app):
+    """ctools_app with groups 2 and 3 (two menus and one menu), plus an item with no group."""
+    with ctools_app.app_context():
+        models.db.session.add_all([
+            models.menuGroups(id=2, GroupName='Two', GroupInfo='second'),
+            models.menuGroups(id=3, GroupName='Three', GroupInfo=''),
+        ])
+        models.db.session.add_all([
+            models.menuItems(MenuGroup_id=group, MenuID=menu, OptionNumber=option, OptionText=f'{group},{menu}/{option}',
+                Command=option, Argument='arg', pword='', top_line=option == 1, bottom_line=None)
+            for group, menu, option in [(2, 0, 0), (2, 0, 1), (2, 1, 0), (3, 0, 0), (3, 0, 5)]
+        ])
+        models.db.session.add(models.menuItems(MenuGroup_id=None, MenuID=0, OptionNumber=0, OptionText='orphan', Command=0))
+        models.db.session.commit()
+    # endwith app context
+    return ctools_app
+
+
+def _group_items(group_id):
+    """The group's items as (MenuID, OptionNumber, OptionText, Command, Argument, top_line), in order."""
+    items = models.menuItems.query.filter_by(MenuGroup_id=group_id).order_by(models.menuItems.MenuID, models.menuItems.OptionNumber)
+    return [(item.MenuID, item.OptionNumber, item.OptionText, item.Command, item.Argument, item.top_line) for item in items]
+
+
+def _remove_groups(*group_ids):
+    models.db.session.execute(delete(models.menuItems).where(models.menuItems.MenuGroup_id.in_(group_ids)))
+    models.db.session.execute(delete(models.menuGroups).where(models.menuGroups.id.in_(group_ids)))
+    models.db.session.commit()
+
+
+def test_export_writes_one_line_per_group_and_skips_items_without_a_group(app):
+    out = io.StringIO()
+    with app.app_context():
+        assert export_menu_groups(out, [2, 3]) == (2, 5)
+
+    groups = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [(group['id'], group['GroupName'], len(group['items'])) for group in groups] == [(2, 'Two', 3), (3, 'Three', 2)]
+    assert 'orphan' not in out.getvalue()
+
+
+def test_round_trip_into_new_groups(app):
+    out = io.StringIO()
+    with app.app_context():
+        originals = {group_id: _group_items(group_id) for group_id in (2, 3)}
+        export_menu_groups(out, [2, 3])
+
+        assert import_menu_groups(io.StringIO(out.getvalue()), name_suffix=' (copy)') == (2, 5)
+
+        for group_id, name in ((2, 'Two'), (3, 'Three')):
+            copy = models.menuGroups.query.filter_by(GroupName=f'{name} (copy)').one()
+            assert copy.id not in (2, 3)
+            assert _group_items(copy.id) == originals[group_id]
+        # endfor groups
+        assert models.menuGroups.query.filter_by(GroupName='Two (copy)').one().GroupInfo == 'second'
+    # endwith app context
+
+
+def test_existing_group_names_are_refused_unless_replaced(app):
+    out = io.StringIO()
+    with app.app_context():
+        export_menu_groups(out, [3])
+        models.menuItems.query.filter_by(MenuGroup_id=3, OptionNumber=5).one().OptionText = 'edited'
+        models.db.session.commit()
+
+        with pytest.raises(ValueError, match='already exist: Three'):
+            import_menu_groups(io.StringIO(out.getvalue()))
+        assert import_menu_groups(io.StringIO(out.getvalue()), replace=True) == (1, 2)
+
+        assert _group_items(3)[1][2] == '3,0/5'
+        assert models.menuGroups.query.count() == 3
+    # endwith app context
+
+
+def test_cli_round_trip_with_keep_ids(app, tmp_path):
+    runner = app.test_cli_runner()
+    menus_file = str(tmp_path / 'menus.jsonl')
+    with app.app_context():
+        originals = {group_id: _group_items(group_id) for group_id in (2, 3)}
+
+    result = runner.invoke(args=['ctools', 'export-menus', menus_file, '--group', '2', '--group', '3'])
+    assert 'Exported 2 menu groups (5 items)' in result.output
+    with app.app_context():
+        _remove_groups(2, 3)
+
+    result = runner.invoke(args=['ctools', 'import-menus', menus_file, '--keep-ids'])
+    assert 'Imported 2 menu groups (5 items)' in result.output
+
+    with app.app_context():
+        assert {group_id: _group_items(group_id) for group_id in (2, 3)} == originals
+        # later inserts go past the kept ids
+        models.db.session.add(models.menuGroups(GroupName='Four', GroupInfo=''))
+        models.db.session.commit()
+        assert models.menuGroups.query.filter_by(GroupName='Four').one().id == 4
+    # endwith app context
+
+    result = runner.invoke(args=['ctools', 'import-menus', menus_file, '--keep-ids'])
+    assert result.exit_code != 0
+    assert 'already exist' in result.output
+
+
+class _RecordingSession:
+    """Enough of a Session for _reset_id_sequence: a bind of the given dialect, and the statements executed."""
+    def __init__(self, dialect):
+        self.dialect = dialect
+        self.statements = []
+
+    def get_bind(self, mapper=None):
+        return self
+
+    def execute(self, stmt, **kwargs):
+        self.statements.append(str(stmt.compile(dialect=self.dialect, compile_kwargs={'literal_binds': True})))
+
+
+def test_reset_id_sequence_on_postgresql(app):
+    session = _RecordingSession(postgresql.dialect())
+    with app.app_context():
+        _reset_id_sequence(session, models.menuGroups)
+
+    assert len(session.statements) == 1
+    # the mixed-case table name is quoted inside pg_get_serial_sequence's argument
+    assert 'setval(pg_get_serial_sequence(\'"cMenu_menuGroups"\', \'id\')' in session.statements[0]
+    assert 'max("cMenu_menuGroups".id)' in session.statements[0]
+
+
+def test_reset_id_sequence_is_a_no_op_elsewhere(app):
+    session = _RecordingSession(sqlite.dialect())
+    with app.app_context():
+        _reset_id_sequence(session, models.menuGroups)
+
+    assert session.statements == []
@@ -0,0 +1,29 @@
+"""models: table creation for every bind."""
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect
+
+from calvincTools.models import init_cDatabase
+
+
+def test_tables_created_on_distinct_engines_with_the_same_url():
+    # two in-memory binds: the same URL, but separate databases
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_BINDS'] = {'cToolsdb': 'sqlite://'}
+    db = SQLAlchemy()
+    db.init_app(app)
+
+    class Widget(db.Model):
+        __tablename__ = 'widget'
+        id = db.Column(db.Integer, primary_key=True)
+    # Widget
+
+    menuGroups, menuItems, cParameters, cGreetings, User = init_cDatabase(app, db)  # pylint: disable=unused-variable
+
+    with app.app_context():
+        assert inspect(db.engine).has_table('widget')
+        assert inspect(db.engines['cToolsdb']).has_table(menuItems.__tablename__)
+        for engine in db.engines.values():
+            engine.dispose()
+    # endwith app context
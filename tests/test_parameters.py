@@ -0,0 +1,110 @@
+"""parameters: the process-local cParameters cache."""
+import pytest
+from sqlalchemy import event, update
+
+from calvincTools import models
+from calvincTools.parameters import ( cParameterStore, parameter_store, )
+
+
+@pytest.fixture
+def app(ctools_app):
+    """ctools_app with a few parameters."""
+    with ctools_app.app_context():
+        models.db.session.add_all([
+            models.cParameters(parm_name=name, parm_value=value)
+            for name, value in [
+                ('Timeout', ' 30 '), ('Ratio', '0.5'), ('Enabled', 'Yes'), ('Limits', '{"max": 3}'), ('Junk', 'not a number'),
+            ]
+        ])
+        models.db.session.commit()
+    # endwith app context
+    return ctools_app
+
+
+@pytest.fixture
+def store(app):
+    """A fresh store, used inside an app context."""
+    with app.app_context():
+        yield cParameterStore()
+
+
+@pytest.fixture
+def parameter_selects(app):
+    """A list whose [0] counts the SELECTs on the cParameters table from here on."""
+    selects = [0]
+    def count_selects(conn, cursor, statement, *args):
+        selects[0] += statement.lstrip().upper().startswith('SELECT') and models.cParameters.__tablename__ in statement
+    with app.app_context():
+        event.listen(models.db.engines['cToolsdb'], 'before_cursor_execute', count_selects)
+    return selects
+
+
+def _set_value(parm_name, parm_value):
+    """Change a parameter behind the store's back (as another process would)."""
+    parms = models.cParameters
+    models.db.session.execute(update(parms).where(parms.parm_name == parm_name).values(parm_value=parm_value))
+    models.db.session.commit()
+
+
+def test_typed_accessors(store):
+    assert store.get('Timeout') == ' 30 '
+    assert store.get('Missing', 'dflt') == 'dflt'
+    assert store.get_int('Timeout') == 30
+    assert store.get_float('Ratio') == 0.5
+    assert store.get_bool('Enabled') is True
+    assert store.get_json('Limits') == {'max': 3}
+    assert store.get_many(['Timeout', 'Missing'], default='-') == {'Timeout': ' 30 ', 'Missing': '-'}
+
+
+def test_unparseable_and_missing_values_give_the_default(store):
+    assert store.get_int('Junk', 7) == 7
+    assert store.get_bool('Junk', True) is True
+    assert store.get_json('Junk', []) == []
+    assert store.get_int('Missing', 9) == 9
+
+
+def test_table_is_read_once_and_parses_are_memoized(store, parameter_selects):
+    assert store.get_json('Limits') is store.get_json('Limits')
+    store.get_int('Timeout')
+    store.get('Ratio')
+
+    assert parameter_selects[0] == 1
+
+
+def test_invalidate_reloads(store):
+    assert store.get_int('Timeout') == 30
+    _set_value('Timeout', '45')
+    assert store.get_int('Timeout') == 30
+
+    store.invalidate()
+
+    assert store.get_int('Timeout') == 45
+
+
+def test_a_load_that_races_an_invalidate_is_served_but_not_kept(store, app, parameter_selects):
+    # invalidate while the table is being read, as a bump from another request would
+    loads = []
+    def invalidate_during_load(conn, cursor, statement, *args):
+        if models.cParameters.__tablename__ in statement and not loads:
+            loads.append(statement)
+            store.invalidate()
+    event.listen(models.db.engines['cToolsdb'], 'before_cursor_execute', invalidate_during_load)
+
+    assert store.get_int('Timeout') == 30
+    assert parameter_selects[0] == 1
+
+    _set_value('Timeout', '45')
+    assert store.get_int('Timeout') == 45
+    assert parameter_selects[0] == 2
+
+
+def test_set_parameter_drops_the_cache(app):
+    with app.app_context():
+        parameter_store.invalidate()
+        assert parameter_store.get_int('Timeout') == 30
+
+        models.cParameters.set_parameter('Timeout', '60')
+
+        assert parameter_store.get_int('Timeout') == 60
+        parameter_store.invalidate()
+    # endwith app context
@@ -0,0 +1,100 @@
+"""Repository.bulk_upsert (native and fallback paths)."""
+import pytest
+from sqlalchemy import event, select
+from sqlalchemy.exc import IntegrityError
+
+import calvincTools.database
+from calvincTools.database import unit_of_work
+from conftest import Stock
+
+
+@pytest.fixture(params=['native', 'fallback'])
+def upsert_repo(request, repo, monkeypatch):
+    """The repo, once with the dialect's upsert and once forced onto the SELECT/UPDATE/INSERT fallback."""
+    if request.param == 'fallback':
+        monkeypatch.setattr(repo, '_upsert_statement', lambda *args: None)
+    return repo
+
+
+def _stock(session_factory):
+    """{(sku, site): qty} for every row."""
+    with session_factory() as session:
+        return {(sku, site): qty for sku, site, qty in session.execute(select(Stock.sku, Stock.site, Stock.qty))}
+
+
+def _select_count(session_factory):
+    """A list whose [0] counts the SELECTs run from here on."""
+    selects = [0]
+    def count_selects(conn, cursor, statement, *args):
+        selects[0] += statement.lstrip().upper().startswith('SELECT')
+    engine = session_factory.kw['bind']
+    event.listen(engine, 'before_cursor_execute', count_selects)
+    return selects
+
+
+def test_upsert_inserts_and_updates_by_primary_key(upsert_repo, session_factory, stock_rows):
+    upsert_repo.bulk_upsert(stock_rows[:40])
+
+    changed = [{**row, 'qty': 5} for row in stock_rows[20:]]
+    assert upsert_repo.bulk_upsert(changed, batch_size=15) == 40
+
+    stock = _stock(session_factory)
+    assert len(stock) == 60
+    assert sum(stock.values()) == 20 * 1 + 40 * 5
+
+
+def test_upsert_on_named_conflict_columns(upsert_repo, session_factory, stock_rows):
+    upsert_repo.bulk_upsert(stock_rows)
+
+    upsert_repo.bulk_upsert(
+        [{'sku': 's03', 'site': 1, 'qty': 9}, {'sku': 'new', 'site': 0, 'qty': 4}],
+        conflict_cols=['sku', Stock.site],
+        update_cols=['qty'],
+    )
+
+    stock = _stock(session_factory)
+    assert stock[('s03', 1)] == 9
+    assert stock[('new', 0)] == 4
+    assert len(stock) == 61
+
+
+def test_upsert_with_no_update_columns_leaves_existing_rows(upsert_repo, session_factory, stock_rows):
+    upsert_repo.bulk_upsert(stock_rows)
+
+    upsert_repo.bulk_upsert([{**stock_rows[0], 'qty': 7}, {'id': 100, 'sku': 'x', 'site': 0, 'qty': 7}], update_cols=[])
+
+    stock = _stock(session_factory)
+    assert stock[(stock_rows[0]['sku'], stock_rows[0]['site'])] == 1
+    assert stock[('x', 0)] == 7
+
+
+def test_fallback_lookup_is_chunked_under_the_parameter_limit(repo, session_factory, stock_rows, monkeypatch):
+    monkeypatch.setattr(repo, '_upsert_statement', lambda *args: None)
+    monkeypatch.setattr(calvincTools.database, 'LOOKUP_PARAM_LIMIT', 20)    # 10 two-column keys per SELECT
+    selects = _select_count(session_factory)
+
+    repo.bulk_upsert(stock_rows, conflict_cols=['sku', 'site'])
+
+    assert selects[0] == 6
+    assert len(_stock(session_factory)) == 60
+
+
+def test_failed_upsert_rolls_back_all_batches(upsert_repo, session_factory, stock_rows):
+    bad_rows = stock_rows[:30] + [{'id': 31, 'sku': 's00', 'site': 0, 'qty': 1}]     # (s00, 0) is already id 1
+
+    with pytest.raises(IntegrityError):
+        upsert_repo.bulk_upsert(bad_rows, batch_size=10)
+
+    assert _stock(session_factory) == {}
+
+
+def test_failed_upsert_in_unit_of_work_keeps_the_units_other_work(upsert_repo, session_factory, stock_rows):
+    with unit_of_work():
+        upsert_repo.add(Stock(id=1, sku='kept', site=0, qty=1))
+        with pytest.raises(IntegrityError):
+            upsert_repo.bulk_upsert([{'id': 2, 'sku': 'a', 'site': 0, 'qty': 1}, {'id': 3, 'sku': 'a', 'site': 0, 'qty': 1}])
+        upsert_repo.add(Stock(id=4, sku='also kept', site=0, qty=1))
+    # endwith unit of work
+
+    assert set(_stock(session_factory)) == {('kept', 0), ('also kept', 0)}
+
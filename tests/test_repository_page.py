@@ -0,0 +1,56 @@
+"""Repository.page: keyset pagination."""
+from conftest import Stock
+
+
+def _all_pages(repo, limit, **kwargs):
+    """Walk every page; returns the records in order and the number of pages."""
+    records, pages, after_key = [], 0, None
+    while True:
+        page, after_key = repo.page(after_key, limit=limit, **kwargs)
+        records.extend(page)
+        pages += 1
+        if after_key is None:
+            return records, pages
+    # endwhile
+
+
+def test_page_by_primary_key(repo, stock_rows):
+    repo.bulk_add_from_listofdict(stock_rows)
+
+    records, pages = _all_pages(repo, limit=25)
+
+    assert [rec.id for rec in records] == list(range(1, 61))
+    assert pages == 3
+
+
+def test_next_key_is_none_on_an_exact_last_page(repo, stock_rows):
+    repo.bulk_add_from_listofdict(stock_rows)
+
+    page, after_key = repo.page(limit=60)
+
+    assert len(page) == 60
+    assert after_key is None
+
+
+def test_page_after_a_scalar_key(repo, stock_rows):
+    repo.bulk_add_from_listofdict(stock_rows)
+
+    page, after_key = repo.page(57, limit=2)
+
+    assert [rec.id for rec in page] == [58, 59]
+    assert after_key == (59,)
+
+
+def test_page_composite_descending_order_with_filter(repo, stock_rows):
+    repo.bulk_add_from_listofdict(stock_rows)
+    order_by = (Stock.sku.desc(), Stock.site)
+
+    records, _ = _all_pages(repo, limit=7, order_by=order_by, whereclause=Stock.site > 0)
+
+    keys = sorted((row['sku'], row['site']) for row in stock_rows if row['site'] > 0)
+    expected = sorted(keys, key=lambda key: key[0], reverse=True)     # stable, so site stays ascending
+    assert [(rec.sku, rec.site) for rec in records] == expected
+
+
+def test_page_of_an_empty_table(repo):
+    assert repo.page(limit=10) == ([], None)
@@ -0,0 +1,17 @@
+"""Repository.update."""
+from sqlalchemy import func, select
+
+from conftest import Stock
+
+
+def test_update_returns_a_loaded_detached_object(repo, session_factory, stock_rows):
+    repo.bulk_add_from_listofdict(stock_rows)
+    stock = repo.get_by_id(1)
+
+    stock.qty = 8
+    updated = repo.update(stock)
+
+    # readable after the session closed: refreshed, not left expired by the commit
+    assert updated.qty == 8
+    with session_factory() as session:
+        assert session.scalar(select(func.sum(Stock.qty))) == 59 + 8
@@ -0,0 +1,173 @@
+"""The RunSQLStatement page (run_sql) and its CSV/XLSX downloads, on SQLite."""
+import csv
+import io
+
+import pytest
+from jinja2 import ChoiceLoader, DictLoader
+from openpyxl import load_workbook
+from sqlalchemy import text
+
+from calvincTools import models
+
+# counts to 10**9; runs far longer than the 1 second timeout set below
+SLOW_SQL = 'WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 1000000000) SELECT count(*) FROM c'
+
+
+@pytest.fixture
+def client(ctools_app, superuser_client):
+    """A superuser's client; the app's database has table n holding 1..100."""
+    # enter_SQL.html includes the app's SQLhints.html
+    ctools_app.jinja_env.loader = ChoiceLoader([ctools_app.jinja_env.loader, DictLoader({'SQLhints.html': ''})])
+    with ctools_app.app_context():
+        models.db.session.execute(text('CREATE TABLE n (v INTEGER, label VARCHAR(20))'))
+        models.db.session.execute(text('INSERT INTO n VALUES (:v, :label)'), [{'v': v, 'label': f'row {v}'} for v in range(1, 101)])
+        models.db.session.commit()
+    # endwith app context
+    return superuser_client
+
+
+def _run(client, sql, **fields):
+    response = client.post('/utils/sql', data={'input_sql': sql, **fields})
+    return response.get_data(as_text=True)
+
+
+def _rows_shown(body):
+    return body.count('<tr style')
+
+
+def test_first_page(client):
+    body = _run(client, 'SELECT v FROM n ORDER BY v', page_size=30)
+
+    assert _rows_shown(body) == 30
+    assert 'Records 1 - 30 (more follow)' in body
+    assert 'Next page' in body
+    assert 'Previous page' not in body
+
+
+def test_later_and_last_pages(client):
+    body = _run(client, 'SELECT v FROM n ORDER BY v', page=2, page_size=30)
+    assert _rows_shown(body) == 30
+    assert 'Records 31 - 60 (more follow)' in body
+    assert 'Previous page' in body
+
+    body = _run(client, 'SELECT v FROM n ORDER BY v', page=4, page_size=30)
+    assert _rows_shown(body) == 10
+    assert 'Records 91 - 100' in body
+    assert 'Next page' not in body
+
+
+def test_page_size_is_capped_at_max_rows(client, ctools_app):
+    ctools_app.config['CTOOLS_SQL_MAX_ROWS'] = 20
+
+    body = _run(client, 'SELECT v FROM n', page_size=50)
+
+    assert _rows_shown(body) == 20
+    assert 'Showing at most 20 rows per page.' in body
+
+
+def test_budget_cuts_off_the_page(client, ctools_app):
+    ctools_app.config['CTOOLS_SQL_BUDGET_ROWS'] = 25
+
+    body = _run(client, 'SELECT v FROM n ORDER BY v', page_size=50)
+
+    assert _rows_shown(body) == 25
+    assert 'Query stopped: it returned more than 25 rows.' in body
+
+
+def test_pages_past_the_budget_are_refused(client, ctools_app):
+    ctools_app.config['CTOOLS_SQL_BUDGET_ROWS'] = 25
+
+    body = _run(client, 'SELECT v FROM n ORDER BY v', page=3, page_size=10)
+    assert _rows_shown(body) == 5
+    assert 'Query stopped: it returned more than 25 rows.' in body
+
+    body = _run(client, 'SELECT v FROM n ORDER BY v', page=4, page_size=10)
+    assert _rows_shown(body) == 0
+    assert 'Query stopped: reaching this page reads more than 25 rows.' in body
+
+
+def test_timeout_is_reported_as_a_timeout(client, ctools_app):
+    ctools_app.config['CTOOLS_SQL_TIMEOUT'] = {'sqlite': 1, 'default': 30}
+
+    body = _run(client, SLOW_SQL)
+
+    assert 'Query cancelled: it ran longer than 1 seconds.' in body
+
+
+def test_sql_errors_are_not_reported_as_timeouts(client):
+    body = _run(client, 'SELECT nope FROM n')
+
+    assert 'SQL Error:' in body
+    assert 'no such column: nope' in body
+    assert 'ran longer than' not in body
+
+
+def test_statements_that_change_data(client, ctools_app):
+    body = _run(client, 'UPDATE n SET label = NULL WHERE v > 90')
+
+    assert '10 rows affected' in body
+    with ctools_app.app_context():
+        assert models.db.session.execute(text('SELECT count(*) FROM n WHERE label IS NULL')).scalar() == 10
+
+
+def test_explain_first_shows_the_plan_without_running(client):
+    body = _run(client, 'SELECT v FROM n WHERE v > 5', explain_first='y')
+
+    assert 'Estimated rows: not reported by this database' in body
+    assert 'SCAN n' in body
+    assert _rows_shown(body) == 0
+
+
+def _download(client, fmt, sql):
+    response = client.post(f'/utils/sql/download/{fmt}', data={'input_sql': sql})
+    assert response.status_code == 200
+    assert f'.{fmt}"' in response.headers['Content-Disposition']
+    return response
+
+
+def test_csv_download(client):
+    response = _download(client, 'csv', 'SELECT v, label FROM n ORDER BY v')
+
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0] == ['v', 'label']
+    assert rows[1:] == [[str(v), f'row {v}'] for v in range(1, 101)]
+
+
+def test_csv_download_says_where_the_budget_stopped_it(client, ctools_app):
+    ctools_app.config['CTOOLS_SQL_BUDGET_ROWS'] = 40
+
+    response = _download(client, 'csv', 'SELECT v FROM n ORDER BY v')
+
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert len(rows) == 1 + 40 + 1
+    assert rows[-1] == ['*** Query stopped: it returned more than 40 rows. ***']
+
+
+def test_xlsx_download(client):
+    response = _download(client, 'xlsx', 'SELECT v, label FROM n ORDER BY v')
+
+    ws = load_workbook(io.BytesIO(response.get_data())).active
+    rows = list(ws.iter_rows(values_only=True))
+    assert rows[0] == ('v', 'label')
+    assert rows[1:] == [(v, f'row {v}') for v in range(1, 101)]
+    assert ws.freeze_panes == 'A2'
+
+
+def test_xlsx_download_says_where_the_timeout_stopped_it(client, ctools_app):
+    ctools_app.config['CTOOLS_SQL_TIMEOUT'] = 1
+    # a row every 10**4 steps of the recursion, so the timeout hits while fetching
+    sql = SLOW_SQL.replace('SELECT count(*) FROM c', 'SELECT x FROM c WHERE x % 10000 = 0')
+
+    response = _download(client, 'xlsx', sql)
+
+    rows = list(load_workbook(io.BytesIO(response.get_data())).active.iter_rows(values_only=True))
+    assert rows[0] == ('x',)
+    assert rows[-1] == ('*** Query cancelled: it ran longer than 1 seconds. ***',)
+
+
+def test_download_of_a_statement_without_rows_is_refused(client, ctools_app):
+    response = client.post('/utils/sql/download/csv', data={'input_sql': 'DELETE FROM n'})
+
+    assert response.status_code == 302
+    with ctools_app.app_context():
+        assert models.db.session.execute(text('SELECT count(*) FROM n')).scalar() == 100
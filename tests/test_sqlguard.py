@@ -0,0 +1,98 @@
+"""cMenu.sqlguard: the fetch budget and statement timeout for SQL run from the RunSQLStatement page."""
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from calvincTools.cMenu.sqlguard import ( SQLBudgetExceeded, SQLGuard, )
+
+
+@pytest.fixture
+def connection():
+    """A connection to an in-memory database with table n holding 1..100."""
+    engine = create_engine('sqlite://')
+    with engine.connect() as conn:
+        conn.execute(text('CREATE TABLE n (v INTEGER)'))
+        conn.execute(text('INSERT INTO n VALUES (:v)'), [{'v': v} for v in range(1, 101)])
+        yield conn
+    # endwith connection
+    engine.dispose()
+
+
+def _fetch(guard, connection, size, skip=0):
+    """The values guard.partitions yields, and the budget message if it stopped."""
+    values = []
+    result = connection.execute(text('SELECT v FROM n ORDER BY v'))
+    try:
+        for batch in guard.partitions(result, size, skip=skip):
+            values.extend(row.v for row in batch)
+        # endfor batch
+    except SQLBudgetExceeded as e:
+        return values, str(e)
+    return values, None
+
+
+def test_rows_up_to_the_budget_are_yielded(connection):
+    guard = SQLGuard(connection, max_rows=25)
+
+    values, stopped = _fetch(guard, connection, 10)
+
+    assert values == list(range(1, 26))
+    assert stopped == 'Query stopped: it returned more than 25 rows.'
+
+
+def test_byte_budget(connection):
+    guard = SQLGuard(connection, max_bytes=80)       # 8 bytes a number
+
+    values, stopped = _fetch(guard, connection, 30)
+
+    assert values == list(range(1, 11))
+    assert stopped.startswith('Query stopped: it returned more than')
+
+
+def test_skipped_rows_count_against_the_row_budget(connection):
+    guard = SQLGuard(connection, max_rows=50)
+
+    values, stopped = _fetch(guard, connection, 15, skip=40)
+
+    assert values == list(range(41, 51))
+    assert stopped == 'Query stopped: it returned more than 50 rows.'
+    assert guard.rows_fetched == 50
+
+
+def test_a_page_past_the_row_budget_is_refused(connection):
+    guard = SQLGuard(connection, max_rows=50)
+
+    values, stopped = _fetch(guard, connection, 15, skip=60)
+
+    assert values == []
+    assert stopped == 'Query stopped: reaching this page reads more than 50 rows.'
+
+
+def test_skipped_rows_are_not_charged_bytes(connection):
+    guard = SQLGuard(connection, max_bytes=80)
+
+    values, stopped = _fetch(guard, connection, 15, skip=90)
+
+    assert values == list(range(91, 101))
+    assert stopped is None
+
+
+def test_interrupt_is_a_timeout_only_when_a_timeout_is_set(connection):
+    interrupted = sqlite3.OperationalError('interrupted')
+
+    assert SQLGuard(connection, timeout=2).error_message(interrupted) == 'Query cancelled: it ran longer than 2 seconds.'
+    assert not SQLGuard(connection).is_timeout(interrupted)
+    assert SQLGuard(connection, timeout=2).error_message(sqlite3.OperationalError('no such table: x')) == 'SQL Error: no such table: x'
+
+
+def test_timeout_interrupts_a_long_statement(connection):
+    slow_sql = 'WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 1000000000) SELECT count(*) FROM c'
+    with SQLGuard(connection, timeout=0.2) as guard:
+        with pytest.raises(OperationalError) as excinfo:
+            connection.execute(text(slow_sql))
+    # endwith guard
+
+    assert guard.is_timeout(excinfo.value)
+    assert connection.execute(text(slow_sql.replace('1000000000', '1000'))).scalar() == 1000
@@ -0,0 +1,149 @@
+"""usr_auth.usercache: the user snapshot cache behind Flask-Login's user_loader."""
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import event, String
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+from calvincTools import models
+import calvincTools.usr_auth.usercache
+from calvincTools.usr_auth.usercache import ( UserSnapshotCache, user_cache, user_fingerprint, )
+
+
+class _Base(DeclarativeBase):
+    pass
+
+
+class Account(_Base):
+    __tablename__ = 'account'
+    id: Mapped[int] = mapped_column(primary_key=True)
+    password_hash: Mapped[str] = mapped_column(String(100))
+    active_status: Mapped[bool]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """usercache's clock, as a one-element list holding the time."""
+    now = [1000.0]
+    monkeypatch.setattr(calvincTools.usr_auth.usercache, 'time', SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def _account(account_id, password_hash='hash', active_status=True):
+    return Account(id=account_id, password_hash=password_hash, active_status=active_status)
+
+
+def test_snapshot_is_a_detached_copy(clock):
+    cache = UserSnapshotCache()
+    account = _account(1)
+
+    fingerprint = cache.put(account, ttl=60, maxsize=10)
+    account.password_hash = 'changed afterwards'
+
+    snapshot = cache.get(1, fingerprint)
+    assert snapshot is not account
+    assert (snapshot.id, snapshot.password_hash) == (1, 'hash')
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = UserSnapshotCache()
+    fingerprint = cache.put(_account(1), ttl=60, maxsize=10)
+
+    clock[0] += 59
+    assert cache.get(1, fingerprint) is not None
+    clock[0] += 2
+    assert cache.get(1, fingerprint) is None
+
+
+def test_a_zero_ttl_caches_nothing(clock):
+    cache = UserSnapshotCache()
+
+    fingerprint = cache.put(_account(1), ttl=0, maxsize=10)
+
+    assert fingerprint == user_fingerprint(_account(1))
+    assert cache.get(1, fingerprint) is None
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = UserSnapshotCache()
+    fingerprints = {n: cache.put(_account(n), ttl=60, maxsize=2) for n in (1, 2)}
+    cache.get(1, fingerprints[1])
+
+    cache.put(_account(3), ttl=60, maxsize=2)
+
+    assert cache.get(2, fingerprints[2]) is None
+    assert cache.get(1, fingerprints[1]) is not None
+    assert cache.get(3, user_fingerprint(_account(3))) is not None
+
+
+@pytest.mark.parametrize('changed', [{'password_hash': 'new hash'}, {'active_status': False}])
+def test_fingerprint_changes_with_password_or_active_status(clock, changed):
+    cache = UserSnapshotCache()
+    old_fingerprint = cache.put(_account(1), ttl=60, maxsize=10)
+
+    new_fingerprint = user_fingerprint(_account(1, **changed))
+
+    assert new_fingerprint != old_fingerprint
+    assert cache.get(1, new_fingerprint) is None
+    # the miss doesn't evict the entry that sessions with the old fingerprint use
+    assert cache.get(1, old_fingerprint) is not None
+
+
+def test_invalidate_one_or_all(clock):
+    cache = UserSnapshotCache()
+    fingerprints = {n: cache.put(_account(n), ttl=60, maxsize=10) for n in (1, 2, 3)}
+
+    cache.invalidate(1)
+    assert cache.get(1, fingerprints[1]) is None
+    assert cache.get(2, fingerprints[2]) is not None
+
+    cache.invalidate()
+    assert cache.get(2, fingerprints[2]) is None
+
+
+# ---------------------------------------------------------------------------
+# load_user
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def user_selects(ctools_app):
+    """A list whose [0] counts the SELECTs on the users table from here on."""
+    user_cache.invalidate()
+    selects = [0]
+    def count_selects(conn, cursor, statement, *args):
+        selects[0] += statement.lstrip().upper().startswith('SELECT') and f'FROM {models.User.__tablename__}' in statement
+    with ctools_app.app_context():
+        event.listen(models.db.engines['cToolsdb'], 'before_cursor_execute', count_selects)
+    yield selects
+    user_cache.invalidate()
+
+
+def _logged_in(client):
+    """Whether a superuser-only page lets client through (it redirects elsewhere if not)."""
+    response = client.post('/utils/sql/download/nothing')
+    return '/auth/login' not in response.headers['Location']
+
+
+def test_load_user_is_served_from_the_cache(superuser_client, user_selects):
+    assert _logged_in(superuser_client)
+    assert _logged_in(superuser_client)
+    assert _logged_in(superuser_client)
+
+    assert user_selects[0] == 1
+
+
+@pytest.mark.parametrize('changed', [{'password': 'new password'}, {'active_status': False}])
+def test_session_is_logged_out_after_a_password_or_active_status_change(ctools_app, superuser_client, user_selects, changed):
+    assert _logged_in(superuser_client)
+
+    with ctools_app.app_context():
+        user = models.User.query.filter_by(username='su').one()
+        if 'password' in changed:
+            user.set_password(changed['password'])
+        else:
+            user.active_status = changed['active_status']
+        models.db.session.commit()
+    # endwith app context
+    user_cache.invalidate()         # as the users version stamp does after such a change
+
+    assert not _logged_in(superuser_client)
@@ -0,0 +1,95 @@
+"""versionstamps: cross-process cache invalidation."""
+import pytest
+from sqlalchemy import update
+
+from calvincTools import models
+import calvincTools.versionstamps
+from calvincTools.versionstamps import ( bump_version_stamp, check_version_stamps, register_stamp_listener, )
+
+STAMP = 'test-stamp'
+
+
+@pytest.fixture
+def drops(ctools_app, monkeypatch):
+    """A list that gets one entry each time STAMP's caches are dropped; isolated from the real listeners."""
+    monkeypatch.setattr(calvincTools.versionstamps, '_listeners', {})
+    monkeypatch.setattr(calvincTools.versionstamps, '_seen_versions', {})
+    monkeypatch.setattr(calvincTools.versionstamps, '_check_state', {'last_check': 0.0})
+    dropped = []
+    register_stamp_listener(STAMP, lambda: dropped.append(STAMP))
+    with ctools_app.app_context():
+        yield dropped
+    # endwith app context
+
+
+def _version(stamp_name=STAMP):
+    stamp = models.db.session.get(models.cVersionStamps, stamp_name)
+    return stamp.stamp_version if stamp else None
+
+
+def test_first_bump_inserts_the_missing_row(drops):
+    assert _version() is None
+
+    bump_version_stamp(STAMP)
+
+    assert _version() == 1
+    assert drops == [STAMP]
+
+
+def test_bump_increments_and_drops_at_once(drops):
+    bump_version_stamp(STAMP)
+    bump_version_stamp(STAMP)
+
+    assert _version() == 2
+    assert drops == [STAMP, STAMP]
+
+
+def test_own_bump_is_not_dropped_again_by_the_next_check(drops):
+    check_version_stamps(force=True)
+    bump_version_stamp(STAMP)
+
+    check_version_stamps(force=True)
+
+    assert drops == [STAMP]
+
+
+def test_another_process_sees_a_bump_on_its_next_check(drops):
+    check_version_stamps(force=True)
+    seen_before = dict(calvincTools.versionstamps._seen_versions)     # pylint: disable=protected-access
+    bump_version_stamp(STAMP)
+    drops.clear()
+
+    # a second process: it last saw the versions from before the bump
+    calvincTools.versionstamps._seen_versions.clear()                 # pylint: disable=protected-access
+    calvincTools.versionstamps._seen_versions.update(seen_before)     # pylint: disable=protected-access
+    check_version_stamps(force=True)
+    assert drops == [STAMP]
+
+    check_version_stamps(force=True)
+    assert drops == [STAMP]
+
+
+def test_a_bump_written_elsewhere_is_picked_up(drops):
+    bump_version_stamp(STAMP)
+    drops.clear()
+    stamps = models.cVersionStamps
+    models.db.session.execute(update(stamps).where(stamps.stamp_name == STAMP).values(stamp_version=stamps.stamp_version + 1))
+    models.db.session.commit()
+
+    check_version_stamps(force=True)
+
+    assert drops == [STAMP]
+
+
+def test_checks_are_throttled_to_the_interval(drops, ctools_app):
+    ctools_app.config['CTOOLS_CACHE_CHECK_INTERVAL'] = 60
+    check_version_stamps(force=True)
+    bump_version_stamp(STAMP)
+    calvincTools.versionstamps._seen_versions.clear()                 # pylint: disable=protected-access
+    drops.clear()
+
+    check_version_stamps()
+    assert drops == []
+
+    check_version_stamps(force=True)
+    assert drops == [STAMP]